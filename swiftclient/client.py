@@ -23,16 +23,26 @@ import sys
 import logging
 import warnings
 import functools
+import inspect
+import itertools
 
 from distutils.version import StrictVersion
 from requests.exceptions import RequestException, SSLError
+from requests.packages import urllib3
+from requests.packages.urllib3.exceptions import HTTPError as Urllib3HTTPError
+from six.moves import http_client
+from six.moves.queue import Empty, Queue
 from six.moves.urllib.parse import quote as _quote
 from six.moves.urllib.parse import urlparse, urlunparse
+from threading import Lock, Thread
 from time import sleep, time
 import six
 
 from swiftclient import version as swiftclient_version
 from swiftclient.exceptions import ClientException, InvalidHeadersException
+from swiftclient.multithreading import ConnectionThreadPool
+from swiftclient.retry import RetryPolicy
+from swiftclient import objectio, transfer
 from swiftclient.utils import LengthWrapper
 
 try:
@@ -139,7 +149,8 @@ except ImportError:
 
 class HTTPConnection:
     def __init__(self, url, proxy=None, cacert=None, insecure=False,
-                 ssl_compression=False, default_user_agent=None):
+                 ssl_compression=False, default_user_agent=None,
+                 timeout=None):
         """
         Make an HTTPConnection or HTTPSConnection
 
@@ -159,6 +170,10 @@ class HTTPConnection:
                                    may be overridden on a per-request basis by
                                    explicitly setting the user-agent header on
                                    a call to request().
+        :param timeout: seconds to wait for the server to accept the
+                        connection and for each read of its response, or a
+                        tuple of (connect timeout, read timeout); None (the
+                        default) waits forever
         :raises ClientException: Unable to handle protocol scheme
         """
         self.url = url
@@ -184,6 +199,8 @@ class HTTPConnection:
                 )
             }
         self.requests_args['stream'] = True
+        if timeout is not None:
+            self.requests_args['timeout'] = timeout
         if default_user_agent is None:
             default_user_agent = \
                 'python-swiftclient-%s' % swiftclient_version.version_string
@@ -237,9 +254,157 @@ class HTTPConnection:
         return self.resp
 
 
+# The urllib3 bundled with older requests lacks some of what the raw
+# transport uses; fall back to what it has.
+_urllib3_exceptions = urllib3.exceptions
+_Urllib3ConnectTimeoutError = getattr(
+    _urllib3_exceptions, 'ConnectTimeoutError',
+    _urllib3_exceptions.TimeoutError)
+_Urllib3NewConnectionError = getattr(
+    _urllib3_exceptions, 'NewConnectionError', _Urllib3ConnectTimeoutError)
+_Urllib3ReadTimeoutError = getattr(
+    _urllib3_exceptions, 'ReadTimeoutError', _urllib3_exceptions.TimeoutError)
+_ConnectTimeout = getattr(requests.exceptions, 'ConnectTimeout',
+                          requests.exceptions.Timeout)
+_ReadTimeout = getattr(requests.exceptions, 'ReadTimeout',
+                       requests.exceptions.Timeout)
+_urlopen_args = getattr(inspect, 'getfullargspec', None) or \
+    inspect.getargspec
+_URLOPEN_CHUNKED = 'chunked' in _urlopen_args(
+    urllib3.HTTPConnectionPool.urlopen).args
+
+
+def _chunk_encoded(chunks):
+    for chunk in chunks:
+        chunk = encode_utf8(chunk)
+        if chunk:
+            yield ('%x\r\n' % len(chunk)).encode('ascii') + chunk + b'\r\n'
+    yield b'0\r\n\r\n'
+
+
+class _RawResponse(object):
+    """ The httplib-like interface of a urllib3 response, and no more """
+
+    __slots__ = ('raw', 'status', 'reason')
+
+    def __init__(self, raw):
+        self.raw = raw
+        self.status = raw.status
+        self.reason = raw.reason
+
+    def getheader(self, k, v=None):
+        return self.raw.headers.get(k, v)
+
+    def getheaders(self):
+        return list(self.raw.headers.items())
+
+    def read(self, amt=None):
+        return self.raw.read(amt, decode_content=True)
+
+
+class RawHTTPConnection(HTTPConnection):
+    """
+    An :class:`HTTPConnection` which makes requests with urllib3 directly,
+    without the hooks, cookies, adapters and response object of a requests
+    session, for workloads of many small requests whose time goes on those
+    rather than on the network.  Requests and responses look the same to the
+    caller, and failures raise the same requests exceptions.
+    """
+
+    def __init__(self, *args, **kwargs):
+        HTTPConnection.__init__(self, *args, **kwargs)
+        self.request_session = None
+        verify = self.requests_args['verify']
+        pool_kwargs = {'maxsize': 1, 'retries': False}
+        if self.parsed_url.scheme == 'https':
+            pool_kwargs['cert_reqs'] = 'CERT_REQUIRED' if verify \
+                else 'CERT_NONE'
+            pool_kwargs['ca_certs'] = verify if isinstance(
+                verify, six.string_types) else requests.certs.where()
+        timeout = self.requests_args.get('timeout')
+        if timeout is not None:
+            if not isinstance(timeout, tuple):
+                timeout = (timeout, timeout)
+            if hasattr(urllib3, 'Timeout'):
+                pool_kwargs['timeout'] = urllib3.Timeout(connect=timeout[0],
+                                                         read=timeout[1])
+            else:
+                pool_kwargs['timeout'] = timeout[1]
+        proxies = self.requests_args.get('proxies')
+        proxy = proxies and proxies.get(self.parsed_url.scheme)
+        if proxy:
+            manager = urllib3.ProxyManager(proxy, num_pools=1, **pool_kwargs)
+        else:
+            manager = urllib3.PoolManager(num_pools=1, **pool_kwargs)
+        self.pool = manager.connection_from_url(self.url)
+        # Plain http goes to the proxy with the absolute URL; https is
+        # tunnelled through it and sends only the path
+        self.prefix = ''
+        if proxy and self.parsed_url.scheme == 'http':
+            self.prefix = 'http://%s' % self.parsed_url.netloc
+
+    def _request(self, method, url, headers, body):
+        """ Final wrapper before urllib3 call, to be patched in tests """
+        kwargs = {}
+        if body is not None and not isinstance(
+                body, (six.binary_type, six.text_type)) and \
+                not hasattr(body, 'read'):
+            if _URLOPEN_CHUNKED:
+                kwargs['chunked'] = True
+            else:
+                # httplib sends each item of an iterable body as it is
+                headers = dict(headers, **{'transfer-encoding': 'chunked'})
+                body = _chunk_encoded(body)
+        return self.pool.urlopen(
+            method, url, body=body, headers=headers, redirect=False,
+            assert_same_host=False, preload_content=False, **kwargs)
+
+    def request(self, method, full_path, data=None, headers=None, files=None):
+        """ Encode url and headers, then make the request with urllib3 """
+        if files:
+            raise ClientException('File uploads are not supported by '
+                                  'RawHTTPConnection')
+        req_headers = {'user-agent': self.default_user_agent}
+        if self.prefix:
+            req_headers['host'] = self.parsed_url.netloc
+        for k, v in (headers or {}).items():
+            req_headers[k.lower()] = encode_utf8(v)
+        url = encode_utf8(self.prefix + full_path)
+        try:
+            self.resp = _RawResponse(self._request(
+                method, url, req_headers, data or None))
+        except _urllib3_exceptions.SSLError as err:
+            raise SSLError(err)
+        except _Urllib3NewConnectionError as err:
+            raise requests.exceptions.ConnectionError(err)
+        except _Urllib3ConnectTimeoutError as err:
+            raise _ConnectTimeout(err)
+        except _Urllib3ReadTimeoutError as err:
+            raise _ReadTimeout(err)
+        except Urllib3HTTPError as err:
+            raise requests.exceptions.ConnectionError(err)
+        return self.resp
+
+    def getresponse(self):
+        return self.resp
+
+    def close(self):
+        self.pool.close()
+
+
+TRANSPORTS = {'requests': HTTPConnection, 'raw': RawHTTPConnection}
+
+
 def http_connection(*arg, **kwarg):
-    """ :returns: tuple of (parsed url, connection object) """
-    conn = HTTPConnection(*arg, **kwarg)
+    """
+    :param transport: the class of connection to make, or its name in
+                      :data:`TRANSPORTS`; defaults to :class:`HTTPConnection`
+    :returns: tuple of (parsed url, connection object)
+    """
+    transport = kwarg.pop('transport', None) or HTTPConnection
+    if isinstance(transport, six.string_types):
+        transport = TRANSPORTS[transport]
+    conn = transport(*arg, **kwarg)
     return conn.parsed_url, conn
 
 
@@ -260,7 +425,8 @@ def get_auth_1_0(url, user, key, snet, **kwargs):
     if resp.status < 200 or resp.status >= 300 or (body and not url):
         raise ClientException('Auth GET failed', http_scheme=parsed.scheme,
                               http_host=conn.host, http_path=parsed.path,
-                              http_status=resp.status, http_reason=resp.reason)
+                              http_status=resp.status, http_reason=resp.reason,
+                              http_response_headers=_resp_headers(resp))
     if snet:
         parsed = list(urlparse(url))
         # Second item in the list is the netloc
@@ -276,6 +442,9 @@ def get_keystoneclient_2_0(auth_url, user, key, os_options, **kwargs):
     Authenticate against a auth 2.0 server.
 
     We are using the keystoneclient library for our 2.0 authentication.
+
+    With ``all_endpoints=True``, a list of every matching endpoint is
+    returned instead of one.
     """
 
     insecure = kwargs.get('insecure', False)
@@ -306,11 +475,20 @@ variables to be set or overridden with -A, -U, or -K.''')
     service_type = os_options.get('service_type') or 'object-store'
     endpoint_type = os_options.get('endpoint_type') or 'publicURL'
     try:
-        endpoint = _ksclient.service_catalog.url_for(
-            attr='region',
-            filter_value=os_options.get('region_name'),
-            service_type=service_type,
-            endpoint_type=endpoint_type)
+        if kwargs.get('all_endpoints'):
+            endpoint = list(_ksclient.service_catalog.get_urls(
+                attr='region',
+                filter_value=os_options.get('region_name'),
+                service_type=service_type,
+                endpoint_type=endpoint_type) or [])
+            if not endpoint:
+                raise exceptions.EndpointNotFound()
+        else:
+            endpoint = _ksclient.service_catalog.url_for(
+                attr='region',
+                filter_value=os_options.get('region_name'),
+                service_type=service_type,
+                endpoint_type=endpoint_type)
     except exceptions.EndpointNotFound:
         raise ClientException('Endpoint for %s not found - '
                               'have you specified a region?' % service_type)
@@ -326,8 +504,18 @@ def get_auth(auth_url, user, key, **kwargs):
     of the host name for the returned storage URL. With Rackspace Cloud Files,
     use of this network path causes no bandwidth charges but requires the
     client to be running on Rackspace's ServiceNet network.
+
+    With ``all_endpoints=True``, the storage URL returned is a list of every
+    matching endpoint in the service catalog (for auth version 2.0) or a list
+    of the one storage URL.
     """
     auth_version = kwargs.get('auth_version', '1')
+    if kwargs.pop('all_endpoints', False):
+        storage_url, token = get_auth(auth_url, user, key,
+                                      _all_endpoints=True, **kwargs)
+        if not isinstance(storage_url, list):
+            storage_url = [storage_url]
+        return storage_url, token
     os_options = kwargs.get('os_options', {})
 
     storage_url, token = None, None
@@ -362,10 +550,10 @@ def get_auth(auth_url, user, key, **kwargs):
             raise ClientException('No tenant specified')
 
         cacert = kwargs.get('cacert', None)
-        storage_url, token = get_keystoneclient_2_0(auth_url, user,
-                                                    key, os_options,
-                                                    cacert=cacert,
-                                                    insecure=insecure)
+        storage_url, token = get_keystoneclient_2_0(
+            auth_url, user, key, os_options, cacert=cacert,
+            insecure=insecure,
+            all_endpoints=kwargs.get('_all_endpoints', False))
     else:
         raise ClientException('Unknown auth_version %s specified.'
                               % auth_version)
@@ -377,6 +565,13 @@ def get_auth(auth_url, user, key, **kwargs):
         return storage_url, token
 
 
+def _resp_headers(resp):
+    resp_headers = {}
+    for header, value in resp.getheaders():
+        resp_headers[header.lower()] = value
+    return resp_headers
+
+
 def store_response(resp, response_dict):
     """
     store information about an operation into a dict
@@ -387,13 +582,9 @@ def store_response(resp, response_dict):
        status, reason and a dict of lower-cased headers
     """
     if response_dict is not None:
-        resp_headers = {}
-        for header, value in resp.getheaders():
-            resp_headers[header.lower()] = value
-
         response_dict['status'] = resp.status
         response_dict['reason'] = resp.reason
-        response_dict['headers'] = resp_headers
+        response_dict['headers'] = _resp_headers(resp)
 
 
 def get_account(url, token, marker=None, limit=None, prefix=None,
@@ -455,7 +646,8 @@ def get_account(url, token, marker=None, limit=None, prefix=None,
                               http_host=conn.host, http_path=parsed.path,
                               http_query=qs, http_status=resp.status,
                               http_reason=resp.reason,
-                              http_response_content=body)
+                              http_response_content=body,
+                              http_response_headers=_resp_headers(resp))
     if resp.status == 204:
         return resp_headers, []
     return resp_headers, json_loads(body)
@@ -487,7 +679,8 @@ def head_account(url, token, http_conn=None):
         raise ClientException('Account HEAD failed', http_scheme=parsed.scheme,
                               http_host=conn.host, http_path=parsed.path,
                               http_status=resp.status, http_reason=resp.reason,
-                              http_response_content=body)
+                              http_response_content=body,
+                              http_response_headers=_resp_headers(resp))
     resp_headers = {}
     for header, value in resp.getheaders():
         resp_headers[header.lower()] = value
@@ -527,7 +720,8 @@ def post_account(url, token, headers, http_conn=None, response_dict=None):
                               http_path=parsed.path,
                               http_status=resp.status,
                               http_reason=resp.reason,
-                              http_response_content=body)
+                              http_response_content=body,
+                              http_response_headers=_resp_headers(resp))
 
 
 def get_container(url, token, container, marker=None, limit=None,
@@ -602,7 +796,8 @@ def get_container(url, token, container, marker=None, limit=None,
                               http_scheme=parsed.scheme, http_host=conn.host,
                               http_path=cont_path, http_query=qs,
                               http_status=resp.status, http_reason=resp.reason,
-                              http_response_content=body)
+                              http_response_content=body,
+                              http_response_headers=_resp_headers(resp))
     resp_headers = {}
     for header, value in resp.getheaders():
         resp_headers[header.lower()] = value
@@ -644,7 +839,8 @@ def head_container(url, token, container, http_conn=None, headers=None):
                               http_scheme=parsed.scheme, http_host=conn.host,
                               http_path=path, http_status=resp.status,
                               http_reason=resp.reason,
-                              http_response_content=body)
+                              http_response_content=body,
+                              http_response_headers=_resp_headers(resp))
     resp_headers = {}
     for header, value in resp.getheaders():
         resp_headers[header.lower()] = value
@@ -690,7 +886,8 @@ def put_container(url, token, container, headers=None, http_conn=None,
                               http_scheme=parsed.scheme, http_host=conn.host,
                               http_path=path, http_status=resp.status,
                               http_reason=resp.reason,
-                              http_response_content=body)
+                              http_response_content=body,
+                              http_response_headers=_resp_headers(resp))
 
 
 def post_container(url, token, container, headers, http_conn=None,
@@ -730,7 +927,8 @@ def post_container(url, token, container, headers, http_conn=None,
                               http_scheme=parsed.scheme, http_host=conn.host,
                               http_path=path, http_status=resp.status,
                               http_reason=resp.reason,
-                              http_response_content=body)
+                              http_response_content=body,
+                              http_response_headers=_resp_headers(resp))
 
 
 def delete_container(url, token, container, http_conn=None,
@@ -767,7 +965,8 @@ def delete_container(url, token, container, http_conn=None,
                               http_scheme=parsed.scheme, http_host=conn.host,
                               http_path=path, http_status=resp.status,
                               http_reason=resp.reason,
-                              http_response_content=body)
+                              http_response_content=body,
+                              http_response_headers=_resp_headers(resp))
 
 
 def get_object(url, token, container, name, http_conn=None,
@@ -821,7 +1020,8 @@ def get_object(url, token, container, name, http_conn=None,
                               http_host=conn.host, http_path=path,
                               http_status=resp.status,
                               http_reason=resp.reason,
-                              http_response_content=body)
+                              http_response_content=body,
+                              http_response_headers=_resp_headers(resp))
     if resp_chunk_size:
 
         def _object_body():
@@ -868,7 +1068,8 @@ def head_object(url, token, container, name, http_conn=None):
         raise ClientException('Object HEAD failed', http_scheme=parsed.scheme,
                               http_host=conn.host, http_path=path,
                               http_status=resp.status, http_reason=resp.reason,
-                              http_response_content=body)
+                              http_response_content=body,
+                              http_response_headers=_resp_headers(resp))
     resp_headers = {}
     for header, value in resp.getheaders():
         resp_headers[header.lower()] = value
@@ -974,7 +1175,8 @@ def put_object(url, token=None, container=None, name=None, contents=None,
         raise ClientException('Object PUT failed', http_scheme=parsed.scheme,
                               http_host=conn.host, http_path=path,
                               http_status=resp.status, http_reason=resp.reason,
-                              http_response_content=body)
+                              http_response_content=body,
+                              http_response_headers=_resp_headers(resp))
 
     return resp.getheader('etag', '').strip('"')
 
@@ -1013,7 +1215,8 @@ def post_object(url, token, container, name, headers, http_conn=None,
         raise ClientException('Object POST failed', http_scheme=parsed.scheme,
                               http_host=conn.host, http_path=path,
                               http_status=resp.status, http_reason=resp.reason,
-                              http_response_content=body)
+                              http_response_content=body,
+                              http_response_headers=_resp_headers(resp))
 
 
 def delete_object(url, token=None, container=None, name=None, http_conn=None,
@@ -1068,7 +1271,116 @@ def delete_object(url, token=None, container=None, name=None, http_conn=None,
                               http_scheme=parsed.scheme, http_host=conn.host,
                               http_path=path, http_status=resp.status,
                               http_reason=resp.reason,
-                              http_response_content=body)
+                              http_response_content=body,
+                              http_response_headers=_resp_headers(resp))
+
+
+def copy_object(url, token, container, name, destination_container,
+                destination_name, headers=None, http_conn=None,
+                response_dict=None):
+    """
+    Copy an object within the cluster without passing its data through the
+    client, using a PUT with X-Copy-From.
+
+    Note that a copy of a large object manifest made this way is a copy of
+    the concatenated segments; see :func:`swiftclient.transfer.copy_object`
+    for a copy of the manifest itself.
+
+    :param url: storage URL
+    :param token: auth token
+    :param container: container name of the object to copy
+    :param name: name of the object to copy
+    :param destination_container: container name to copy the object to
+    :param destination_name: object name to copy the object to
+    :param headers: additional headers to include in the request, e.g.
+                    metadata to set on the copy
+    :param http_conn: HTTP connection object (If None, it will create the
+                      conn object)
+    :param response_dict: an optional dictionary into which to place
+                     the response - status, reason and headers
+    :returns: etag of the copy
+    :raises ClientException: HTTP PUT request failed
+    """
+    if http_conn:
+        parsed, conn = http_conn
+    else:
+        parsed, conn = http_connection(url)
+    path = '%s/%s/%s' % (parsed.path, quote(destination_container),
+                         quote(destination_name))
+    headers = dict(headers) if headers else {}
+    headers['X-Auth-Token'] = token
+    headers['X-Copy-From'] = quote('/%s/%s' % (container, name))
+    headers['Content-Length'] = '0'
+    conn.request('PUT', path, '', headers)
+    resp = conn.getresponse()
+    body = resp.read()
+    http_log(('%s%s' % (url.replace(parsed.path, ''), path), 'PUT',),
+             {'headers': headers}, resp, body)
+
+    store_response(resp, response_dict)
+
+    if resp.status < 200 or resp.status >= 300:
+        raise ClientException('Object COPY failed', http_scheme=parsed.scheme,
+                              http_host=conn.host, http_path=path,
+                              http_status=resp.status, http_reason=resp.reason,
+                              http_response_content=body,
+                              http_response_headers=_resp_headers(resp))
+
+    return resp.getheader('etag', '').strip('"')
+
+
+def bulk_delete(url, token, container, names, http_conn=None,
+                response_dict=None):
+    """
+    Delete many objects of a container with one request to the bulk
+    middleware.  The cluster limits the number of names per request; see
+    ``max_deletes_per_request`` in its ``bulk_delete`` capabilities.
+
+    :param url: storage URL
+    :param token: auth token
+    :param container: container name that the objects are in
+    :param names: list of object names to delete
+    :param http_conn: HTTP connection object (If None, it will create the
+                      conn object)
+    :param response_dict: an optional dictionary into which to place
+                     the response - status, reason and headers
+    :returns: a dict with the result of the bulk delete, as returned by the
+              cluster; its "Errors" item lists [name, status] of the objects
+              which could not be deleted
+    :raises ClientException: HTTP DELETE request failed, or the bulk delete
+                             failed as a whole
+    """
+    if http_conn:
+        parsed, conn = http_conn
+    else:
+        parsed, conn = http_connection(url)
+    path = '%s?bulk-delete' % parsed.path
+    headers = {'X-Auth-Token': token, 'Content-Type': 'text/plain',
+               'Accept': 'application/json'}
+    body = '\n'.join(quote('/%s/%s' % (container, name)) for name in names)
+    conn.request('DELETE', path, body, headers)
+    resp = conn.getresponse()
+    resp_body = resp.read()
+    http_log(('%s%s' % (url.replace(parsed.path, ''), path), 'DELETE',),
+             {'headers': headers}, resp, resp_body)
+
+    store_response(resp, response_dict)
+
+    if resp.status < 200 or resp.status >= 300:
+        raise ClientException('Bulk DELETE failed', http_scheme=parsed.scheme,
+                              http_host=conn.host, http_path=path,
+                              http_status=resp.status, http_reason=resp.reason,
+                              http_response_content=resp_body,
+                              http_response_headers=_resp_headers(resp))
+    result = json_loads(resp_body)
+    status = result.get('Response Status', '200')
+    if not status.startswith('2') and not result.get('Errors'):
+        raise ClientException('Bulk DELETE failed', http_scheme=parsed.scheme,
+                              http_host=conn.host, http_path=path,
+                              http_status=int(status.split()[0]),
+                              http_reason=status,
+                              http_response_content=resp_body)
+    return result
 
 
 def get_capabilities(http_conn):
@@ -1089,10 +1401,272 @@ def get_capabilities(http_conn):
                               http_scheme=parsed.scheme,
                               http_host=conn.host, http_path=parsed.path,
                               http_status=resp.status, http_reason=resp.reason,
-                              http_response_content=body)
+                              http_response_content=body,
+                              http_response_headers=_resp_headers(resp))
     return json_loads(body)
 
 
+class _Watchdog(object):
+    """
+    Raises :class:`socket.timeout` once a transfer has moved less than
+    ``min_speed`` bytes per second over ``period`` seconds.  Only the time
+    spent waiting for the network counts, as reported to :meth:`update`, so
+    a slow reader or writer of the data is not mistaken for a stall.
+    """
+
+    def __init__(self, min_speed, period):
+        self.min_speed = min_speed
+        self.period = period
+        self.reset()
+
+    def reset(self):
+        self.bytes = 0
+        self.seconds = 0.0
+
+    def update(self, nbytes, seconds):
+        self.bytes += nbytes
+        self.seconds += seconds
+        if self.seconds >= self.period:
+            if self.bytes < self.min_speed * self.seconds:
+                raise socket.timeout(
+                    'transfer stalled: %d bytes in %.1fs' % (
+                        self.bytes, self.seconds))
+            self.reset()
+
+
+def _watched_iter(chunks, watchdog):
+    chunks = iter(chunks)
+    while True:
+        start = time()
+        try:
+            chunk = next(chunks)
+        except StopIteration:
+            return
+        watchdog.update(len(chunk), time() - start)
+        yield chunk
+
+
+class _WatchedReader(object):
+    """
+    Reports the time a file-like object's consumer spends between reads,
+    that is sending what was read, to a :class:`_Watchdog`.
+    """
+
+    def __init__(self, fp, watchdog):
+        self.fp = fp
+        self.watchdog = watchdog
+        self.reset()
+
+    def reset(self):
+        self.watchdog.reset()
+        self._last_read = None
+        self._last_size = 0
+
+    def read(self, *args, **kwargs):
+        if self._last_read is not None:
+            self.watchdog.update(self._last_size, time() - self._last_read)
+        data = self.fp.read(*args, **kwargs)
+        self._last_read = time()
+        self._last_size = len(data)
+        return data
+
+
+class _RetryBody(object):
+    """
+    Iterates over the chunks of an object GET and, if the connection breaks
+    before the whole object has been read, transparently continues with a
+    ranged GET from the first byte not yet received.  Plain objects are
+    resumed with If-Match so a changed object is never spliced in; for large
+    objects the new response's ETag is checked instead.
+    """
+
+    def __init__(self, conn, container, obj, resp_chunk_size, headers,
+                 resp_headers, body, watchdog=None):
+        self.conn = conn
+        self.container = container
+        self.obj = obj
+        self.resp_chunk_size = resp_chunk_size
+        self.headers = dict(headers or {})
+        self.etag = resp_headers.get('etag')
+        self.manifest = 'x-object-manifest' in resp_headers or \
+            'x-static-large-object' in resp_headers
+        length = resp_headers.get('content-length')
+        self.length = int(length) if length is not None else None
+        self.body = self._response = body
+        self.watchdog = watchdog
+        self.bytes_read = 0
+        self.attempts = 0
+
+    def __iter__(self):
+        return self
+
+    def next(self):
+        while True:
+            start = time()
+            try:
+                buf = next(self.body)
+                if self.watchdog:
+                    self.watchdog.update(len(buf), time() - start)
+            except StopIteration:
+                if self.length is None or self.bytes_read >= self.length:
+                    raise
+                err = ClientException(
+                    'Object GET of %s/%s ended after %d of %d bytes' % (
+                        self.container, self.obj, self.bytes_read,
+                        self.length))
+                self._resume(err)
+                continue
+            except (socket.error, RequestException, Urllib3HTTPError,
+                    http_client.HTTPException) as err:
+                self._resume(err)
+                continue
+            self.bytes_read += len(buf)
+            return buf
+
+    __next__ = next
+
+    def _resume(self, err):
+        if self.attempts >= self.conn.retries:
+            raise err
+        self.attempts += 1
+        logger.warning('Resuming GET of %s/%s at byte %d: %s',
+                       self.container, self.obj, self.bytes_read, err)
+        self.conn._reset_http_conn()
+        if self.watchdog:
+            self.watchdog.reset()
+        headers = dict(self.headers)
+        headers['Range'] = 'bytes=%d-' % self.bytes_read
+        if self.etag and not self.manifest:
+            headers['If-Match'] = self.etag
+        self.close()
+        resp_headers, self.body = self.conn._retry(
+            None, get_object, self.container, self.obj,
+            resp_chunk_size=self.resp_chunk_size, headers=headers)
+        self._response = self.body
+        if resp_headers.get('etag') != self.etag:
+            self.close()
+            raise ClientException(
+                'Object %s/%s changed while it was being read' % (
+                    self.container, self.obj))
+        if 'content-range' not in resp_headers:
+            # The whole object was sent again; skip what was already read.
+            skip = self.bytes_read
+            while skip > 0:
+                buf = next(self.body, b'')
+                if not buf:
+                    self.close()
+                    raise ClientException(
+                        'Object %s/%s shrank while it was being read' % (
+                            self.container, self.obj))
+                skip -= len(buf)
+            if skip < 0:
+                self.body = itertools.chain([buf[skip:]], self.body)
+
+    def close(self):
+        """Releases the response being read, if it can be closed."""
+        close = getattr(self._response, 'close', None)
+        if callable(close):
+            close()
+
+
+class _EndpointBody(object):
+    """
+    Iterates over the chunks of a streamed object GET and calls
+    ``finish(err)`` once, when the body has been read, has failed or has
+    been closed (or dropped), so that the request counts against its
+    endpoint for as long as its data is being transferred.
+    """
+
+    def __init__(self, body, finish):
+        self.body = body
+        self._finish = finish
+
+    def __iter__(self):
+        return self
+
+    def next(self):
+        try:
+            return next(self.body)
+        except StopIteration:
+            self.close()
+            raise
+        except Exception as err:
+            self._done(err)
+            raise
+
+    __next__ = next
+
+    def _done(self, err=None):
+        finish, self._finish = self._finish, None
+        if finish:
+            finish(err)
+
+    def close(self):
+        self._done()
+        close = getattr(self.body, 'close', None)
+        if callable(close):
+            close()
+
+    def __del__(self):
+        self._done()
+
+
+def _limited_iter(chunks, bucket):
+    for chunk in chunks:
+        bucket.take(len(chunk))
+        yield chunk
+
+
+class _LimitedReader(object):
+    """Takes the bytes read from a file-like object from a token bucket."""
+
+    def __init__(self, fp, bucket):
+        self.fp = fp
+        self.bucket = bucket
+
+    def read(self, *args, **kwargs):
+        data = self.fp.read(*args, **kwargs)
+        self.bucket.take(len(data))
+        return data
+
+
+def _run_batch_op(conn, op):
+    name = op['op']
+    container = op['container']
+    obj = op.get('object')
+    headers = op.get('headers') or {}
+    if name == 'head':
+        if obj is None:
+            return conn.head_container(container)
+        return conn.head_object(container, obj)
+    if name == 'post':
+        if obj is None:
+            return conn.post_container(container, headers)
+        return conn.post_object(container, obj, headers)
+    if name == 'delete':
+        if obj is None:
+            return conn.delete_container(container)
+        return conn.delete_object(container, obj,
+                                  query_string=op.get('query_string'))
+    if name == 'put':
+        if obj is None:
+            return conn.put_container(container, headers=headers)
+        return conn.put_object(container, obj, op.get('contents', ''),
+                               content_type=op.get('content_type'),
+                               headers=headers)
+    raise ValueError('Unknown batch operation %r' % (name,))
+
+
+def _batch_job(conn, results, index, op):
+    result = dict(op, index=index)
+    try:
+        result['result'] = _run_batch_op(conn, op)
+        result['success'] = True
+    except Exception as err:
+        result.update(success=False, error=err)
+    results.put(result)
+
+
 class Connection(object):
     """Convenience class to make requests that will also retry the request"""
 
@@ -1101,7 +1675,11 @@ class Connection(object):
                  starting_backoff=1, max_backoff=64, tenant_name=None,
                  os_options=None, auth_version="1", cacert=None,
                  insecure=False, ssl_compression=True,
-                 retry_on_ratelimit=False):
+                 retry_on_ratelimit=False, upload_limit=None,
+                 download_limit=None, request_limit=None,
+                 retry_policy=None, connect_timeout=None, read_timeout=None,
+                 min_speed=None, min_speed_period=30, hedge_policy=None,
+                 endpoints=None, transport=None):
         """
         :param authurl: authentication URL
         :param user: user name to authenticate as
@@ -1131,6 +1709,44 @@ class Connection(object):
                                    raise an exception to the caller. Setting
                                    this parameter to True will cause a retry
                                    after a backoff.
+        :param upload_limit: a :class:`swiftclient.utils.TokenBucket` which
+                             object data sent is taken from, in bytes
+        :param download_limit: a :class:`swiftclient.utils.TokenBucket`
+                               which object data received is taken from, in
+                               bytes
+        :param request_limit: a :class:`swiftclient.utils.TokenBucket`
+                              which every request attempt takes one token
+                              from
+        :param retry_policy: a :class:`swiftclient.retry.RetryPolicy` which
+                             decides which failures are retried and how long
+                             to wait; defaults to exponential backoff from
+                             ``starting_backoff`` to ``max_backoff``
+        :param connect_timeout: seconds to wait for a connection to be
+                                accepted; None waits forever
+        :param read_timeout: seconds to wait for each read of a response;
+                             None waits forever
+        :param min_speed: if given, an object GET or PUT whose body moves
+                          slower than ``min_speed`` bytes per second over
+                          ``min_speed_period`` seconds of network time is
+                          aborted, to be resumed (GET) or retried (PUT of a
+                          seekable file) on a new connection
+        :param min_speed_period: seconds over which ``min_speed`` is measured
+        :param hedge_policy: a :class:`swiftclient.retry.HedgePolicy`; if
+                             given, HEAD requests, listings and GETs of
+                             whole objects which are slow to answer are sent
+                             again over another connection, and the first
+                             answer is used
+        :param endpoints: a :class:`swiftclient.endpoints.EndpointPool` of
+                          storage URLs equivalent to the one from auth to
+                          spread requests over; if it has none, it is
+                          filled from the service catalog
+        :param transport: the class of HTTP connection to use, or its name
+                          in :data:`TRANSPORTS`; ``'raw'`` costs much less
+                          CPU per request than the default ``'requests'``
+
+        Give the connections of all worker threads the same buckets to limit
+        them together, and the same retry policy to pace their retries
+        together.
         """
         self.authurl = authurl
         self.user = user
@@ -1152,28 +1768,94 @@ class Connection(object):
         self.ssl_compression = ssl_compression
         self.auth_end_time = 0
         self.retry_on_ratelimit = retry_on_ratelimit
+        self.upload_limit = upload_limit
+        self.download_limit = download_limit
+        self.request_limit = request_limit
+        self.retry_policy = retry_policy or RetryPolicy(
+            starting_backoff, max_backoff, retry_on_ratelimit)
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.min_speed = min_speed
+        self.min_speed_period = min_speed_period
+        self.hedge_policy = hedge_policy
+        self.endpoints = endpoints
+        self.transport = transport
+        self._endpoint_conns = {}
+        self._spares = []
+        self._spares_lock = Lock()
+
+    def _clone(self):
+        """
+        Return a new connection with the same settings which reuses this
+        connection's storage URL and token, for use by worker threads.
+        """
+        return type(self)(authurl=self.authurl, user=self.user, key=self.key,
+                          retries=self.retries, preauthurl=self.url,
+                          preauthtoken=self.token, snet=self.snet,
+                          starting_backoff=self.starting_backoff,
+                          max_backoff=self.max_backoff,
+                          os_options=dict(self.os_options),
+                          auth_version=self.auth_version,
+                          cacert=self.cacert, insecure=self.insecure,
+                          ssl_compression=self.ssl_compression,
+                          retry_on_ratelimit=self.retry_on_ratelimit,
+                          upload_limit=self.upload_limit,
+                          download_limit=self.download_limit,
+                          request_limit=self.request_limit,
+                          retry_policy=self.retry_policy,
+                          connect_timeout=self.connect_timeout,
+                          read_timeout=self.read_timeout,
+                          min_speed=self.min_speed,
+                          min_speed_period=self.min_speed_period,
+                          hedge_policy=self.hedge_policy,
+                          endpoints=self.endpoints,
+                          transport=self.transport)
 
     def close(self):
-        if self.http_conn and type(self.http_conn) is tuple\
-                and len(self.http_conn) > 1:
-            conn = self.http_conn[1]
-            if hasattr(conn, 'close') and callable(conn.close):
-                conn.close()
-                self.http_conn = None
+        endpoint_conns, self._endpoint_conns = self._endpoint_conns, {}
+        for http_conn in [self.http_conn] + [
+                c for c in endpoint_conns.values() if c is not self.http_conn]:
+            if http_conn and type(http_conn) is tuple\
+                    and len(http_conn) > 1:
+                conn = http_conn[1]
+                if hasattr(conn, 'close') and callable(conn.close):
+                    conn.close()
+                    if http_conn is self.http_conn:
+                        self.http_conn = None
+        with self._spares_lock:
+            spares, self._spares = self._spares, []
+        for spare in spares:
+            spare.close()
 
     def get_auth(self):
-        return get_auth(self.authurl, self.user, self.key,
-                        snet=self.snet,
-                        auth_version=self.auth_version,
-                        os_options=self.os_options,
-                        cacert=self.cacert,
-                        insecure=self.insecure)
-
-    def http_connection(self):
-        return http_connection(self.url,
+        discover = bool(self.endpoints and self.endpoints.discover)
+        url, token = get_auth(self.authurl, self.user, self.key,
+                              snet=self.snet,
+                              auth_version=self.auth_version,
+                              os_options=self.os_options,
+                              cacert=self.cacert,
+                              insecure=self.insecure,
+                              all_endpoints=discover)
+        if discover:
+            self.endpoints.set_urls(url)
+            url = url[0]
+        return url, token
+
+    def http_connection(self, url=None):
+        kwargs = {}
+        if self.connect_timeout is not None or self.read_timeout is not None:
+            kwargs['timeout'] = (self.connect_timeout, self.read_timeout)
+        if self.transport:
+            kwargs['transport'] = self.transport
+        return http_connection(url or self.url,
                                cacert=self.cacert,
                                insecure=self.insecure,
-                               ssl_compression=self.ssl_compression)
+                               ssl_compression=self.ssl_compression,
+                               **kwargs)
+
+    def _watchdog(self):
+        if self.min_speed:
+            return _Watchdog(self.min_speed, self.min_speed_period)
 
     def _add_response_dict(self, target_dict, kwargs):
         if target_dict is not None:
@@ -1187,33 +1869,65 @@ class Connection(object):
     def _retry(self, reset_func, func, *args, **kwargs):
         self.attempts = 0
         retried_auth = False
-        backoff = self.starting_backoff
+        backoff = None
+        policy = self.retry_policy
         caller_response_dict = kwargs.pop('response_dict', None)
+        url = failed = None
         while self.attempts <= self.retries:
             self.attempts += 1
+            start = None
+            wait = policy.wait()
+            if wait > 0:
+                sleep(wait)
             try:
                 if not self.url or not self.token:
                     self.url, self.token = self.get_auth()
                     self.http_conn = None
+                    self._endpoint_conns = {}
                 self.auth_end_time = time()
+                url = self.url
+                if self.endpoints:
+                    # fail over to another endpoint after a failure
+                    url = self.endpoints.choose(avoid=failed) or self.url
+                    self.http_conn = self._endpoint_conns.get(url)
                 if not self.http_conn:
-                    self.http_conn = self.http_connection()
+                    self.http_conn = self.http_connection(url)
+                    if self.endpoints:
+                        self._endpoint_conns[url] = self.http_conn
                 kwargs['http_conn'] = self.http_conn
                 if caller_response_dict is not None:
                     kwargs['response_dict'] = {}
-                rv = func(self.url, self.token, *args, **kwargs)
+                if self.request_limit:
+                    self.request_limit.take()
+                start = self._endpoint_start(url)
+                rv = func(url, self.token, *args, **kwargs)
+                if self.endpoints and func is get_object and \
+                        kwargs.get('resp_chunk_size'):
+                    # the endpoint stays busy until the body has been read
+                    rv = rv[0], _EndpointBody(rv[1], functools.partial(
+                        self._endpoint_finish, url, start))
+                else:
+                    self._endpoint_finish(url, start)
                 self._add_response_dict(caller_response_dict, kwargs)
+                policy.record(True)
                 return rv
             except SSLError:
                 raise
             except (socket.error, RequestException) as e:
+                self._endpoint_finish(url, start, e)
                 self._add_response_dict(caller_response_dict, kwargs)
+                policy.record(False)
                 if self.attempts > self.retries:
                     logger.exception(e)
                     raise
-                self.http_conn = None
-            except ClientException as err:
+                self._reset_http_conn()
+                err = e
+            except ClientException as e:
+                err = e
+                self._endpoint_finish(url, start, err)
                 self._add_response_dict(caller_response_dict, kwargs)
+                retryable = policy.should_retry(err)
+                policy.record(not retryable)
                 if self.attempts > self.retries:
                     logger.exception(err)
                     raise
@@ -1225,23 +1939,109 @@ class Connection(object):
                         logger.exception(err)
                         raise
                     retried_auth = True
-                elif err.http_status == 408:
-                    self.http_conn = None
-                elif 500 <= err.http_status <= 599:
-                    pass
-                elif self.retry_on_ratelimit and err.http_status == 498:
-                    pass
-                else:
+                    # fetching a new token is not a retry of a failure, so
+                    # it neither backs off nor draws on the policy's budget
+                    if reset_func:
+                        reset_func(func, *args, **kwargs)
+                    continue
+                elif not retryable:
                     logger.exception(err)
                     raise
+                elif err.http_status == 408:
+                    self._reset_http_conn()
+            failed = url
+            backoff = policy.backoff(self.attempts, backoff, err)
+            if backoff is None:
+                logger.error('Not retrying: %s', err)
+                raise err
             sleep(backoff)
-            backoff = min(backoff * 2, self.max_backoff)
             if reset_func:
                 reset_func(func, *args, **kwargs)
 
+    def _reset_http_conn(self):
+        for url, http_conn in list(self._endpoint_conns.items()):
+            if http_conn is self.http_conn:
+                del self._endpoint_conns[url]
+        self.http_conn = None
+
+    def _endpoint_start(self, url):
+        if self.endpoints:
+            self.endpoints.start(url)
+        return time()
+
+    def _endpoint_finish(self, url, start, err=None):
+        if not self.endpoints or start is None:
+            return
+        # only connection errors and server errors count against an endpoint
+        status = getattr(err, 'http_status', None)
+        success = err is None or (isinstance(err, ClientException) and
+                                  not (status and 500 <= status <= 599))
+        self.endpoints.finish(url, success, time() - start)
+
+    def _spare(self):
+        with self._spares_lock:
+            if self._spares:
+                return self._spares.pop()
+        return self._clone()
+
+    def _idempotent(self, func, *args, **kwargs):
+        """
+        Make an idempotent request like :meth:`_retry`, hedging it if the
+        ``hedge_policy`` says so: the request is made over a spare connection
+        and, if it has not answered after the policy's delay, again over
+        another one, and whichever answers first is used.
+        """
+        if not (self.hedge_policy and self.url and self.token) or \
+                kwargs.get('response_dict') is not None:
+            return self._retry(None, func, *args, **kwargs)
+        delay = self.hedge_policy.delay()
+        if delay is None:
+            start = time()
+            rv = self._retry(None, func, *args, **kwargs)
+            self.hedge_policy.record(time() - start)
+            return rv
+        answers = Queue()
+
+        def attempt(conn, first):
+            start = time()
+            try:
+                answer = (conn, conn._retry(None, func, *args, **kwargs),
+                          None)
+                if first:
+                    self.hedge_policy.record(time() - start)
+            except Exception:
+                answer = (conn, None, sys.exc_info())
+            with self._spares_lock:
+                self._spares.append(conn)
+            answers.put(answer)
+
+        copies = []
+        for first in (True, False):
+            copy = Thread(target=attempt, args=(self._spare(), first))
+            copy.daemon = True
+            copy.start()
+            copies.append(copy)
+            try:
+                conn, rv, exc_info = answers.get(timeout=delay)
+                break
+            except Empty:
+                pass
+        else:
+            conn, rv, exc_info = answers.get()
+        if exc_info and len(copies) > 1:
+            # the other copy may still succeed
+            other = answers.get()
+            if not other[2]:
+                conn, rv, exc_info = other
+        self.attempts = conn.attempts
+        self.url, self.token = conn.url, conn.token
+        if exc_info:
+            six.reraise(*exc_info)
+        return rv
+
     def head_account(self):
         """Wrapper for :func:`head_account`"""
-        return self._retry(None, head_account)
+        return self._idempotent(head_account)
 
     def get_account(self, marker=None, limit=None, prefix=None,
                     end_marker=None, full_listing=False):
@@ -1249,9 +2049,9 @@ class Connection(object):
         # TODO(unknown): With full_listing=True this will restart the entire
         # listing with each retry. Need to make a better version that just
         # retries where it left off.
-        return self._retry(None, get_account, marker=marker, limit=limit,
-                           prefix=prefix, end_marker=end_marker,
-                           full_listing=full_listing)
+        return self._idempotent(get_account, marker=marker, limit=limit,
+                                prefix=prefix, end_marker=end_marker,
+                                full_listing=full_listing)
 
     def post_account(self, headers, response_dict=None):
         """Wrapper for :func:`post_account`"""
@@ -1260,7 +2060,7 @@ class Connection(object):
 
     def head_container(self, container):
         """Wrapper for :func:`head_container`"""
-        return self._retry(None, head_container, container)
+        return self._idempotent(head_container, container)
 
     def get_container(self, container, marker=None, limit=None, prefix=None,
                       delimiter=None, end_marker=None, path=None,
@@ -1269,10 +2069,10 @@ class Connection(object):
         # TODO(unknown): With full_listing=True this will restart the entire
         # listing with each retry. Need to make a better version that just
         # retries where it left off.
-        return self._retry(None, get_container, container, marker=marker,
-                           limit=limit, prefix=prefix, delimiter=delimiter,
-                           end_marker=end_marker, path=path,
-                           full_listing=full_listing)
+        return self._idempotent(get_container, container, marker=marker,
+                                limit=limit, prefix=prefix,
+                                delimiter=delimiter, end_marker=end_marker,
+                                path=path, full_listing=full_listing)
 
     def put_container(self, container, headers=None, response_dict=None):
         """Wrapper for :func:`put_container`"""
@@ -1291,15 +2091,61 @@ class Connection(object):
 
     def head_object(self, container, obj):
         """Wrapper for :func:`head_object`"""
-        return self._retry(None, head_object, container, obj)
+        return self._idempotent(head_object, container, obj)
 
     def get_object(self, container, obj, resp_chunk_size=None,
                    query_string=None, response_dict=None, headers=None):
-        """Wrapper for :func:`get_object`"""
-        return self._retry(None, get_object, container, obj,
-                           resp_chunk_size=resp_chunk_size,
-                           query_string=query_string,
-                           response_dict=response_dict, headers=headers)
+        """
+        Wrapper for :func:`get_object`
+
+        When ``resp_chunk_size`` is given, an interruption while the returned
+        contents are being read is retried (up to ``retries`` times) by
+        continuing with a ranged GET from where the read stopped.  Without
+        it, the GET may be hedged (see ``hedge_policy``).
+        """
+        if resp_chunk_size:
+            rheaders, body = self._retry(None, get_object, container, obj,
+                                         resp_chunk_size=resp_chunk_size,
+                                         query_string=query_string,
+                                         response_dict=response_dict,
+                                         headers=headers)
+        else:
+            rheaders, body = self._idempotent(get_object, container, obj,
+                                              query_string=query_string,
+                                              response_dict=response_dict,
+                                              headers=headers)
+        watchdog = resp_chunk_size and self._watchdog()
+        if resp_chunk_size and not query_string and self.retries > 0 and \
+                not any(k.lower() == 'range' for k in headers or {}):
+            body = _RetryBody(self, container, obj, resp_chunk_size, headers,
+                              rheaders, body, watchdog)
+        elif watchdog:
+            body = _watched_iter(body, watchdog)
+        if not self.download_limit:
+            pass
+        elif resp_chunk_size:
+            body = _limited_iter(body, self.download_limit)
+        else:
+            self.download_limit.take(len(body))
+        return rheaders, body
+
+    def open_object(self, container, obj,
+                    block_size=objectio.DEFAULT_BLOCK_SIZE,
+                    cache_size=objectio.DEFAULT_CACHE_SIZE,
+                    readahead=objectio.DEFAULT_READAHEAD, headers=None):
+        """
+        Open an object as a read-only, seekable file object which fetches
+        blocks with ranged GETs as they are read.  See
+        :class:`swiftclient.objectio.ObjectReader`.
+
+        :returns: an :class:`io.RawIOBase` file object
+        """
+        return objectio.ObjectReader(self, container, obj,
+                                     block_size=block_size,
+                                     cache_size=cache_size,
+                                     readahead=readahead,
+                                     connection_maker=self._clone,
+                                     headers=headers)
 
     def put_object(self, container, obj, contents, content_length=None,
                    etag=None, chunk_size=None, content_type=None,
@@ -1323,12 +2169,71 @@ class Connection(object):
                     orig_pos = tell()
                     reset_func = lambda *a, **k: seek(orig_pos)
 
+        if not self.upload_limit or not contents:
+            pass
+        elif hasattr(contents, 'read'):
+            contents = _LimitedReader(contents, self.upload_limit)
+        elif isinstance(contents, (six.binary_type, six.text_type)):
+            # taken once, however many attempts send it
+            self.upload_limit.take(len(encode_utf8(contents)))
+        else:
+            contents = _limited_iter(contents, self.upload_limit)
+
+        watchdog = self._watchdog()
+        if watchdog and hasattr(contents, 'read'):
+            # outside the rate limit, whose waits in read() must not count
+            contents = _WatchedReader(contents, watchdog)
+            if reset_func:
+                reset = reset_func
+
+                def reset_func(*args, **kwargs):
+                    reset(*args, **kwargs)
+                    contents.reset()
+
         return self._retry(reset_func, put_object, container, obj, contents,
                            content_length=content_length, etag=etag,
                            chunk_size=chunk_size, content_type=content_type,
                            headers=headers, query_string=query_string,
                            response_dict=response_dict)
 
+    def upload_stream(self, container, obj, fileobj,
+                      segment_size=transfer.DEFAULT_SEGMENT_SIZE,
+                      segment_container=None, segment_threads=4,
+                      headers=None, content_type=None):
+        """
+        Upload a stream of unknown length, such as a pipe, as a static large
+        object whose segments are uploaded concurrently and retried on their
+        own.  See :func:`swiftclient.transfer.upload_stream`.
+
+        :returns: the etag of the object or manifest
+        """
+        return transfer.upload_stream(self, container, obj, fileobj,
+                                      segment_size=segment_size,
+                                      segment_container=segment_container,
+                                      segment_threads=segment_threads,
+                                      headers=headers,
+                                      content_type=content_type,
+                                      connection_maker=self._clone)
+
+    def create_object(self, container, obj,
+                      segment_size=transfer.DEFAULT_SEGMENT_SIZE,
+                      segment_container=None, segment_threads=4,
+                      headers=None, content_type=None):
+        """
+        Create an object through a writable file object which uploads full
+        segments in the background and writes the object on ``close()``.
+        See :class:`swiftclient.objectio.ObjectWriter`.
+
+        :returns: an :class:`io.RawIOBase` file object
+        """
+        return objectio.ObjectWriter(self, container, obj,
+                                     segment_size=segment_size,
+                                     segment_container=segment_container,
+                                     segment_threads=segment_threads,
+                                     headers=headers,
+                                     content_type=content_type,
+                                     connection_maker=self._clone)
+
     def post_object(self, container, obj, headers, response_dict=None):
         """Wrapper for :func:`post_object`"""
         return self._retry(None, post_object, container, obj, headers,
@@ -1341,6 +2246,85 @@ class Connection(object):
                            query_string=query_string,
                            response_dict=response_dict)
 
+    def copy_object(self, container, obj, destination_container,
+                    destination_obj, headers=None, response_dict=None):
+        """Wrapper for :func:`copy_object`"""
+        return self._retry(None, copy_object, container, obj,
+                           destination_container, destination_obj,
+                           headers=headers, response_dict=response_dict)
+
+    def bulk_delete(self, container, objects, response_dict=None):
+        """Wrapper for :func:`bulk_delete`"""
+        return self._retry(None, bulk_delete, container, objects,
+                           response_dict=response_dict)
+
+    def batch(self, ops, concurrency=10, ordered=True, pool=None):
+        """
+        Run many small requests concurrently, each retried like any other
+        request of this connection.
+
+        Every operation is a dict with an ``op`` of ``head``, ``post``,
+        ``delete`` or ``put``, a ``container`` and an optional ``object``
+        (the operation applies to the container without one), plus
+        ``headers`` for a post or put, ``contents`` and ``content_type`` for
+        a put, and ``query_string`` for a delete.  The requests are made over
+        ``concurrency`` connections cloned from this one, and only a bounded
+        number of operations are taken from ``ops`` ahead of the results
+        consumed, so ``ops`` may be a generator of any length.  Pass a
+        ``pool`` to make the requests over its connections instead, which
+        lets many batches share the same connections; it is left running.
+
+        :param ops: an iterable of operation dicts
+        :param concurrency: number of requests to make at once
+        :param ordered: yield the results in the order of ``ops`` rather than
+                        as they complete
+        :param pool: a :class:`ConnectionThreadPool` of connections cloned
+                     from this one to run the operations on
+        :returns: an iterator of result dicts, each a copy of its operation
+                  with ``index`` (its position in ``ops``) and ``success``,
+                  and either the method's return value as ``result`` (e.g.
+                  the headers of a head) or the exception as ``error``
+        """
+        results = Queue()
+        own_pool = pool is None
+        if own_pool:
+            pool = ConnectionThreadPool(self._clone, concurrency)
+        window = max(1, concurrency) * 4
+        ops = iter(ops)
+        submitted = outstanding = next_index = 0
+        done = {}
+        futures = {}
+        try:
+            while True:
+                while outstanding < window:
+                    try:
+                        op = next(ops)
+                    except StopIteration:
+                        break
+                    futures[submitted] = pool.submit(
+                        _batch_job, results, submitted, op)
+                    submitted += 1
+                    outstanding += 1
+                if not outstanding:
+                    break
+                result = results.get()
+                del futures[result['index']]
+                if not ordered:
+                    outstanding -= 1
+                    yield result
+                    continue
+                done[result['index']] = result
+                while next_index in done:
+                    outstanding -= 1
+                    yield done.pop(next_index)
+                    next_index += 1
+        finally:
+            if own_pool:
+                pool.shutdown(wait=False, cancel=True)
+            else:
+                for future in futures.values():
+                    future.cancel()
+
     def get_capabilities(self, url=None):
         if not url:
             url, _ = self.get_auth()
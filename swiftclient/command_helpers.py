@@ -78,8 +78,14 @@ def stat_container(conn, options, args, thread_manager):
 
 def stat_object(conn, options, args, thread_manager):
     headers = conn.head_object(args[0], args[1])
+    print_object_stat(conn, options, args[0], args[1], headers,
+                      thread_manager)
+
+
+def print_object_stat(conn, options, container, obj, headers,
+                      thread_manager):
     if options.verbose > 1:
-        path = '%s/%s/%s' % (conn.url, args[0], args[1])
+        path = '%s/%s/%s' % (conn.url, container, obj)
         thread_manager.print_items((
             ('URL', path),
             ('Auth Token', conn.token),
@@ -88,8 +94,8 @@ def stat_object(conn, options, args, thread_manager):
                                options.human).lstrip()
     thread_manager.print_items((
         ('Account', conn.url.rsplit('/', 1)[-1]),
-        ('Container', args[0]),
-        ('Object', args[1]),
+        ('Container', container),
+        ('Object', obj),
         ('Content Type', headers.get('content-type')),
         ('Content Length', content_length),
         ('Last Modified', headers.get('last-modified')),
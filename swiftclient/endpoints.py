@@ -0,0 +1,177 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Spreading requests over several equivalent storage URLs."""
+
+from threading import Lock
+from time import time
+
+import requests
+from six.moves.urllib.parse import urlparse, urlunparse
+
+
+class _Endpoint(object):
+
+    def __init__(self, url):
+        self.url = url
+        self.outstanding = 0
+        self.latency = None
+        self.failures = 0
+        self.ejected_until = 0
+
+
+class EndpointPool(object):
+    """
+    A set of storage URLs which all serve the same account, such as several
+    proxies or regions, for :class:`swiftclient.client.Connection` to spread
+    its requests over.
+
+    Each request goes to the healthy endpoint with the fewest requests in
+    flight, and of those to the one with the lowest average latency.  An
+    endpoint which fails ``max_failures`` requests in a row (connection
+    errors and 5xx responses) is ejected for ``ejection_period`` seconds;
+    after that it is sent requests again, and ejected again by its next
+    failure.  A request which fails is retried on another endpoint if there
+    is one.  If every endpoint is ejected, the one due back soonest is used.
+
+    If no ``urls`` are given, a connection fills the pool with every
+    endpoint of the service catalog which matches its options when it
+    authenticates.  A pool is meant to be shared by all the connections of
+    a job, and is thread-safe.
+    """
+
+    def __init__(self, urls=None, max_failures=3, ejection_period=30,
+                 latency_weight=0.3):
+        """
+        :param urls: the equivalent storage URLs
+        :param max_failures: number of failures in a row which eject an
+                             endpoint
+        :param ejection_period: seconds an endpoint stays ejected
+        :param latency_weight: weight of each new latency in the moving
+                               average of an endpoint's latency
+        """
+        self.max_failures = max_failures
+        self.ejection_period = ejection_period
+        self.latency_weight = latency_weight
+        self.discover = not urls
+        self._lock = Lock()
+        self._endpoints = []
+        self.set_urls(urls or [])
+
+    @property
+    def urls(self):
+        with self._lock:
+            return [endpoint.url for endpoint in self._endpoints]
+
+    def set_urls(self, urls):
+        """
+        Replace the storage URLs of the pool, keeping what is known about
+        those which were already in it.
+        """
+        with self._lock:
+            known = dict((endpoint.url, endpoint)
+                         for endpoint in self._endpoints)
+            self._endpoints = [known.get(url) or _Endpoint(url)
+                               for url in urls]
+
+    def choose(self, avoid=None):
+        """
+        Returns the storage URL to send the next request to, or None if the
+        pool is empty.
+
+        :param avoid: a URL not to choose unless there is no other, such as
+                      one which just failed
+        """
+        now = time()
+        with self._lock:
+            candidates = [endpoint for endpoint in self._endpoints
+                          if endpoint.url != avoid] or self._endpoints
+            if not candidates:
+                return None
+            healthy = [endpoint for endpoint in candidates
+                       if endpoint.ejected_until <= now]
+            if not healthy:
+                return min(candidates,
+                           key=lambda endpoint: endpoint.ejected_until).url
+            # endpoints without a latency yet are tried first
+            return min(healthy, key=lambda endpoint: (
+                endpoint.outstanding, endpoint.latency is not None,
+                endpoint.latency)).url
+
+    def start(self, url):
+        """Records that a request to ``url`` has been sent."""
+        with self._lock:
+            for endpoint in self._endpoints:
+                if endpoint.url == url:
+                    endpoint.outstanding += 1
+
+    def finish(self, url, success, seconds=None):
+        """
+        Records that a request to ``url`` has been answered.
+
+        :param success: False if the endpoint failed the request
+        :param seconds: the time the endpoint took to answer
+        """
+        with self._lock:
+            for endpoint in self._endpoints:
+                if endpoint.url == url:
+                    endpoint.outstanding = max(0, endpoint.outstanding - 1)
+                    self._update(endpoint, success, seconds)
+
+    def _update(self, endpoint, success, seconds=None):
+        if not success:
+            endpoint.failures += 1
+            if endpoint.failures >= self.max_failures:
+                endpoint.failures = self.max_failures - 1
+                endpoint.ejected_until = time() + self.ejection_period
+            return
+        endpoint.failures = 0
+        endpoint.ejected_until = 0
+        if seconds is None:
+            return
+        if endpoint.latency is None:
+            endpoint.latency = seconds
+        else:
+            endpoint.latency += self.latency_weight * (
+                seconds - endpoint.latency)
+
+    def check(self, timeout=5, **kwargs):
+        """
+        Ask the ``/healthcheck`` of the server behind each endpoint whether
+        it is healthy, ejecting the endpoints which are not and taking back
+        those which are.  Extra keyword arguments are passed to
+        :func:`requests.get`, such as ``verify``.
+
+        :returns: a dict of each URL to whether it is healthy
+        """
+        health = {}
+        for url in self.urls:
+            parsed = urlparse(url)
+            try:
+                healthy = requests.get(
+                    urlunparse((parsed.scheme, parsed.netloc, '/healthcheck',
+                                '', '', '')),
+                    timeout=timeout, **kwargs).status_code == 200
+            except requests.RequestException:
+                healthy = False
+            health[url] = healthy
+            with self._lock:
+                for endpoint in self._endpoints:
+                    if endpoint.url != url:
+                        continue
+                    if healthy:
+                        self._update(endpoint, True)
+                    else:
+                        endpoint.failures = self.max_failures - 1
+                        self._update(endpoint, False)
+        return health
@@ -0,0 +1,137 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Checkpoint journal for restarting long-running jobs."""
+
+import os
+from threading import Event, Lock, Thread
+from weakref import WeakSet
+
+try:
+    import simplejson as json
+except ImportError:
+    import json
+
+OK = 'ok'
+SKIP = 'skip'
+FAIL = 'fail'
+
+_open_journals = WeakSet()
+
+
+class Journal(object):
+    """
+    An append-only record of the outcome of every item of a job.
+
+    Each call to :meth:`record` appends one compact JSON line
+    ``["<status>","<key>"]`` where status is ``ok``, ``skip`` or ``fail``.
+    Records are only queued in memory by the calling thread; a background
+    thread writes out and fsyncs everything queued at most every
+    ``flush_interval`` seconds (group commit), so journaling adds no I/O to
+    the workers.
+
+    When an existing journal is opened, the items whose last record is ``ok``
+    or ``skip`` are reported as done by :meth:`is_done` so a restarted job
+    can pass over them; failed items are not done and will be retried.
+    """
+
+    def __init__(self, path, flush_interval=1.0):
+        """
+        :param path: file to read earlier records from and append to
+        :param flush_interval: maximum number of seconds between writes
+        """
+        self.path = path
+        self.flush_interval = flush_interval
+        self.done = set()
+        line = '\n'
+        try:
+            with open(path) as fp:
+                for line in fp:
+                    try:
+                        status, key = json.loads(line)
+                    except ValueError:
+                        # a torn write from a crash mid-line
+                        continue
+                    if status == FAIL:
+                        self.done.discard(key)
+                    else:
+                        self.done.add(key)
+        except IOError:
+            pass
+        self._fp = open(path, 'a')
+        if not line.endswith('\n'):
+            self._fp.write('\n')
+        self._lock = Lock()
+        self._write_lock = Lock()
+        self._pending = []
+        self._closed = Event()
+        self._flusher = Thread(target=self._flush_loop)
+        self._flusher.daemon = True
+        self._flusher.start()
+        _open_journals.add(self)
+
+    def is_done(self, key):
+        """Return True if an earlier run completed or skipped ``key``."""
+        if isinstance(key, bytes):
+            key = key.decode('utf-8')
+        return key in self.done
+
+    def record(self, status, key):
+        """Queue a record of ``key`` having finished with ``status``."""
+        if isinstance(key, bytes):
+            key = key.decode('utf-8')
+        with self._lock:
+            self._pending.append(json.dumps([status, key],
+                                            separators=(',', ':')))
+
+    def flush(self):
+        """Write out and fsync every queued record."""
+        with self._write_lock:
+            with self._lock:
+                pending, self._pending = self._pending, []
+            if not pending or self._fp.closed:
+                return
+            self._fp.write('\n'.join(pending) + '\n')
+            self._fp.flush()
+            os.fsync(self._fp.fileno())
+
+    def _flush_loop(self):
+        while not self._closed.wait(self.flush_interval):
+            self.flush()
+
+    def close(self):
+        """Flush the remaining records and close the journal file."""
+        self._closed.set()
+        self._flusher.join()
+        self.flush()
+        with self._write_lock:
+            self._fp.close()
+        _open_journals.discard(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def flush_journals():
+    """Flush every open journal, e.g. before exiting on a signal."""
+    for journal in list(_open_journals):
+        journal.flush()
+
+
+def close_journals():
+    """Close every open journal."""
+    for journal in list(_open_journals):
+        journal.close()
@@ -16,15 +16,19 @@
 from __future__ import print_function
 
 from itertools import chain
+import multiprocessing
 import six
 import sys
-from time import sleep
-from six.moves.queue import Queue
-from threading import Thread
+from time import sleep, time
+from six.moves.queue import Empty, PriorityQueue, Queue
+from threading import Event, Lock, Thread
 from traceback import format_exception
 
 from swiftclient.exceptions import ClientException
 
+DEFAULT_FLUSH_SIZE = 64 * 1024
+DEFAULT_FLUSH_INTERVAL = 0.5
+
 
 class StopWorkerThreadSignal(object):
     pass
@@ -167,6 +171,252 @@ class QueueFunctionManager(object):
                     self.thread_manager.error(''.join(format_exception(*info)))
 
 
+class Future(object):
+    """
+    The eventual result of a function submitted to a
+    :class:`ConnectionThreadPool`.
+    """
+
+    def __init__(self):
+        self._event = Event()
+        self._result = None
+        self._exc_info = None
+        self._callbacks = []
+        self._lock = Lock()
+        self._running = False
+        self._cancelled = False
+
+    def done(self):
+        return self._event.is_set()
+
+    def cancel(self):
+        """
+        Stop the function from running if it has not started yet; a
+        cancelled :class:`Future` never completes.
+
+        :returns: True if the function will not run
+        """
+        with self._lock:
+            if not self._running and not self._event.is_set():
+                self._cancelled = True
+            return self._cancelled
+
+    def _start(self):
+        with self._lock:
+            self._running = not self._cancelled
+            return self._running
+
+    def add_done_callback(self, fn):
+        """
+        Call ``fn(future)`` once the function has finished, from the thread
+        which ran it, or straight away if it already has.
+        """
+        with self._lock:
+            if not self._event.is_set():
+                self._callbacks.append(fn)
+                return
+        fn(self)
+
+    def result(self, timeout=None):
+        """
+        Wait for the function to finish and return its result, re-raising any
+        exception it raised.
+        """
+        if not self._event.wait(timeout):
+            raise RuntimeError('Timed out waiting for result')
+        if self._exc_info:
+            six.reraise(*self._exc_info)
+        return self._result
+
+    def exception(self, timeout=None):
+        if not self._event.wait(timeout):
+            raise RuntimeError('Timed out waiting for result')
+        return self._exc_info and self._exc_info[1]
+
+    def set_result(self, result):
+        self._result = result
+        self._finish()
+
+    def set_exc_info(self, exc_info):
+        self._exc_info = exc_info
+        self._finish()
+
+    def _finish(self):
+        with self._lock:
+            self._event.set()
+            callbacks, self._callbacks = self._callbacks, []
+        for fn in callbacks:
+            fn(self)
+
+
+class ConnectionThreadPool(object):
+    """
+    A fixed-size pool of worker threads, each of which owns a connection.
+
+    Work is submitted with :meth:`submit`, which returns a :class:`Future`.
+    Each thread calls ``connection_maker`` once, the first time it runs a
+    function, and passes the result as the first argument to every function
+    it runs, so a :class:`swiftclient.client.Connection` is never shared
+    between threads.  Threads are started as work arrives, up to
+    ``thread_count``.
+
+    Work is started in the order it was submitted, unless the pool was made
+    with ``priority`` set: then the waiting work with the highest priority,
+    as given to :meth:`submit_priority`, is started first.
+
+    The pool is a context manager; exiting the context waits for all
+    submitted work to finish.
+    """
+
+    def __init__(self, connection_maker, thread_count, priority=False):
+        """
+        :param connection_maker: A callable returning a new connection, or
+                                 None if the submitted functions do not need
+                                 one.
+        :param thread_count: The maximum number of worker threads to run.
+        :param priority: If True, start waiting work in order of priority
+                         rather than of submission.
+        """
+        self.connection_maker = connection_maker
+        self.thread_count = max(1, thread_count)
+        self.priority = priority
+        self.queue = PriorityQueue() if priority else Queue()
+        self.thread_list = []
+        self._lock = Lock()
+        self._shutdown = False
+        self._submitted = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.shutdown(cancel=exc_type is not None)
+
+    def submit(self, func, *args, **kwargs):
+        """
+        Schedule ``func(conn, *args, **kwargs)`` to run on a worker thread,
+        or ``func(*args, **kwargs)`` if the pool has no ``connection_maker``.
+
+        :returns: a :class:`Future` for the function's result
+        """
+        return self.submit_priority(0, func, *args, **kwargs)
+
+    def submit_priority(self, priority, func, *args, **kwargs):
+        """
+        Like :meth:`submit`, but if the pool was made with ``priority`` set,
+        start ``func`` before any waiting work of a lower ``priority``.  Work
+        of the same priority is started in the order it was submitted.
+
+        :returns: a :class:`Future` for the function's result
+        """
+        future = Future()
+        with self._lock:
+            if self._shutdown:
+                raise RuntimeError('Cannot submit work to a pool which has '
+                                   'been shut down')
+            self._put((future, func, args, kwargs), priority)
+            if len(self.thread_list) < self.thread_count:
+                thread = Thread(target=self._run)
+                thread.daemon = True
+                thread.start()
+                self.thread_list.append(thread)
+        return future
+
+    def shutdown(self, wait=True, cancel=False):
+        """
+        Stop the worker threads once they have finished their current work.
+
+        :param wait: If True, block until every thread has exited.
+        :param cancel: If True, drop any work which has not been started yet;
+                       the :class:`Future` objects for that work never
+                       complete.
+        """
+        with self._lock:
+            if self._shutdown:
+                return
+            self._shutdown = True
+            if cancel:
+                try:
+                    while True:
+                        self.queue.get_nowait()
+                except Empty:
+                    pass
+            for _junk in self.thread_list:
+                # after any remaining work, whatever its priority
+                self._put(StopWorkerThreadSignal(), float('-inf'))
+        if wait:
+            for thread in self.thread_list:
+                thread.join()
+
+    def _put(self, item, priority):
+        if self.priority:
+            self._submitted += 1
+            item = (-priority, self._submitted, item)
+        self.queue.put(item)
+
+    def _run(self):
+        conn = None
+        while True:
+            item = self.queue.get()
+            if self.priority:
+                item = item[2]
+            if isinstance(item, StopWorkerThreadSignal):
+                break
+            future, func, args, kwargs = item
+            if not future._start():
+                continue
+            try:
+                if self.connection_maker is None:
+                    result = func(*args, **kwargs)
+                else:
+                    if conn is None:
+                        conn = self.connection_maker()
+                    result = func(conn, *args, **kwargs)
+            except Exception:
+                future.set_exc_info(sys.exc_info())
+            else:
+                future.set_result(result)
+        close = getattr(conn, 'close', None)
+        if callable(close):
+            close()
+
+
+class BatchedWriter(object):
+    """
+    Coalesces the text written to a stream into large writes.
+
+    Text is buffered until ``flush_size`` characters are waiting or
+    ``flush_interval`` seconds have passed since the stream was last
+    flushed, or until :meth:`flush` is called.
+    """
+
+    def __init__(self, stream, flush_size=DEFAULT_FLUSH_SIZE,
+                 flush_interval=DEFAULT_FLUSH_INTERVAL):
+        self.stream = stream
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self._chunks = []
+        self._size = 0
+        self._last_flush = time()
+
+    def write(self, text):
+        self._chunks.append(text)
+        self._size += len(text)
+        if self._size >= self.flush_size or \
+                time() - self._last_flush >= self.flush_interval:
+            self.flush()
+
+    def flush(self):
+        if self._chunks:
+            self.stream.write(''.join(self._chunks))
+            self._chunks = []
+            self._size = 0
+            flush = getattr(self.stream, 'flush', None)
+            if callable(flush):
+                flush()
+        self._last_flush = time()
+
+
 class MultiThreadingManager(object):
     """
     One object to manage context for multi-threading.  This should make
@@ -186,6 +436,10 @@ class MultiThreadingManager(object):
     supplied ``error_stream`` (defaults to ``sys.stderr``).  Both of these
     printing methods will format the given string with any supplied ``*args``
     (a la printf). On Python 2, Unicode messages are encoded to utf8.
+    :meth:`print_lines` prints many lines as one message.  The messages
+    waiting to be printed to a stream are written to it together (see
+    :class:`BatchedWriter`), and each stream is flushed whenever its printing
+    thread runs out of messages.
 
     The attribute :attr:`self.error_count` is incremented once per error
     message printed, so an application can tell if any worker threads
@@ -194,12 +448,18 @@ class MultiThreadingManager(object):
     were printed.
     """
 
-    def __init__(self, print_stream=sys.stdout, error_stream=sys.stderr):
+    def __init__(self, print_stream=sys.stdout, error_stream=sys.stderr,
+                 flush_size=DEFAULT_FLUSH_SIZE,
+                 flush_interval=DEFAULT_FLUSH_INTERVAL):
         """
         :param print_stream: The stream to which :meth:`print_msg` sends
                              formatted messages
         :param error_stream: The stream to which :meth:`error` sends formatted
                              messages
+        :param flush_size: Number of characters of messages to buffer for a
+                           stream before writing them
+        :param flush_interval: Maximum number of seconds to buffer messages
+                               for a stream which is kept busy
 
         On Python 2, Unicode messages are encoded to utf8.
         """
@@ -208,6 +468,11 @@ class MultiThreadingManager(object):
         self.error_stream = error_stream
         self.error_printer = QueueFunctionManager(self._print_error, 1, self)
         self.error_count = 0
+        self._writers = [
+            (BatchedWriter(print_stream, flush_size, flush_interval),
+             self.printer),
+            (BatchedWriter(error_stream, flush_size, flush_interval),
+             self.error_printer)]
 
     def __enter__(self):
         self.printer.__enter__()
@@ -217,6 +482,8 @@ class MultiThreadingManager(object):
     def __exit__(self, exc_type, exc_value, traceback):
         self.error_printer.__exit__(exc_type, exc_value, traceback)
         self.printer.__exit__(exc_type, exc_value, traceback)
+        for writer, _printer in self._writers:
+            writer.flush()
 
     def queue_manager(self, func, thread_count, *args, **kwargs):
         connection_maker = kwargs.pop('connection_maker', None)
@@ -231,6 +498,14 @@ class MultiThreadingManager(object):
             msg = msg % fmt_args
         self.printer.queue.put(msg)
 
+    def print_lines(self, lines):
+        """
+        Print a sequence of lines as a single message, which is much cheaper
+        than a :meth:`print_msg` for each of them.
+        """
+        if lines:
+            self.printer.queue.put('\n'.join(lines))
+
     def print_items(self, items, offset=14, skip_missing=False):
         lines = []
         template = '%%%ds: %%s' % offset
@@ -264,8 +539,89 @@ class MultiThreadingManager(object):
             stream = self.print_stream
         if six.PY2 and isinstance(item, unicode):
             item = item.encode('utf8')
+        for writer, printer in self._writers:
+            if writer.stream is stream:
+                writer.write('%s\n' % (item,))
+                if printer.queue.empty():
+                    writer.flush()
+                return
         print(item, file=stream)
 
     def _print_error(self, item):
         self.error_count += 1
         return self._print(item, stream=self.error_stream)
+
+
+class _ProcessOutputManager(MultiThreadingManager):
+    """
+    The :class:`MultiThreadingManager` of a worker process started by
+    :class:`WorkerProcesses`, which hands every message over to the parent
+    process instead of printing it.
+    """
+
+    def __init__(self, queue):
+        super(_ProcessOutputManager, self).__init__()
+        self._queue = queue
+
+    def _print(self, item, stream=None):
+        self._queue.put((False, item))
+
+    def _print_error(self, item):
+        self.error_count += 1
+        self._queue.put((True, item))
+
+
+def _process_main(func, index, queue):
+    with _ProcessOutputManager(queue) as thread_manager:
+        func(index, thread_manager)
+
+
+class WorkerProcesses(object):
+    """
+    Worker processes forked to call ``func(index, process_thread_manager)``,
+    with ``index`` from 0 to ``count - 1``.
+
+    Every worker has a :class:`MultiThreadingManager` of its own, but the
+    messages and errors it prints are handed to :meth:`wait`.  The workers
+    are forked when this object is made, so ``func`` need not be picklable.
+    Make it before starting any threads, in particular before entering the
+    :class:`MultiThreadingManager` given to :meth:`wait`: a worker forked
+    while one of its printing threads holds a lock would inherit that lock
+    held, and block on it for good.
+    """
+
+    def __init__(self, func, count):
+        self.queue = multiprocessing.Queue()
+        self.processes = [
+            multiprocessing.Process(target=_process_main,
+                                    args=(func, index, self.queue))
+            for index in range(count)]
+        for process in self.processes:
+            process.daemon = True
+            process.start()
+
+    def wait(self, thread_manager):
+        """
+        Print the workers' messages and errors with ``thread_manager``, so
+        they show up in its streams and in its :attr:`error_count`, until
+        every worker has exited.
+
+        :returns: the number of workers which exited with a non-zero status
+        """
+        while True:
+            # a worker writes all its messages before it exits, so once
+            # none is alive an empty queue means they have all been printed
+            alive = any(process.is_alive() for process in self.processes)
+            try:
+                is_error, msg = self.queue.get(timeout=0.1)
+            except Empty:
+                if alive:
+                    continue
+                break
+            if is_error:
+                thread_manager.error(msg)
+            else:
+                thread_manager.print_msg(msg)
+        for process in self.processes:
+            process.join()
+        return sum(1 for process in self.processes if process.exitcode)
@@ -0,0 +1,331 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""File objects over Swift objects."""
+
+import io
+from collections import OrderedDict
+
+from swiftclient.exceptions import ClientException
+from swiftclient.multithreading import ConnectionThreadPool
+from swiftclient.transfer import DEFAULT_SEGMENT_SIZE, DEFAULT_SPOOL_SIZE, \
+    SegmentUploader
+from swiftclient.utils import config_true_value
+
+DEFAULT_BLOCK_SIZE = 1024 * 1024
+DEFAULT_CACHE_SIZE = 32 * 1024 * 1024
+DEFAULT_READAHEAD = 4
+
+
+def _get_block(conn, container, obj, start, end, headers, etag):
+    resp_headers, data = conn.get_object(container, obj, headers=dict(
+        headers, Range='bytes=%d-%d' % (start, end)))
+    if etag and resp_headers.get('etag') != etag:
+        raise ClientException('%s/%s changed while it was being read' % (
+            container, obj))
+    if len(data) != end - start + 1:
+        raise ClientException(
+            '%s/%s: expected %d bytes at offset %d but got %d' % (
+                container, obj, end - start + 1, start, len(data)))
+    return data
+
+
+class ObjectReader(io.RawIOBase):
+    """
+    A read-only, seekable file object over a Swift object.
+
+    Data is fetched on demand with ranged GETs of ``block_size`` bytes, and
+    the most recently used blocks are kept in a cache of up to
+    ``cache_size`` bytes, so random access such as reading one member of an
+    archive only fetches the blocks it touches.  Once reads move through
+    consecutive blocks, the next ``readahead`` blocks are fetched in the
+    background over their own connections; a seek elsewhere drops the
+    read-ahead which is no longer ahead of the reads.
+
+    The reader is pinned to the version of the object it was opened on: a
+    block of a newer version is refused with a :class:`ClientException`.
+    Wrap it in :class:`io.BufferedReader` for efficient small reads.
+    """
+
+    def __init__(self, conn, container, obj, block_size=DEFAULT_BLOCK_SIZE,
+                 cache_size=DEFAULT_CACHE_SIZE, readahead=DEFAULT_READAHEAD,
+                 connection_maker=None, headers=None):
+        """
+        :param conn: a :class:`swiftclient.client.Connection`, used for the
+                     blocks which are read without having been prefetched
+        :param container: container of the object
+        :param obj: name of the object
+        :param block_size: size of each ranged GET, in bytes
+        :param cache_size: maximum number of bytes of blocks to keep,
+                           including those being prefetched
+        :param readahead: number of blocks to prefetch on sequential reads;
+                          0 disables read-ahead
+        :param connection_maker: a callable returning a new connection for
+                                 each read-ahead thread; defaults to cloning
+                                 ``conn``
+        :param headers: additional headers for every GET
+        :raises ClientException: HEAD of the object failed
+        """
+        super(ObjectReader, self).__init__()
+        self.conn = conn
+        self.container = container
+        self.obj = obj
+        self.name = '%s/%s' % (container, obj)
+        self.block_size = block_size
+        self.max_blocks = max(1, cache_size // block_size)
+        self.readahead = min(readahead, self.max_blocks - 1)
+        object_headers = conn.head_object(container, obj)
+        self.length = int(object_headers['content-length'])
+        self.etag = object_headers.get('etag')
+        self.headers = dict(headers or {})
+        if self.etag and not object_headers.get('x-object-manifest') and \
+                not config_true_value(
+                    object_headers.get('x-static-large-object')):
+            self.headers['If-Match'] = self.etag
+        self._pos = 0
+        self._cache = OrderedDict()
+        self._pending = OrderedDict()
+        self._last_block = None
+        self._pool = None
+        if self.readahead > 0:
+            self._pool = ConnectionThreadPool(
+                connection_maker or conn._clone, self.readahead)
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self._pos
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_SET:
+            pos = offset
+        elif whence == io.SEEK_CUR:
+            pos = self._pos + offset
+        elif whence == io.SEEK_END:
+            pos = self.length + offset
+        else:
+            raise ValueError('invalid whence (%r)' % (whence,))
+        if pos < 0:
+            raise ValueError('negative seek position %d' % pos)
+        self._pos = pos
+        return pos
+
+    def readinto(self, b):
+        if self.closed:
+            raise ValueError('I/O operation on closed file')
+        if self._pos >= self.length or not len(b):
+            return 0
+        index, offset = divmod(self._pos, self.block_size)
+        block = self._block(index)
+        data = block[offset:offset + len(b)]
+        b[:len(data)] = data
+        self._pos += len(data)
+        return len(data)
+
+    def _range(self, index):
+        start = index * self.block_size
+        return start, min(start + self.block_size, self.length) - 1
+
+    def _block(self, index):
+        if index != self._last_block:
+            sequential = self._last_block is not None and \
+                index == self._last_block + 1
+            self._last_block = index
+            if not sequential:
+                for ahead in list(self._pending):
+                    if not index <= ahead <= index + self.readahead:
+                        self._pending.pop(ahead).cancel()
+            elif self._pool:
+                self._prefetch(index)
+        if index in self._cache:
+            block = self._cache.pop(index)
+        elif index in self._pending:
+            block = self._pending.pop(index).result()
+        else:
+            start, end = self._range(index)
+            block = _get_block(self.conn, self.container, self.obj, start,
+                               end, self.headers, self.etag)
+        self._cache[index] = block
+        self._evict()
+        return block
+
+    def _prefetch(self, index):
+        last = min(index + self.readahead,
+                   (self.length - 1) // self.block_size)
+        for ahead in range(index + 1, last + 1):
+            if ahead in self._cache or ahead in self._pending:
+                continue
+            start, end = self._range(ahead)
+            self._pending[ahead] = self._pool.submit(
+                _get_block, self.container, self.obj, start, end,
+                self.headers, self.etag)
+        self._evict()
+
+    def _evict(self):
+        while len(self._cache) + len(self._pending) > self.max_blocks:
+            if self._cache:
+                self._cache.popitem(last=False)
+            else:
+                self._pending.popitem(last=False)[1].cancel()
+
+    def close(self):
+        if not self.closed:
+            if self._pool:
+                self._pool.shutdown(wait=False, cancel=True)
+            self._cache.clear()
+            self._pending.clear()
+        super(ObjectReader, self).close()
+
+
+class ObjectWriter(io.RawIOBase):
+    """
+    A write-only file object which uploads everything written to it as an
+    object.
+
+    Written data fills ``segment_size`` segment buffers (see
+    :class:`swiftclient.transfer.SegmentBuffer`), and every full segment is
+    uploaded in the background while the next one is being written.  Once
+    ``segment_threads`` segments are in flight, :meth:`write` blocks until
+    one of them is done, so memory use stays bounded however much is
+    written.  :meth:`close` writes the static large object manifest, or
+    uploads the data as a plain object if it fit in a single segment.
+
+    Used as a context manager, an exception discards the upload instead of
+    committing what was written so far.  A writer which is garbage collected
+    without having been closed is discarded too.
+    """
+
+    def __init__(self, conn, container, obj,
+                 segment_size=DEFAULT_SEGMENT_SIZE, segment_container=None,
+                 segment_threads=4, headers=None, content_type=None,
+                 connection_maker=None, spool_size=DEFAULT_SPOOL_SIZE):
+        """
+        :param conn: the :class:`swiftclient.client.Connection` used for the
+                     manifest or the plain object
+        :param container: container to upload to
+        :param obj: name of the object to create
+        :param segment_size: maximum size of each segment, in bytes
+        :param segment_container: container for the segments; defaults to
+                                  ``<container>_segments``
+        :param segment_threads: number of segments to upload concurrently
+        :param headers: additional headers for the object or manifest
+        :param content_type: content type of the object
+        :param connection_maker: a callable returning a new connection for
+                                 each segment upload thread; defaults to
+                                 cloning ``conn``
+        :param spool_size: bytes of each segment to buffer in memory before
+                           spilling to a temporary file
+        """
+        super(ObjectWriter, self).__init__()
+        self.conn = conn
+        self.container = container
+        self.obj = obj
+        self.name = '%s/%s' % (container, obj)
+        self.segment_size = segment_size
+        self.headers = headers
+        self.content_type = content_type
+        self.etag = None
+        self._uploader = SegmentUploader(
+            connection_maker or conn._clone, container, obj,
+            segment_container=segment_container, segment_size=segment_size,
+            threads=segment_threads, spool_size=spool_size)
+        self._buf = None
+        self._written = 0
+
+    def writable(self):
+        return True
+
+    def tell(self):
+        return self._written
+
+    def write(self, b):
+        if self.closed:
+            raise ValueError('I/O operation on closed file')
+        data = b.tobytes() if isinstance(b, memoryview) else bytes(b)
+        try:
+            while data:
+                if self._buf is None:
+                    self._buf = self._uploader.new_buffer()
+                elif self._buf.size == self.segment_size:
+                    # Only hand over a full segment once there is more data,
+                    # so that data of exactly one segment is a plain object.
+                    self._uploader.submit(self._buf)
+                    self._buf = None
+                    continue
+                room = self.segment_size - self._buf.size
+                self._buf.write(data[:room])
+                data = data[room:]
+        except BaseException:
+            self.abort()
+            raise
+        self._written += len(b)
+        return len(b)
+
+    def _commit(self):
+        buf = self._buf or self._uploader.new_buffer()
+        self._buf = None
+        if not self._uploader.segment_count:
+            self._uploader.abort()
+            try:
+                buf.fp.seek(0)
+                return self.conn.put_object(
+                    self.container, self.obj, buf.fp,
+                    content_length=buf.size, etag=buf.md5sum.hexdigest(),
+                    content_type=self.content_type, headers=self.headers)
+            finally:
+                buf.close()
+        if buf.size:
+            self._uploader.submit(buf)
+        else:
+            buf.close()
+        return self._uploader.finish(self.conn, headers=self.headers,
+                                     content_type=self.content_type)
+
+    def close(self):
+        """
+        Upload the remaining data and write the object or manifest.
+
+        :raises ClientException: a segment or the manifest failed to upload
+        """
+        if self.closed:
+            return
+        try:
+            self.etag = self._commit()
+        except BaseException:
+            self._uploader.abort()
+            raise
+        finally:
+            super(ObjectWriter, self).close()
+
+    def abort(self):
+        """Close the file without creating the object."""
+        if self.closed:
+            return
+        self._uploader.abort()
+        if self._buf is not None:
+            self._buf.close()
+            self._buf = None
+        super(ObjectWriter, self).close()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+    def __del__(self):
+        self.abort()
@@ -0,0 +1,207 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Policies for retrying failed requests and hedging slow ones."""
+
+import random
+from collections import deque
+from email.utils import mktime_tz, parsedate_tz
+from threading import Lock
+from time import time
+
+from swiftclient.exceptions import ClientException
+
+RATELIMIT_STATUSES = (429, 498)
+
+
+def retry_after(err):
+    """
+    Returns the number of seconds a ``Retry-After`` header of the response
+    which failed with ``err`` asks for, or None if there is none.
+    """
+    headers = getattr(err, 'http_response_headers', None) or {}
+    value = headers.get('retry-after')
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        parsed = parsedate_tz(value)
+        if parsed is None:
+            return None
+        return max(0.0, mktime_tz(parsed) - time())
+
+
+class RetryPolicy(object):
+    """
+    Decides which failed requests a :class:`swiftclient.client.Connection`
+    retries and how long it waits before each attempt.
+
+    This policy retries connection errors, timeouts (408) and server errors
+    (5xx), and optionally ratelimited requests (498), with a backoff that
+    starts at ``starting_backoff`` seconds and doubles up to
+    ``max_backoff``.  Subclasses override :meth:`should_retry`,
+    :meth:`backoff`, :meth:`wait` and :meth:`record`.
+
+    A policy may be shared by all the connections of a job, so those methods
+    must be thread-safe.
+    """
+
+    def __init__(self, starting_backoff=1, max_backoff=64,
+                 retry_on_ratelimit=False):
+        self.starting_backoff = starting_backoff
+        self.max_backoff = max_backoff
+        self.retry_on_ratelimit = retry_on_ratelimit
+
+    def should_retry(self, err):
+        """
+        Returns True if a request which failed with ``err`` may succeed when
+        retried.  Errors other than :class:`ClientException` are connection
+        errors.
+        """
+        if not isinstance(err, ClientException):
+            return True
+        status = err.http_status
+        return status == 408 or 500 <= status <= 599 or (
+            self.retry_on_ratelimit and status == 498)
+
+    def backoff(self, attempt, previous, err):
+        """
+        Returns the number of seconds to wait before retrying a request whose
+        attempt number ``attempt`` failed with ``err``, or None to give up.
+
+        :param previous: the value returned for the previous attempt of the
+                         request, or None after the first one
+        """
+        return min(self.starting_backoff * 2 ** (attempt - 1),
+                   self.max_backoff)
+
+    def wait(self):
+        """Returns the number of seconds to wait before any attempt."""
+        return 0
+
+    def record(self, success):
+        """Records whether an attempt reached a healthy server."""
+
+
+class AdaptiveRetryPolicy(RetryPolicy):
+    """
+    A :class:`RetryPolicy` for many workers sharing a struggling cluster.
+
+    * Backoffs use decorrelated jitter: each is drawn at random between
+      ``starting_backoff`` and three times the previous one (capped at
+      ``max_backoff``), so workers which failed together do not retry
+      together.
+    * Ratelimited requests (429 and 498) are always retried, and never
+      sooner than their ``Retry-After`` header asks for.
+    * Retries are drawn from a budget shared by every request.  The budget
+      starts at ``budget`` retries and regains ``budget_ratio`` of a retry
+      for every successful attempt, up to ``budget``.  Once it is spent,
+      failures are no longer retried until requests succeed again, so
+      retries cannot multiply the load on an overloaded cluster.  Fetching
+      a new token after a 401 is not a retry and never draws on it.
+    * After ``breaker_threshold`` failed attempts in a row, across all
+      requests, the circuit breaker opens: every attempt of every worker
+      waits until ``breaker_cooldown`` seconds have passed.
+    """
+
+    def __init__(self, starting_backoff=1, max_backoff=64, budget=100,
+                 budget_ratio=0.1, breaker_threshold=20,
+                 breaker_cooldown=None):
+        super(AdaptiveRetryPolicy, self).__init__(
+            starting_backoff, max_backoff, retry_on_ratelimit=True)
+        self.budget = budget
+        self.budget_ratio = budget_ratio
+        self.breaker_threshold = breaker_threshold
+        self.breaker_cooldown = breaker_cooldown if breaker_cooldown \
+            is not None else max_backoff
+        self._lock = Lock()
+        self._tokens = float(budget)
+        self._failures = 0
+        self._open_until = 0
+
+    def should_retry(self, err):
+        if isinstance(err, ClientException) and \
+                err.http_status in RATELIMIT_STATUSES:
+            return True
+        return super(AdaptiveRetryPolicy, self).should_retry(err)
+
+    def backoff(self, attempt, previous, err):
+        with self._lock:
+            if self._tokens < 1:
+                return None
+            self._tokens -= 1
+        delay = min(random.uniform(self.starting_backoff,
+                                   (previous or self.starting_backoff) * 3),
+                    self.max_backoff)
+        after = retry_after(err)
+        if after is not None:
+            delay = max(delay, after)
+        return delay
+
+    def wait(self):
+        with self._lock:
+            return max(0, self._open_until - time())
+
+    def record(self, success):
+        with self._lock:
+            if success:
+                self._failures = 0
+                self._tokens = min(self._tokens + self.budget_ratio,
+                                   self.budget)
+                return
+            self._failures += 1
+            if self._failures >= self.breaker_threshold:
+                self._failures = 0
+                self._open_until = time() + self.breaker_cooldown
+
+
+class HedgePolicy(object):
+    """
+    Decides when a :class:`swiftclient.client.Connection` sends a second
+    copy of an idempotent request which is slow to answer, so that one slow
+    server does not hold up the request.
+
+    With a fixed ``delay``, the copy is sent after that many seconds.
+    Otherwise the delay is the ``percentile`` of the latencies of the last
+    ``window`` requests, and no copies are sent until ``min_samples`` of
+    them are known.  Like a :class:`RetryPolicy`, a hedge policy may be
+    shared by all the connections of a job.
+    """
+
+    def __init__(self, delay=None, percentile=95, window=1000,
+                 min_samples=20):
+        self.fixed_delay = delay
+        self.percentile = percentile
+        self.min_samples = min_samples
+        self._lock = Lock()
+        self._latencies = deque(maxlen=window)
+
+    def delay(self):
+        """
+        Returns the number of seconds after which to send a second copy of
+        a request, or None to send none.
+        """
+        if self.fixed_delay is not None:
+            return self.fixed_delay
+        with self._lock:
+            if len(self._latencies) < self.min_samples:
+                return None
+            latencies = sorted(self._latencies)
+        return latencies[min(len(latencies) - 1,
+                             int(len(latencies) * self.percentile / 100.0))]
+
+    def record(self, seconds):
+        """Records the latency of the first copy of a request."""
+        with self._lock:
+            self._latencies.append(seconds)
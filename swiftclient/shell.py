@@ -20,27 +20,31 @@ import signal
 import socket
 import logging
 
-from errno import EEXIST, ENOENT
-from hashlib import md5
+from errno import ENOENT
 from optparse import OptionParser, SUPPRESS_HELP
-from os import environ, listdir, makedirs, utime, _exit as os_exit
-from os.path import dirname, getmtime, getsize, isdir, join, \
-    sep as os_path_sep
+from os import environ, _exit as os_exit
+from os.path import join
 from random import shuffle
-from sys import argv as sys_argv, exit, stderr, stdout
-from time import sleep, time, gmtime, strftime
-from urllib import quote, unquote
-
-try:
-    import simplejson as json
-except ImportError:
-    import json
+from sys import argv as sys_argv, exit, stderr, stdin, stdout
+from threading import local
+from time import sleep, gmtime, strftime
+from urllib import unquote
 
 from swiftclient import Connection, RequestException
 from swiftclient import command_helpers
-from swiftclient.utils import config_true_value, prt_bytes
-from swiftclient.multithreading import MultiThreadingManager
+from swiftclient.utils import TokenBucket, config_true_value, \
+    in_partition, parse_partition, prt_bytes
+from swiftclient.multithreading import ConnectionThreadPool, \
+    MultiThreadingManager, WorkerProcesses
+from swiftclient.endpoints import EndpointPool
 from swiftclient.exceptions import ClientException
+from swiftclient.retry import AdaptiveRetryPolicy, HedgePolicy
+from swiftclient.journal import FAIL, OK, SKIP, Journal, close_journals, \
+    flush_journals
+from swiftclient.transfer import DEFAULT_MIGRATE_BUFFER, \
+    DEFAULT_PREFETCH_BUFFER, DEFAULT_RANGE_SIZE, DEFAULT_SPOOL_SIZE, \
+    TransferManager, copy_object, delete_objects, get_bulk_delete_limit, \
+    iter_account_pages, iter_container_pages, migrate_object
 from swiftclient import __version__ as client_version
 
 
@@ -60,25 +64,48 @@ def get_conn(options):
                       snet=options.snet,
                       cacert=options.os_cacert,
                       insecure=options.insecure,
-                      ssl_compression=options.ssl_compression)
+                      ssl_compression=options.ssl_compression,
+                      **options.shared_conn_options)
 
 
-def mkdirs(path):
+def _partition(options):
+    if options.partition is None:
+        return None
     try:
-        makedirs(path)
-    except OSError as err:
-        if err.errno != EEXIST:
-            raise
+        return parse_partition(options.partition)
+    except ValueError as err:
+        exit('--partition: %s' % err)
+
+
+def _report_failure(thread_manager, result):
+    """Report a failed result of a :class:`TransferManager`."""
+    err = result['error']
+    action = result['action']
+    if isinstance(err, ClientException) and err.http_status == 404 and \
+            action == 'download_object':
+        thread_manager.error("Object '%s/%s' not found", result['container'],
+                             result['object'])
+    elif isinstance(err, ClientException) and err.http_status == 404 and \
+            action == 'list_container':
+        thread_manager.error('Container %r not found', result['container'])
+    elif isinstance(err, OSError) and err.errno == ENOENT and \
+            action == 'upload_object':
+        thread_manager.error('Local file %r not found', result['path'])
+    elif isinstance(err, ClientException):
+        thread_manager.error(str(err))
+    else:
+        thread_manager.error(result['traceback'])
 
 
 def immediate_exit(signum, frame):
     stderr.write(" Aborted\n")
+    flush_journals()
     os_exit(2)
 
 st_delete_options = '''[-all] [--leave-segments]
                     [--object-threads <threads>]
-                    [--container-threads <threads>]
-                    <container> [object]
+                    [--container-threads <threads>] [--journal <file>]
+                    [--partition <index>/<count>] <container> [object]
 '''
 
 st_delete_help = '''
@@ -98,6 +125,15 @@ Optional arguments:
   --container-threads <threads>
                         Number of threads to use for deleting containers.
                         Default is 10.
+  --journal <file>      Record the outcome of every object in <file>, and skip
+                        the objects recorded as done there by an earlier run.
+                        Objects which failed are retried.
+  --partition <index>/<count>
+                        Only delete the share of the objects in partition
+                        <index> of <count>, chosen by a hash of their names,
+                        so that <count> processes with the indexes 0 to
+                        <count>-1 split the work between them.
+                        The containers themselves are not deleted.
 '''.strip("\n")
 
 
@@ -117,6 +153,17 @@ def st_delete(parser, args, thread_manager):
                       default=10, help='Number of threads to use for '
                       'deleting containers. '
                       'Default is 10.')
+    parser.add_option(
+        '', '--journal', dest='journal',
+        help='Record the outcome of every object in <file>, and skip the '
+        'objects recorded as done there by an earlier run. Objects which '
+        'failed are retried.')
+    parser.add_option(
+        '', '--partition', dest='partition',
+        help='Only delete the share of the objects in partition INDEX of '
+        'COUNT, chosen by a hash of their names, so that COUNT processes '
+        'with the indexes 0 to COUNT-1 split the work between them. The '
+        'containers themselves are not deleted.')
     (options, args) = parse_args(parser, args)
     args = args[1:]
     if (not args and not options.yes_all) or (args and options.yes_all):
@@ -124,6 +171,8 @@ def st_delete(parser, args, thread_manager):
                              BASENAME, st_delete_options,
                              st_delete_help)
         return
+    journal = Journal(options.journal) if options.journal else None
+    partition = _partition(options)
 
     def _delete_segment(item, conn):
         (container, obj) = item
@@ -138,6 +187,9 @@ def st_delete(parser, args, thread_manager):
 
     def _delete_object(item, conn):
         (container, obj) = item
+        key = '%s/%s' % (container, obj)
+        if journal and journal.is_done(key):
+            return
         try:
             old_manifest = None
             query_string = None
@@ -175,22 +227,31 @@ def st_delete(parser, args, thread_manager):
                                              conn.attempts)
                 else:
                     thread_manager.print_msg(path)
+            if journal:
+                journal.record(OK, key)
         except ClientException as err:
             if err.http_status != 404:
+                if journal:
+                    journal.record(FAIL, key)
                 raise
+            # already gone, so there is nothing left to retry
+            if journal:
+                journal.record(SKIP, key)
             thread_manager.error("Object '%s/%s' not found", container, obj)
+        except Exception:
+            if journal:
+                journal.record(FAIL, key)
+            raise
 
     def _delete_container(container, conn, object_queue):
         try:
-            marker = ''
-            while True:
-                objects = [o['name'] for o in
-                           conn.get_container(container, marker=marker)[1]]
-                if not objects:
-                    break
+            for objects in iter_container_pages(conn, container):
                 for obj in objects:
-                    object_queue.put((container, obj))
-                marker = objects[-1]
+                    if in_partition(obj['name'], partition):
+                        object_queue.put((container, obj['name']))
+            if partition:
+                # the other partitions' objects may still be there
+                return
             while not object_queue.empty():
                 sleep(0.05)
             attempts = 1
@@ -222,16 +283,9 @@ def st_delete(parser, args, thread_manager):
             if not args:
                 conn = create_connection()
                 try:
-                    marker = ''
-                    while True:
-                        containers = [
-                            c['name']
-                            for c in conn.get_account(marker=marker)[1]]
-                        if not containers:
-                            break
+                    for containers in iter_account_pages(conn):
                         for container in containers:
-                            container_queue.put(container)
-                        marker = containers[-1]
+                            container_queue.put(container['name'])
                 except ClientException as err:
                     if err.http_status != 404:
                         raise
@@ -246,12 +300,17 @@ def st_delete(parser, args, thread_manager):
                 container_queue.put(args[0])
             else:
                 for obj in args[1:]:
-                    object_queue.put((args[0], obj))
+                    if in_partition(obj, partition):
+                        object_queue.put((args[0], obj))
 
 st_download_options = '''[--all] [--marker] [--prefix <prefix>]
                       [--output <out_file>] [--object-threads <threads>]
                       [--container-threads <threads>] [--no-download]
-                      <container> [object]
+                      [--segment-threads <threads>]
+                      [--stream-threads <threads>]
+                      [--stream-range-size <size>] [--stream-buffer <size>]
+                      [--resume] [--journal <file>] [--largest-first]
+                      [--partition <index>/<count>] <container> [object]
 '''
 
 st_download_help = '''
@@ -287,6 +346,39 @@ Optional arguments:
                         Example --header "content-type:text/plain"
   --skip-identical      Skip downloading files that are identical on both
                         sides.
+  --segment-threads <threads>
+                        Number of threads to use for downloading the segments
+                        of large objects in parallel. Each object is checked
+                        with a HEAD request first to find out whether it is a
+                        manifest. Default is 0, which downloads large objects
+                        as a single stream through the proxy.
+  --stream-threads <threads>
+                        When streaming an object to stdout with "-o -", fetch
+                        byte ranges of it over this many connections in
+                        parallel and write them out in order. Default is 0,
+                        which streams the object over a single connection.
+  --stream-range-size <size>
+                        Size in bytes of each range fetched by
+                        --stream-threads. Default is 8388608 (8MiB).
+  --stream-buffer <size>
+                        Maximum number of bytes fetched by --stream-threads
+                        ahead of what has been written to stdout. Default is
+                        134217728 (128MiB).
+  --resume              Download into <file>.part and, if such a partial file
+                        is left by an earlier interrupted download of an
+                        unchanged object, continue from where it stopped. The
+                        file is renamed into place once it is complete.
+  --journal <file>      Record the outcome of every object in <file>, and skip
+                        the objects recorded as done there by an earlier run.
+                        Objects which failed are retried.
+  --largest-first       Start the largest of the objects to download first,
+                        so that small ones fill in around them rather than a
+                        large one running on alone at the end.
+  --partition <index>/<count>
+                        Only download the share of the objects in partition
+                        <index> of <count>, chosen by a hash of their names,
+                        so that <count> processes with the indexes 0 to
+                        <count>-1 split the work between them.
 '''.strip("\n")
 
 
@@ -328,6 +420,47 @@ def st_download(parser, args, thread_manager):
         '--skip-identical', action='store_true', dest='skip_identical',
         default=False, help='Skip downloading files that are identical on '
         'both sides.')
+    parser.add_option(
+        '', '--segment-threads', type=int, default=0,
+        help='Number of threads to use for downloading the segments of large '
+        'objects in parallel. Default is 0, which downloads large objects as '
+        'a single stream through the proxy.')
+    parser.add_option(
+        '', '--stream-threads', type=int, default=0,
+        help='When streaming an object to stdout with "-o -", fetch byte '
+        'ranges of it over this many connections in parallel and write them '
+        'out in order. Default is 0, which streams the object over a single '
+        'connection.')
+    parser.add_option(
+        '', '--stream-range-size', type=int, default=DEFAULT_RANGE_SIZE,
+        help='Size in bytes of each range fetched by --stream-threads. '
+        'Default is %d.' % DEFAULT_RANGE_SIZE)
+    parser.add_option(
+        '', '--stream-buffer', type=int, default=DEFAULT_PREFETCH_BUFFER,
+        help='Maximum number of bytes fetched by --stream-threads ahead of '
+        'what has been written to stdout. Default is %d.'
+        % DEFAULT_PREFETCH_BUFFER)
+    parser.add_option(
+        '', '--resume', action='store_true', default=False,
+        help='Download into <file>.part and, if such a partial file is left '
+        'by an earlier interrupted download of an unchanged object, continue '
+        'from where it stopped. The file is renamed into place once it is '
+        'complete.')
+    parser.add_option(
+        '', '--journal', dest='journal',
+        help='Record the outcome of every object in <file>, and skip the '
+        'objects recorded as done there by an earlier run. Objects which '
+        'failed are retried.')
+    parser.add_option(
+        '', '--largest-first', action='store_true', default=False,
+        help='Start the largest of the objects to download first, so that '
+        'small ones fill in around them rather than a large one running on '
+        'alone at the end.')
+    parser.add_option(
+        '', '--partition', dest='partition',
+        help='Only download the share of the objects in partition INDEX of '
+        'COUNT, chosen by a hash of their names, so that COUNT processes '
+        'with the indexes 0 to COUNT-1 split the work between them.')
     (options, args) = parse_args(parser, args)
     args = args[1:]
     if options.out_file == '-':
@@ -338,188 +471,115 @@ def st_download(parser, args, thread_manager):
         thread_manager.error('Usage: %s download %s\n%s', BASENAME,
                              st_download_options, st_download_help)
         return
-    req_headers = split_headers(options.header, '', thread_manager)
-
-    def _download_object(queue_arg, conn):
-        if len(queue_arg) == 2:
-            container, obj = queue_arg
-            out_file = None
-        elif len(queue_arg) == 3:
-            container, obj, out_file = queue_arg
-        else:
-            raise Exception("Invalid queue_arg length of %s" % len(queue_arg))
-        path = options.yes_all and join(container, obj) or obj
-        path = path.lstrip(os_path_sep)
-        if options.skip_identical and out_file != '-':
-            filename = out_file if out_file else path
-            try:
-                fp = open(filename, 'rb')
-            except IOError:
-                pass
-            else:
-                with fp:
-                    md5sum = md5()
-                    while True:
-                        data = fp.read(65536)
-                        if not data:
-                            break
-                        md5sum.update(data)
-                    req_headers['If-None-Match'] = md5sum.hexdigest()
-        try:
-            start_time = time()
-            headers, body = \
-                conn.get_object(container, obj, resp_chunk_size=65536,
-                                headers=req_headers)
-            headers_receipt = time()
-            content_type = headers.get('content-type')
-            if 'content-length' in headers:
-                content_length = int(headers.get('content-length'))
-            else:
-                content_length = None
-            etag = headers.get('etag')
-            md5sum = None
-            make_dir = not options.no_download and out_file != "-"
-            if content_type.split(';', 1)[0] == 'text/directory':
-                if make_dir and not isdir(path):
-                    mkdirs(path)
-                read_length = 0
-                if 'x-object-manifest' not in headers and \
-                        'x-static-large-object' not in headers:
-                    md5sum = md5()
-                for chunk in body:
-                    read_length += len(chunk)
-                    if md5sum:
-                        md5sum.update(chunk)
-            else:
-                dirpath = dirname(path)
-                if make_dir and dirpath and not isdir(dirpath):
-                    mkdirs(dirpath)
-                if not options.no_download:
-                    if out_file == "-":
-                        fp = stdout
-                    elif out_file:
-                        fp = open(out_file, 'wb')
-                    else:
-                        fp = open(path, 'wb')
-                read_length = 0
-                if 'x-object-manifest' not in headers and \
-                        'x-static-large-object' not in headers:
-                    md5sum = md5()
-                for chunk in body:
-                    if not options.no_download:
-                        fp.write(chunk)
-                    read_length += len(chunk)
-                    if md5sum:
-                        md5sum.update(chunk)
-                if not options.no_download:
-                    fp.close()
-            if md5sum and md5sum.hexdigest() != etag:
-                thread_manager.error('%s: md5sum != etag, %s != %s',
-                                     path, md5sum.hexdigest(), etag)
-            if content_length is not None and read_length != content_length:
-                thread_manager.error(
-                    '%s: read_length != content_length, %d != %d',
-                    path, read_length, content_length)
-            if 'x-object-meta-mtime' in headers and not options.out_file \
-                    and not options.no_download:
-
-                mtime = float(headers['x-object-meta-mtime'])
-                utime(path, (mtime, mtime))
-            if options.verbose:
-                finish_time = time()
-                auth_time = conn.auth_end_time - start_time
-                headers_receipt = headers_receipt - start_time
-                total_time = finish_time - start_time
-                download_time = total_time - auth_time
-                time_str = ('auth %.3fs, headers %.3fs, total %.3fs, '
-                            '%.3f MB/s' % (
-                                auth_time, headers_receipt, total_time,
-                                float(read_length) / download_time / 1000000))
-                if conn.attempts > 1:
-                    thread_manager.print_msg('%s [%s after %d attempts]', path,
-                                             time_str, conn.attempts)
-                else:
-                    thread_manager.print_msg('%s [%s]', path, time_str)
-        except ClientException as err:
-            if err.http_status == 304 and options.skip_identical:
-                thread_manager.print_msg("Skipped identical file '%s'", path)
-                return
-            if err.http_status != 404:
-                raise
-            thread_manager.error("Object '%s/%s' not found", container, obj)
+    journal = Journal(options.journal) if options.journal else None
+    download_options = {
+        'headers': split_headers(options.header, '', thread_manager),
+        'skip_identical': options.skip_identical,
+        'resume': options.resume,
+        'no_download': options.no_download,
+        'parallel_segments': bool(options.segment_threads),
+        'range_threads': options.stream_threads,
+        'range_size': options.stream_range_size,
+        'prefetch_buffer': options.stream_buffer,
+        'preserve_mtime': not options.out_file,
+    }
 
-    def _download_container(queue_arg, conn):
-        if len(queue_arg) == 2:
-            container, object_queue = queue_arg
-            prefix = None
-        elif len(queue_arg) == 3:
-            container, object_queue, prefix = queue_arg
-        else:
-            raise Exception("Invalid queue_arg length of %s" % len(queue_arg))
-        try:
-            marker = options.marker
-            while True:
-                objects = [
-                    o['name'] for o in
-                    conn.get_container(container, marker=marker,
-                                       prefix=prefix)[1]]
-                if not objects:
-                    break
-                marker = objects[-1]
-                shuffle(objects)
-                for obj in objects:
-                    object_queue.put((container, obj))
-        except ClientException as err:
-            if err.http_status != 404:
-                raise
-            thread_manager.error('Container %r not found', container)
+    def _progress(result):
+        if not result['success']:
+            _report_failure(thread_manager, result)
+        elif result['action'] == 'download_segment':
+            if options.verbose > 1:
+                thread_manager.print_msg('%s segment %s/%s', result['path'],
+                                         result['container'],
+                                         result['object'])
+        elif result['action'] != 'download_object':
+            pass
+        elif result.get('reason') == 'identical':
+            thread_manager.print_msg("Skipped identical file '%s'",
+                                     result['path'])
+        elif result['status'] == OK and options.verbose:
+            start_time = result['start_time']
+            auth_time = result['auth_end_time'] - start_time
+            headers_receipt = result['headers_receipt'] - start_time
+            total_time = result['finish_time'] - start_time
+            download_time = total_time - auth_time
+            time_str = ('auth %.3fs, headers %.3fs, total %.3fs, '
+                        '%.3f MB/s' % (
+                            auth_time, headers_receipt, total_time,
+                            float(result['read_length']) / download_time /
+                            1000000))
+            if result['attempts'] > 1:
+                thread_manager.print_msg('%s [%s after %d attempts]',
+                                         result['path'], time_str,
+                                         result['attempts'])
+            else:
+                thread_manager.print_msg('%s [%s]', result['path'],
+                                         time_str)
 
     create_connection = lambda: get_conn(options)
-    obj_manager = thread_manager.queue_manager(
-        _download_object, options.object_threads,
-        connection_maker=create_connection)
-    with obj_manager as object_queue:
-        cont_manager = thread_manager.queue_manager(
-            _download_container, options.container_threads,
-            connection_maker=create_connection)
-        with cont_manager as container_queue:
-            if not args:
-                # --all case
+    manager = TransferManager(
+        create_connection, object_threads=options.object_threads,
+        segment_threads=options.segment_threads, progress=_progress,
+        journal=journal, largest_first=options.largest_first)
+
+    partition = _partition(options)
+
+    def _download_container(container, prefix=None, output_dir=None):
+        for _result in manager.download_container(
+                container, prefix=prefix, marker=options.marker,
+                output_dir=output_dir, partition=partition,
+                **download_options):
+            pass
+
+    with manager:
+        if not args:
+            # --all case
+            cont_manager = thread_manager.queue_manager(
+                lambda container: _download_container(
+                    container, output_dir=container),
+                options.container_threads)
+            with cont_manager as container_queue:
                 conn = create_connection()
                 try:
-                    marker = options.marker
-                    while True:
-                        containers = [
-                            c['name'] for c in conn.get_account(
-                                marker=marker, prefix=options.prefix)[1]]
-                        if not containers:
-                            break
-                        marker = containers[-1]
+                    for containers in iter_account_pages(
+                            conn, marker=options.marker,
+                            prefix=options.prefix):
+                        containers = [c['name'] for c in containers]
                         shuffle(containers)
                         for container in containers:
-                            container_queue.put((container, object_queue))
+                            container_queue.put(container)
                 except ClientException as err:
                     if err.http_status != 404:
                         raise
                     thread_manager.error('Account not found')
-            elif len(args) == 1:
-                if '/' in args[0]:
-                    print(
-                        'WARNING: / in container name; you might have meant '
-                        '%r instead of %r.' % (
-                            args[0].replace('/', ' ', 1), args[0]),
-                        file=stderr)
-                container_queue.put((args[0], object_queue, options.prefix))
+        elif len(args) == 1:
+            if '/' in args[0]:
+                print(
+                    'WARNING: / in container name; you might have meant '
+                    '%r instead of %r.' % (
+                        args[0].replace('/', ' ', 1), args[0]),
+                    file=stderr)
+            _download_container(args[0], prefix=options.prefix)
+        elif len(args) == 2:
+            if not in_partition(args[1], partition):
+                pass
+            elif options.out_file == '-':
+                manager.download_file(args[0], args[1], fileobj=stdout,
+                                      **download_options)
             else:
-                if len(args) == 2:
-                    obj = args[1]
-                    object_queue.put((args[0], obj, options.out_file))
-                else:
-                    for obj in args[1:]:
-                        object_queue.put((args[0], obj))
+                manager.download_file(args[0], args[1],
+                                      path=options.out_file,
+                                      **download_options)
+        else:
+            for _result in manager.download_container(
+                    args[0], objects=args[1:], partition=partition,
+                    **download_options):
+                pass
 
 st_list_options = '''[--long] [--lh] [--totals] [--prefix <prefix>]
-                  [--delimiter <delimiter>]
+                  [--delimiter <delimiter>] [--metadata <name>]
+                  [--container-threads <threads>]
+                  [--object-threads <threads>] [--partition <index>/<count>]
 '''
 st_list_help = '''
 Lists the containers for the account or the objects for a container
@@ -536,9 +596,51 @@ Optional arguments:
   --delimiter           Roll up items with the given delimiter. For containers
                         only. See OpenStack Swift API documentation for what
                         this means.
+  --metadata <name>     Show the value of the given object metadata item
+                        before each object name. This option may be repeated.
+                        For containers only.
+  --container-threads <threads>
+                        Number of threads to use for fetching the details of
+                        containers in a long account listing. Default is 10.
+  --object-threads <threads>
+                        Number of threads to use for fetching the metadata of
+                        objects. Default is 10.
+  --partition <index>/<count>
+                        Only list the share of the items in partition <index>
+                        of <count>, chosen by a hash of their names, as
+                        handled by the same --partition of download, upload
+                        and delete.
 '''.strip('\n')
 
 
+def _head_listing(conn, container, items, pool):
+    """
+    HEAD the containers of an account listing page, or the objects of a
+    container listing page, concurrently over the connections of ``pool``.
+
+    :returns: a list of the headers of each item, in the order of ``items``;
+              None for items which could not be HEADed and for subdirs
+    """
+    ops = []
+    for item in items:
+        if 'name' not in item:
+            continue
+        if container is None:
+            ops.append({'op': 'head', 'container': item['name']})
+        else:
+            ops.append({'op': 'head', 'container': container,
+                        'object': item['name']})
+    results = conn.batch(ops, concurrency=pool.thread_count, pool=pool)
+    return [next(results).get('result') if 'name' in item else None
+            for item in items]
+
+
+def _metadata_columns(names, headers):
+    if headers is None:
+        return ['?'] * len(names)
+    return [headers.get('x-object-meta-' + name, '-') for name in names]
+
+
 def st_list(parser, args, thread_manager):
     parser.add_option(
         '-l', '--long', dest='long', action='store_true', default=False,
@@ -558,35 +660,81 @@ def st_list(parser, args, thread_manager):
         help='Roll up items with the given delimiter. '
         'For containers only. See OpenStack Swift API documentation for '
         'what this means.')
+    parser.add_option(
+        '-m', '--metadata', action='append', dest='metadata', default=[],
+        help='Show the value of the given object metadata item before each '
+        'object name. This option may be repeated. For containers only.')
+    parser.add_option(
+        '', '--container-threads', type=int, default=10,
+        help='Number of threads to use for fetching the details of '
+        'containers in a long account listing. Default is 10.')
+    parser.add_option(
+        '', '--object-threads', type=int, default=10,
+        help='Number of threads to use for fetching the metadata of objects. '
+        'Default is 10.')
+    parser.add_option(
+        '', '--partition', dest='partition',
+        help='Only list the share of the items in partition INDEX of COUNT, '
+        'chosen by a hash of their names.')
     (options, args) = parse_args(parser, args)
     args = args[1:]
     if options.delimiter and not args:
         exit('-d option only allowed for container listings')
+    if options.metadata and not args:
+        exit('-m option only allowed for container listings')
     if len(args) > 1 or len(args) == 1 and args[0].find('/') >= 0:
         thread_manager.error('Usage: %s list %s\n%s', BASENAME,
                              st_list_options, st_list_help)
         return
 
+    long_listing = options.long or options.human
+    partition = _partition(options)
+    metadata = []
+    for name in options.metadata:
+        name = name.lower()
+        if name.startswith('x-object-meta-'):
+            name = name[len('x-object-meta-'):]
+        metadata.append(name)
     conn = get_conn(options)
+    # one set of connections for the HEADs of every page
+    head_pool = ConnectionThreadPool(
+        conn._clone,
+        options.object_threads if args else options.container_threads)
     try:
-        marker = ''
         total_count = total_bytes = 0
-        while True:
-            if not args:
-                items = \
-                    conn.get_account(marker=marker, prefix=options.prefix)[1]
+        if not args:
+            pages = iter_account_pages(conn, prefix=options.prefix)
+        else:
+            pages = iter_container_pages(conn, args[0], prefix=options.prefix,
+                                         delimiter=options.delimiter)
+        for items in pages:
+            if partition:
+                items = [item for item in items if in_partition(
+                    item.get('name', item.get('subdir')), partition)]
+            # Only the container datestamps of a long account listing and
+            # the requested object metadata need a HEAD of each item, and
+            # those of a page are all made at once.
+            if options.totals:
+                metas = [None] * len(items)
+            elif not args and long_listing:
+                metas = _head_listing(conn, None, items, head_pool)
+            elif metadata:
+                metas = _head_listing(conn, args[0], items, head_pool)
             else:
-                items = conn.get_container(
-                    args[0], marker=marker,
-                    prefix=options.prefix, delimiter=options.delimiter)[1]
-            if not items:
-                break
-            for item in items:
+                metas = [None] * len(items)
+            lines = []
+            for item, meta in zip(items, metas):
                 item_name = item.get('name')
-
-                if not options.long and not options.human:
-                    thread_manager.print_msg(
-                        item.get('name', item.get('subdir')))
+                columns = ''
+                if metadata:
+                    if 'subdir' in item:
+                        meta = {}
+                    columns = ' '.join(
+                        _metadata_columns(metadata, meta)) + ' '
+
+                if not long_listing:
+                    lines.append(
+                        columns + item.get('name', item.get('subdir')))
                 else:
                     item_bytes = item.get('bytes')
                     total_bytes += item_bytes
@@ -595,15 +743,13 @@ def st_list(parser, args, thread_manager):
                         count = item.get('count')
                         total_count += count
                         try:
-                            meta = conn.head_container(item_name)
                             utc = gmtime(float(meta.get('x-timestamp')))
                             datestamp = strftime('%Y-%m-%d %H:%M:%S', utc)
-                        except ClientException:
+                        except (AttributeError, TypeError, ValueError):
                             datestamp = '????-??-?? ??:??:??'
                         if not options.totals:
-                            thread_manager.print_msg("%5s %s %s %s", count,
-                                                     byte_str, datestamp,
-                                                     item_name)
+                            lines.append("%5s %s %s %s" % (
+                                count, byte_str, datestamp, item_name))
                     else:    # list container contents
                         subdir = item.get('subdir')
                         if subdir is None:
@@ -615,14 +761,12 @@ def st_list(parser, args, thread_manager):
                             date = xtime = ''
                             item_name = subdir
                         if not options.totals:
-                            thread_manager.print_msg("%s %10s %8s %s",
-                                                     byte_str, date, xtime,
-                                                     item_name)
-
-                marker = items[-1].get('name', items[-1].get('subdir'))
+                            lines.append("%s %10s %8s %s%s" % (
+                                byte_str, date, xtime, columns, item_name))
+            thread_manager.print_lines(lines)
 
         # report totals
-        if options.long or options.human:
+        if long_listing:
             if len(args) == 0:
                 thread_manager.print_msg(
                     "%5s %s", prt_bytes(total_count, True),
@@ -637,9 +781,11 @@ def st_list(parser, args, thread_manager):
             thread_manager.error('Account not found')
         else:
             thread_manager.error('Container %r not found', args[0])
+    finally:
+        head_pool.shutdown(wait=False, cancel=True)
 
-st_stat_options = '''[--lh]
-                  [container] [object]
+st_stat_options = '''[--lh] [--prefix <prefix>] [--object-threads <threads>]
+                  [container] [object] [...]
 '''
 
 st_stat_help = '''
@@ -653,15 +799,56 @@ Positional arguments:
 Optional arguments:
   --lh                  Report sizes in human readable format similar to
                         ls -lh.
+  --prefix <prefix>     Display information for every object in the container
+                        beginning with <prefix>.
+  --object-threads <threads>
+                        Number of threads to use for stating many objects.
+                        Default is 10.
 '''.strip('\n')
 
 
+def _object_ops(conn, op, container, objects, prefix, headers=None):
+    """
+    Generate batch operations for the given objects, or for the objects of
+    the container beginning with ``prefix``, which are listed a page at a
+    time as the batch takes them.
+    """
+    if not objects:
+        objects = (o['name'] for page in iter_container_pages(
+            conn, container, prefix=prefix) for o in page)
+    for obj in objects:
+        yield {'op': op, 'container': container, 'object': obj,
+               'headers': headers}
+
+
+def _report_batch_failure(thread_manager, result):
+    err = result['error']
+    if isinstance(err, ClientException) and err.http_status == 404:
+        thread_manager.error("Object '%s/%s' not found", result['container'],
+                             result['object'])
+    elif isinstance(err, ClientException):
+        thread_manager.error(str(err))
+    else:
+        thread_manager.error('%s/%s: %s', result['container'],
+                             result['object'], err)
+
+
 def st_stat(parser, args, thread_manager):
     parser.add_option(
         '--lh', dest='human', action='store_true', default=False,
         help='Report sizes in human readable format similar to ls -lh.')
+    parser.add_option(
+        '-p', '--prefix', dest='prefix',
+        help='Display information for every object in the container '
+        'beginning with <prefix>.')
+    parser.add_option(
+        '', '--object-threads', type=int, default=10,
+        help='Number of threads to use for stating many objects. '
+        'Default is 10.')
     (options, args) = parse_args(parser, args)
     args = args[1:]
+    if options.prefix is not None and not args:
+        exit('--prefix option only allowed for containers')
     conn = get_conn(options)
     if not args:
         try:
@@ -670,7 +857,7 @@ def st_stat(parser, args, thread_manager):
             if err.http_status != 404:
                 raise
             thread_manager.error('Account not found')
-    elif len(args) == 1:
+    elif len(args) == 1 and options.prefix is None:
         if '/' in args[0]:
             print(
                 'WARNING: / in container name; you might have meant %r instead'
@@ -692,14 +879,27 @@ def st_stat(parser, args, thread_manager):
                 raise
             thread_manager.error("Object %s/%s not found", args[0], args[1])
     else:
-        thread_manager.error('Usage: %s stat %s\n%s', BASENAME,
-                             st_stat_options, st_stat_help)
+        ops = _object_ops(conn, 'head', args[0], args[1:], options.prefix)
+        try:
+            for result in conn.batch(ops,
+                                     concurrency=options.object_threads):
+                if result['success']:
+                    command_helpers.print_object_stat(
+                        conn, options, result['container'],
+                        result['object'], result['result'], thread_manager)
+                else:
+                    _report_batch_failure(thread_manager, result)
+        except ClientException as err:
+            if err.http_status != 404:
+                raise
+            thread_manager.error('Container %r not found', args[0])
 
 
 st_post_options = '''[--read-acl <acl>] [--write-acl <acl>] [--sync-to]
                   [--sync-key <sync-key>] [--meta <name:value>]
-                  [--header <header>]
-                  [container] [object]
+                  [--header <header>] [--prefix <prefix>]
+                  [--object-threads <threads>]
+                  [container] [object] [...]
 '''
 
 st_post_help = '''
@@ -723,6 +923,11 @@ Optional arguments:
                         Example: -m Color:Blue -m Size:Large
   --header <header>     Set request headers. This option may be repeated.
                         Example -H "content-type:text/plain"
+  --prefix <prefix>     Update every object in the container beginning with
+                        <prefix>.
+  --object-threads <threads>
+                        Number of threads to use for updating many objects.
+                        Default is 10.
 '''.strip('\n')
 
 
@@ -750,11 +955,20 @@ def st_post(parser, args, thread_manager):
         default=[], help='Set request headers. This option may be repeated. '
         'Example: -H "content-type:text/plain" '
         '-H "Content-Length: 4000"')
+    parser.add_option(
+        '-p', '--prefix', dest='prefix',
+        help='Update every object in the container beginning with <prefix>.')
+    parser.add_option(
+        '', '--object-threads', type=int, default=10,
+        help='Number of threads to use for updating many objects. '
+        'Default is 10.')
     (options, args) = parse_args(parser, args)
     args = args[1:]
     if (options.read_acl or options.write_acl or options.sync_to or
             options.sync_key) and not args:
         exit('-r, -w, -t, and -k options only allowed for containers')
+    if options.prefix is not None and not args:
+        exit('--prefix option only allowed for containers')
     conn = get_conn(options)
     if not args:
         headers = split_headers(
@@ -766,7 +980,7 @@ def st_post(parser, args, thread_manager):
             if err.http_status != 404:
                 raise
             thread_manager.error('Account not found')
-    elif len(args) == 1:
+    elif len(args) == 1 and options.prefix is None:
         if '/' in args[0]:
             print(
                 'WARNING: / in container name; you might have meant %r instead'
@@ -801,14 +1015,29 @@ def st_post(parser, args, thread_manager):
                 raise
             thread_manager.error("Object '%s/%s' not found", args[0], args[1])
     else:
-        thread_manager.error('Usage: %s post %s\n%s', BASENAME,
-                             st_post_options, st_post_help)
+        headers = split_headers(options.meta, 'X-Object-Meta-', thread_manager)
+        headers.update(split_headers(options.header, '', thread_manager))
+        ops = _object_ops(conn, 'post', args[0], args[1:], options.prefix,
+                          headers)
+        try:
+            for result in conn.batch(ops,
+                                     concurrency=options.object_threads):
+                if not result['success']:
+                    _report_batch_failure(thread_manager, result)
+        except ClientException as err:
+            if err.http_status != 404:
+                raise
+            thread_manager.error('Container %r not found', args[0])
 
 st_upload_options = '''[--changed] [--skip-identical] [--segment-size <size>]
                     [--segment-container <container>] [--leave-segments]
                     [--object-threads <thread>] [--segment-threads <threads>]
-                    [--header <header>] [--use-slo]
-                    [--object-name <object-name>]
+                    [--header <header>] [--use-slo] [--resume]
+                    [--object-name <object-name>] [--journal <file>]
+                    [--include <pattern>] [--exclude <pattern>]
+                    [--follow-symlinks] [--scan-threads <threads>]
+                    [--largest-first] [--partition <index>/<count>]
+                    [--straggler-factor <factor>]
                     <container> <file_or_directory>
 '''
 
@@ -818,7 +1047,9 @@ Uploads specified files and directories to the given container
 Positional arguments:
   <container>           Name of container to upload to.
   <file_or_directory>   Name of file or directory to upload. Specify multiple
-                        times for multiple uploads.
+                        times for multiple uploads. Specify - with
+                        --object-name to upload standard input as a Static
+                        Large Object made of --segment-size segments.
 
 Optional arguments:
   --changed             Only upload files that have changed since the last
@@ -847,10 +1078,41 @@ Optional arguments:
   --use-slo             When used in conjunction with --segment-size it will
                         create a Static Large Object instead of the default
                         Dynamic Large Object.
+  --resume              When used in conjunction with --segment-size, reuse
+                        the segments left behind by an earlier interrupted
+                        upload of the same file whose size and MD5 match,
+                        and only upload the missing ones.
   --object-name <object-name>
                         Upload file and name object to <object-name> or upload
                         dir and use <object-name> as object prefix instead of
                         folder name.
+  --journal <file>      Record the outcome of every object in <file>, and skip
+                        the objects recorded as done there by an earlier run.
+                        Objects which failed are retried.
+  --include <pattern>   When uploading directories, only upload the files
+                        whose name or path below the directory matches the
+                        glob <pattern>. This option may be repeated.
+  --exclude <pattern>   When uploading directories, skip the files and
+                        subdirectories whose name or path below the directory
+                        matches the glob <pattern>. This option may be
+                        repeated.
+  --follow-symlinks     Upload the contents of symlinked directories too,
+                        instead of skipping them.
+  --scan-threads <threads>
+                        Number of threads to use for listing directories.
+                        Default is 1.
+  --largest-first       Start the largest of the files to upload first,
+                        so that small ones fill in around them rather than a
+                        large one running on alone at the end.
+  --partition <index>/<count>
+                        Only upload the share of the objects in partition
+                        <index> of <count>, chosen by a hash of their names,
+                        so that <count> processes with the indexes 0 to
+                        <count>-1 split the work between them.
+  --straggler-factor <factor>
+                        Upload a segment again on another thread once it has
+                        taken <factor> times as long as the median segment
+                        of its file, and use whichever copy finishes first.
 '''.strip('\n')
 
 
@@ -897,10 +1159,53 @@ def st_upload(parser, args, thread_manager):
         help='When used in conjunction with --segment-size, it will '
         'create a Static Large Object instead of the default '
         'Dynamic Large Object.')
+    parser.add_option(
+        '', '--resume', action='store_true', default=False,
+        help='When used in conjunction with --segment-size, reuse the '
+        'segments left behind by an earlier interrupted upload of the same '
+        'file whose size and MD5 match, and only upload the missing ones.')
     parser.add_option(
         '', '--object-name', dest='object_name',
         help='Upload file and name object to <object-name> or upload dir and '
         'use <object-name> as object prefix instead of folder name.')
+    parser.add_option(
+        '', '--journal', dest='journal',
+        help='Record the outcome of every object in <file>, and skip the '
+        'objects recorded as done there by an earlier run. Objects which '
+        'failed are retried.')
+    parser.add_option(
+        '', '--include', action='append', dest='include', default=[],
+        help='When uploading directories, only upload the files whose name '
+        'or path below the directory matches the glob <pattern>. This option '
+        'may be repeated.')
+    parser.add_option(
+        '', '--exclude', action='append', dest='exclude', default=[],
+        help='When uploading directories, skip the files and subdirectories '
+        'whose name or path below the directory matches the glob <pattern>. '
+        'This option may be repeated.')
+    parser.add_option(
+        '', '--follow-symlinks', action='store_true', default=False,
+        help='Upload the contents of symlinked directories too, instead of '
+        'skipping them.')
+    parser.add_option(
+        '', '--scan-threads', type=int, default=1,
+        help='Number of threads to use for listing directories. '
+        'Default is 1.')
+    parser.add_option(
+        '', '--largest-first', action='store_true', default=False,
+        help='Start the largest of the files to upload first, so that small '
+        'ones fill in around them rather than a large one running on alone '
+        'at the end.')
+    parser.add_option(
+        '', '--partition', dest='partition',
+        help='Only upload the share of the objects in partition INDEX of '
+        'COUNT, chosen by a hash of their names, so that COUNT processes '
+        'with the indexes 0 to COUNT-1 split the work between them.')
+    parser.add_option(
+        '', '--straggler-factor', type=float,
+        help='Upload a segment again on another thread once it has taken '
+        'this many times as long as the median segment of its file, and '
+        'use whichever copy finishes first.')
     (options, args) = parse_args(parser, args)
     args = args[1:]
     if len(args) < 2:
@@ -908,248 +1213,41 @@ def st_upload(parser, args, thread_manager):
             'Usage: %s upload %s\n%s', BASENAME, st_upload_options,
             st_upload_help)
         return
+    journal = Journal(options.journal) if options.journal else None
+    upload_options = {
+        'segment_size': options.segment_size,
+        'segment_container': options.segment_container,
+        'use_slo': options.use_slo,
+        'leave_segments': options.leave_segments,
+        'changed': options.changed,
+        'skip_identical': options.skip_identical,
+        'resume': options.resume,
+        'headers': split_headers(options.header, '', thread_manager),
+    }
 
-    def _segment_job(job, conn):
-        if job.get('delete', False):
-            conn.delete_object(job['container'], job['obj'])
+    def _print_attempts(msg, attempts):
+        if attempts > 1:
+            thread_manager.print_msg('%s [after %d attempts]', msg, attempts)
         else:
-            fp = open(job['path'], 'rb')
-            fp.seek(job['segment_start'])
-            seg_container = args[0] + '_segments'
-            if options.segment_container:
-                seg_container = options.segment_container
-            etag = conn.put_object(job.get('container', seg_container),
-                                   job['obj'], fp,
-                                   content_length=job['segment_size'])
-            job['segment_location'] = '/%s/%s' % (seg_container, job['obj'])
-            job['segment_etag'] = etag
-        if options.verbose and 'log_line' in job:
-            if conn.attempts > 1:
-                thread_manager.print_msg('%s [after %d attempts]',
-                                         job['log_line'], conn.attempts)
-            else:
-                thread_manager.print_msg(job['log_line'])
-        return job
-
-    def _object_job(job, conn):
-        path = job['path']
-        container = job.get('container', args[0])
-        dir_marker = job.get('dir_marker', False)
-        object_name = job['object_name']
-        try:
-            if object_name is not None:
-                object_name.replace("\\", "/")
-                obj = object_name
-            else:
-                obj = path
-                if obj.startswith('./') or obj.startswith('.\\'):
-                    obj = obj[2:]
-                if obj.startswith('/'):
-                    obj = obj[1:]
-            put_headers = {'x-object-meta-mtime': "%f" % getmtime(path)}
-            if dir_marker:
-                if options.changed:
-                    try:
-                        headers = conn.head_object(container, obj)
-                        ct = headers.get('content-type')
-                        cl = int(headers.get('content-length'))
-                        et = headers.get('etag')
-                        mt = headers.get('x-object-meta-mtime')
-                        if ct.split(';', 1)[0] == 'text/directory' and \
-                                cl == 0 and \
-                                et == 'd41d8cd98f00b204e9800998ecf8427e' and \
-                                mt == put_headers['x-object-meta-mtime']:
-                            return
-                    except ClientException as err:
-                        if err.http_status != 404:
-                            raise
-                conn.put_object(container, obj, '', content_length=0,
-                                content_type='text/directory',
-                                headers=put_headers)
-            else:
-                # We need to HEAD all objects now in case we're overwriting a
-                # manifest object and need to delete the old segments
-                # ourselves.
-                old_manifest = None
-                old_slo_manifest_paths = []
-                new_slo_manifest_paths = set()
-                if options.changed or options.skip_identical \
-                        or not options.leave_segments:
-                    if options.skip_identical:
-                        checksum = None
-                        try:
-                            fp = open(path, 'rb')
-                        except IOError:
-                            pass
-                        else:
-                            with fp:
-                                md5sum = md5()
-                                while True:
-                                    data = fp.read(65536)
-                                    if not data:
-                                        break
-                                    md5sum.update(data)
-                            checksum = md5sum.hexdigest()
-                    try:
-                        headers = conn.head_object(container, obj)
-                        cl = int(headers.get('content-length'))
-                        mt = headers.get('x-object-meta-mtime')
-                        if (options.skip_identical and
-                                checksum == headers.get('etag')):
-                            thread_manager.print_msg(
-                                "Skipped identical file '%s'", path)
-                            return
-                        if options.changed and cl == getsize(path) and \
-                                mt == put_headers['x-object-meta-mtime']:
-                            return
-                        if not options.leave_segments:
-                            old_manifest = headers.get('x-object-manifest')
-                            if config_true_value(
-                                    headers.get('x-static-large-object')):
-                                headers, manifest_data = conn.get_object(
-                                    container, obj,
-                                    query_string='multipart-manifest=get')
-                                for old_seg in json.loads(manifest_data):
-                                    seg_path = old_seg['name'].lstrip('/')
-                                    if isinstance(seg_path, unicode):
-                                        seg_path = seg_path.encode('utf-8')
-                                    old_slo_manifest_paths.append(seg_path)
-                    except ClientException as err:
-                        if err.http_status != 404:
-                            raise
-                # Merge the command line header options to the put_headers
-                put_headers.update(split_headers(options.header, '',
-                                                 thread_manager))
-                # Don't do segment job if object is not big enough
-                if options.segment_size and \
-                        getsize(path) > int(options.segment_size):
-                    seg_container = container + '_segments'
-                    if options.segment_container:
-                        seg_container = options.segment_container
-                    full_size = getsize(path)
-
-                    slo_segments = []
-                    error_counter = [0]
-                    segment_manager = thread_manager.queue_manager(
-                        _segment_job, options.segment_threads,
-                        store_results=slo_segments,
-                        error_counter=error_counter,
-                        connection_maker=create_connection)
-                    with segment_manager as segment_queue:
-                        segment = 0
-                        segment_start = 0
-                        while segment_start < full_size:
-                            segment_size = int(options.segment_size)
-                            if segment_start + segment_size > full_size:
-                                segment_size = full_size - segment_start
-                            if options.use_slo:
-                                segment_name = '%s/slo/%s/%s/%s/%08d' % (
-                                    obj, put_headers['x-object-meta-mtime'],
-                                    full_size, options.segment_size, segment)
-                            else:
-                                segment_name = '%s/%s/%s/%s/%08d' % (
-                                    obj, put_headers['x-object-meta-mtime'],
-                                    full_size, options.segment_size, segment)
-                            segment_queue.put(
-                                {'path': path, 'obj': segment_name,
-                                 'segment_start': segment_start,
-                                 'segment_size': segment_size,
-                                 'segment_index': segment,
-                                 'log_line': '%s segment %s' % (obj, segment)})
-                            segment += 1
-                            segment_start += segment_size
-                    if error_counter[0]:
-                        raise ClientException(
-                            'Aborting manifest creation '
-                            'because not all segments could be uploaded. %s/%s'
-                            % (container, obj))
-                    if options.use_slo:
-                        slo_segments.sort(key=lambda d: d['segment_index'])
-                        for seg in slo_segments:
-                            seg_loc = seg['segment_location'].lstrip('/')
-                            if isinstance(seg_loc, unicode):
-                                seg_loc = seg_loc.encode('utf-8')
-                            new_slo_manifest_paths.add(seg_loc)
-
-                        manifest_data = json.dumps([
-                            {'path': d['segment_location'],
-                             'etag': d['segment_etag'],
-                             'size_bytes': d['segment_size']}
-                            for d in slo_segments])
-
-                        put_headers['x-static-large-object'] = 'true'
-                        conn.put_object(container, obj, manifest_data,
-                                        headers=put_headers,
-                                        query_string='multipart-manifest=put')
-                    else:
-                        new_object_manifest = '%s/%s/%s/%s/%s/' % (
-                            quote(seg_container), quote(obj),
-                            put_headers['x-object-meta-mtime'], full_size,
-                            options.segment_size)
-                        if old_manifest and old_manifest.rstrip('/') == \
-                                new_object_manifest.rstrip('/'):
-                            old_manifest = None
-                        put_headers['x-object-manifest'] = new_object_manifest
-                        conn.put_object(container, obj, '', content_length=0,
-                                        headers=put_headers)
-                else:
-                    conn.put_object(
-                        container, obj, open(path, 'rb'),
-                        content_length=getsize(path), headers=put_headers)
-                if old_manifest or old_slo_manifest_paths:
-                    segment_manager = thread_manager.queue_manager(
-                        _segment_job, options.segment_threads,
-                        connection_maker=create_connection)
-                    segment_queue = segment_manager.queue
-                    if old_manifest:
-                        scontainer, sprefix = old_manifest.split('/', 1)
-                        scontainer = unquote(scontainer)
-                        sprefix = unquote(sprefix).rstrip('/') + '/'
-                        for delobj in conn.get_container(scontainer,
-                                                         prefix=sprefix)[1]:
-                            segment_queue.put(
-                                {'delete': True,
-                                 'container': scontainer,
-                                 'obj': delobj['name']})
-                    if old_slo_manifest_paths:
-                        for seg_to_delete in old_slo_manifest_paths:
-                            if seg_to_delete in new_slo_manifest_paths:
-                                continue
-                            scont, sobj = \
-                                seg_to_delete.split('/', 1)
-                            segment_queue.put(
-                                {'delete': True,
-                                 'container': scont, 'obj': sobj})
-                    if not segment_queue.empty():
-                        with segment_manager:
-                            pass
-            if options.verbose:
-                if conn.attempts > 1:
-                    thread_manager.print_msg('%s [after %d attempts]', obj,
-                                             conn.attempts)
-                else:
-                    thread_manager.print_msg(obj)
-        except OSError as err:
-            if err.errno != ENOENT:
-                raise
-            thread_manager.error('Local file %r not found', path)
+            thread_manager.print_msg(msg)
 
-    def _upload_dir(path, object_queue, object_name):
-        names = listdir(path)
-        if not names:
-            object_queue.put({'path': path, 'object_name': object_name,
-                             'dir_marker': True})
-        else:
-            for name in listdir(path):
-                subpath = join(path, name)
-                subobjname = None
-                if object_name is not None:
-                    subobjname = join(object_name, name)
-                if isdir(subpath):
-                    _upload_dir(subpath, object_queue, subobjname)
-                else:
-                    object_queue.put({'path': subpath,
-                                     'object_name': subobjname})
+    def _progress(result):
+        if not result['success']:
+            _report_failure(thread_manager, result)
+        elif result['action'] == 'upload_segment':
+            if options.verbose:
+                msg = '%s segment %s' % (result['for_object'],
+                                         result['index'])
+                if result['reused']:
+                    msg += ' [already uploaded]'
+                _print_attempts(msg, result['attempts'])
+        elif result['action'] != 'upload_object':
+            pass
+        elif result.get('reason') == 'identical':
+            thread_manager.print_msg("Skipped identical file '%s'",
+                                     result['path'])
+        elif result['status'] == OK and options.verbose:
+            _print_attempts(result['object'], result['attempts'])
 
     create_connection = lambda: get_conn(options)
     conn = create_connection()
@@ -1160,7 +1258,7 @@ def st_upload(parser, args, thread_manager):
     # it'll surface on the first object PUT.
     try:
         conn.put_container(args[0])
-        if options.segment_size is not None:
+        if options.segment_size is not None or '-' in args[1:]:
             seg_container = args[0] + '_segments'
             if options.segment_container:
                 seg_container = options.segment_container
@@ -1183,22 +1281,383 @@ def st_upload(parser, args, thread_manager):
         if len(args[1:]) > 1:
             thread_manager.error('object-name only be used with 1 file or dir')
             return
+    elif '-' in args[1:]:
+        thread_manager.error('object-name must be given to upload from stdin')
+        return
     object_name = options.object_name
+    partition = _partition(options)
+
+    with TransferManager(create_connection,
+                         object_threads=options.object_threads,
+                         segment_threads=options.segment_threads,
+                         progress=_progress, journal=journal,
+                         largest_first=options.largest_first,
+                         straggler_factor=options.straggler_factor) as manager:
+        if args[1:] == ['-']:
+            if in_partition(object_name, partition):
+                manager.upload_file(args[0], '-', object_name,
+                                    fileobj=stdin, **upload_options)
+        else:
+            for _result in manager.upload_tree(
+                    args[0], args[1:], object_name, include=options.include,
+                    exclude=options.exclude,
+                    follow_symlinks=options.follow_symlinks,
+                    scan_threads=options.scan_threads,
+                    partition=partition, **upload_options):
+                pass
+
+
+st_copy_options = '''[--prefix <prefix>] [--object-threads <threads>]
+                  [--header <header>]
+                  --destination <container>[/<object>]
+                  <container> [object] [...]
+'''
+
+st_copy_help = '''
+Copy objects within the cluster, without downloading them
+
+Positional arguments:
+  <container>           Name of container to copy from.
+  [object]              Name of object to copy. Specify multiple times
+                        for multiple objects. Omit this to copy all
+                        objects of the container.
+
+Optional arguments:
+  --destination <container>[/<object>]
+                        Container to copy the objects to, keeping their
+                        names. When copying a single object, it may be given
+                        a new name too.
+  --prefix <prefix>     Only copy objects beginning with <prefix>.
+  --object-threads <threads>
+                        Number of threads to use for copying objects.
+                        Default is 10.
+  --header <header>     Set request headers on the copies with the syntax
+                        header:value. This option may be repeated.
+
+Large objects are copied by writing a new manifest referring to the same
+segments.
+'''.strip('\n')
+
+st_move_options = st_copy_options
+
+st_move_help = '''
+Move objects within the cluster, without downloading them
+
+Positional arguments:
+  <container>           Name of container to move from.
+  [object]              Name of object to move. Specify multiple times
+                        for multiple objects. Omit this to move all
+                        objects of the container.
+
+Optional arguments:
+  --destination <container>[/<object>]
+                        Container to move the objects to, keeping their
+                        names. When moving a single object, it may be given
+                        a new name too.
+  --prefix <prefix>     Only move objects beginning with <prefix>.
+  --object-threads <threads>
+                        Number of threads to use for copying objects.
+                        Default is 10.
+  --header <header>     Set request headers on the copies with the syntax
+                        header:value. This option may be repeated.
 
-    object_manager = thread_manager.queue_manager(
-        _object_job, options.object_threads,
+Objects are copied and the sources then deleted, with bulk delete requests
+if the cluster supports them. Large objects are moved by writing a new
+manifest referring to the same segments, which are left in place.
+'''.strip('\n')
+
+
+def st_copy(parser, args, thread_manager):
+    _copy_objects(parser, args, thread_manager, 'copy', False)
+
+
+def st_move(parser, args, thread_manager):
+    _copy_objects(parser, args, thread_manager, 'move', True)
+
+
+def _copy_objects(parser, args, thread_manager, command, move):
+    parser.add_option(
+        '-d', '--destination', dest='destination',
+        help='Container to copy the objects to, keeping their names. When '
+        'copying a single object, it may be given a new name too.')
+    parser.add_option(
+        '-p', '--prefix', dest='prefix',
+        help='Only copy objects beginning with <prefix>.')
+    parser.add_option(
+        '', '--object-threads', type=int, default=10,
+        help='Number of threads to use for copying objects. Default is 10.')
+    parser.add_option(
+        '-H', '--header', action='append', dest='header',
+        default=[], help='Set request headers on the copies with the syntax '
+        'header:value. This option may be repeated.')
+    (options, args) = parse_args(parser, args)
+    args = args[1:]
+    if not args or not options.destination:
+        thread_manager.error(
+            'Usage: %s %s %s\n%s', BASENAME, command,
+            globals()['st_%s_options' % command],
+            globals()['st_%s_help' % command])
+        return
+    container = args[0]
+    if '/' in options.destination:
+        dest_container, dest_obj = options.destination.split('/', 1)
+        if len(args) != 2:
+            thread_manager.error(
+                'A destination object name can only be given for a single '
+                'object')
+            return
+    else:
+        dest_container, dest_obj = options.destination, None
+    headers = split_headers(options.header, '', thread_manager)
+    moved = []
+
+    def _copy_object(obj, conn):
+        dest = dest_obj or obj
+        if (container, obj) == (dest_container, dest):
+            thread_manager.error('%s/%s: source and destination are the same',
+                                 container, obj)
+            return
+        try:
+            copy_object(conn, container, obj, dest_container, dest,
+                        headers=headers)
+        except ClientException as err:
+            if err.http_status != 404:
+                raise
+            thread_manager.error("Object '%s/%s' not found", container, obj)
+            return
+        if move:
+            moved.append(obj)
+        if options.verbose:
+            if conn.attempts > 1:
+                thread_manager.print_msg('%s/%s -> %s/%s [after %d attempts]',
+                                         container, obj, dest_container, dest,
+                                         conn.attempts)
+            else:
+                thread_manager.print_msg('%s/%s -> %s/%s', container, obj,
+                                         dest_container, dest)
+
+    create_connection = lambda: get_conn(options)
+    conn = create_connection()
+    try:
+        conn.put_container(dest_container)
+    except ClientException:
+        # Maybe no container PUT permission; the copies will tell.
+        pass
+    obj_manager = thread_manager.queue_manager(
+        _copy_object, options.object_threads,
         connection_maker=create_connection)
-    with object_manager as object_queue:
+    with obj_manager as object_queue:
+        if len(args) > 1:
+            for obj in args[1:]:
+                object_queue.put(obj)
+        else:
+            try:
+                for obj in conn.get_container(container,
+                                              prefix=options.prefix,
+                                              full_listing=True)[1]:
+                    object_queue.put(obj['name'])
+            except ClientException as err:
+                if err.http_status != 404:
+                    raise
+                thread_manager.error('Container %r not found', container)
+    if moved:
+        failures = delete_objects(conn, container, moved,
+                                  bulk_limit=get_bulk_delete_limit(conn))
+        for obj, error in failures:
+            thread_manager.error('Error deleting %s/%s after copying it: %s',
+                                 container, obj, error)
+
+
+st_migrate_options = '''[--prefix <prefix>] [--dest-container <container>]
+                     [--object-threads <threads>]
+                     [--segment-threads <threads>] [--segment-size <size>]
+                     [--buffer-size <size>] [--dest-auth <auth_url>]
+                     [--dest-auth-version <auth_version>]
+                     [--dest-user <username>] [--dest-key <api_key>]
+                     [--dest-os-tenant-name <tenant-name>]
+                     [--dest-os-storage-url <url>]
+                     [--dest-os-auth-token <auth-token>]
+                     <container> [object] [...]
+'''
+
+st_migrate_help = '''
+Copy objects to another cluster, streaming them without a local copy
+
+Positional arguments:
+  <container>           Name of container to copy from.
+  [object]              Name of object to copy. Specify multiple times
+                        for multiple objects. Omit this to copy all
+                        objects of the container.
+
+Optional arguments:
+  --prefix <prefix>     Only copy objects beginning with <prefix>.
+  --dest-container <container>
+                        Container to copy to on the destination. Defaults to
+                        the name of the source container.
+  --object-threads <threads>
+                        Number of objects to copy at once. Default is 10.
+  --segment-threads <threads>
+                        Number of segments of each large object to upload at
+                        once. Default is 4.
+  --segment-size <size> Objects larger than <size> bytes are uploaded as
+                        Static Large Objects made of segments of this size,
+                        each buffered in memory. Defaults to what fits in
+                        --buffer-size.
+  --buffer-size <size>  Bytes of segments to hold in memory across all
+                        threads, used to pick the default segment size.
+                        Default is 1073741824 (1GiB). Objects too large for
+                        1000 segments of that size get bigger segments, and
+                        segments over 64MiB are spooled to temporary files.
+  --dest-auth <auth_url>
+                        URL for obtaining an auth token on the destination.
+  --dest-auth-version <auth_version>
+                        Auth version of the destination. Defaults to the
+                        source's.
+  --dest-user <username>
+                        User name on the destination.
+  --dest-key <api_key>  Key on the destination.
+  --dest-os-tenant-name <tenant-name>
+                        Tenant name on the destination.
+  --dest-os-storage-url <url>
+                        Storage URL of the destination, instead of the one
+                        returned by its auth.
+  --dest-os-auth-token <auth-token>
+                        Auth token for the destination.
+
+Content type and metadata are copied along, and the data is checked against
+the source's length and ETag before each object is written.
+'''.strip('\n')
+
+
+def st_migrate(parser, args, thread_manager):
+    parser.add_option(
+        '-p', '--prefix', dest='prefix',
+        help='Only copy objects beginning with <prefix>.')
+    parser.add_option(
+        '', '--dest-container', dest='dest_container',
+        help='Container to copy to on the destination. Defaults to the name '
+        'of the source container.')
+    parser.add_option(
+        '', '--object-threads', type=int, default=10,
+        help='Number of objects to copy at once. Default is 10.')
+    parser.add_option(
+        '', '--segment-threads', type=int, default=4,
+        help='Number of segments of each large object to upload at once. '
+        'Default is 4.')
+    parser.add_option(
+        '-S', '--segment-size', type=int,
+        help='Objects larger than <size> bytes are uploaded as Static Large '
+        'Objects made of segments of this size, each buffered in memory. '
+        'Defaults to what fits in --buffer-size.')
+    parser.add_option(
+        '', '--buffer-size', type=int, default=DEFAULT_MIGRATE_BUFFER,
+        help='Bytes of segments to hold in memory across all threads, used '
+        'to pick the default segment size. Default is %d. Segments over '
+        '%d bytes are spooled to temporary files.' % (
+            DEFAULT_MIGRATE_BUFFER, DEFAULT_SPOOL_SIZE))
+    parser.add_option(
+        '', '--dest-auth', dest='dest_auth',
+        help='URL for obtaining an auth token on the destination.')
+    parser.add_option(
+        '', '--dest-auth-version', dest='dest_auth_version',
+        help="Auth version of the destination. Defaults to the source's.")
+    parser.add_option(
+        '', '--dest-user', dest='dest_user',
+        help='User name on the destination.')
+    parser.add_option(
+        '', '--dest-key', dest='dest_key',
+        help='Key on the destination.')
+    parser.add_option(
+        '', '--dest-os-tenant-name', dest='dest_os_tenant_name',
+        help='Tenant name on the destination.')
+    parser.add_option(
+        '', '--dest-os-storage-url', dest='dest_os_storage_url',
+        help='Storage URL of the destination, instead of the one returned by '
+        'its auth.')
+    parser.add_option(
+        '', '--dest-os-auth-token', dest='dest_os_auth_token',
+        help='Auth token for the destination.')
+    (options, args) = parse_args(parser, args)
+    args = args[1:]
+    if not args or not (options.dest_auth or options.dest_os_storage_url):
+        thread_manager.error('Usage: %s migrate %s\n%s', BASENAME,
+                             st_migrate_options, st_migrate_help)
+        return
+    container = args[0]
+    dest_container = options.dest_container or container
+    segment_size = options.segment_size
+    if not segment_size:
+        # each object thread fills one segment while segment_threads upload
+        segment_size = max(1024 * 1024, options.buffer_size // (
+            options.object_threads * (options.segment_threads + 1)))
+
+    def create_dest_connection():
+        return Connection(options.dest_auth,
+                          options.dest_user,
+                          options.dest_key,
+                          options.retries,
+                          auth_version=(options.dest_auth_version or
+                                        options.auth_version),
+                          os_options={
+                              'tenant_name': options.dest_os_tenant_name,
+                              'object_storage_url':
+                              options.dest_os_storage_url,
+                              'auth_token': options.dest_os_auth_token},
+                          cacert=options.os_cacert,
+                          insecure=options.insecure,
+                          ssl_compression=options.ssl_compression,
+                          **options.shared_conn_options)
+
+    dest = local()
+
+    def _migrate_object(obj, conn):
+        if not hasattr(dest, 'conn'):
+            # share the token dest_conn got rather than authenticating again
+            dest.conn = dest_conn._clone()
         try:
-            for arg in args[1:]:
-                if isdir(arg):
-                    _upload_dir(arg, object_queue, object_name)
-                else:
-                    object_queue.put({'path': arg, 'object_name': object_name})
+            migrate_object(conn, dest.conn, container, obj,
+                           dest_container=dest_container,
+                           segment_size=segment_size,
+                           segment_threads=options.segment_threads,
+                           dest_connection_maker=dest.conn._clone)
         except ClientException as err:
             if err.http_status != 404:
                 raise
-            thread_manager.error('Account not found')
+            thread_manager.error("Object '%s/%s' not found", container, obj)
+            return
+        if options.verbose:
+            if conn.attempts > 1:
+                thread_manager.print_msg('%s/%s [after %d attempts]',
+                                         container, obj, conn.attempts)
+            else:
+                thread_manager.print_msg('%s/%s', container, obj)
+
+    create_connection = lambda: get_conn(options)
+    conn = create_connection()
+    dest_conn = create_dest_connection()
+    try:
+        dest_conn.put_container(dest_container)
+        dest_conn.put_container(dest_container + '_segments')
+    except ClientException:
+        # Maybe no container PUT permission; the uploads will tell.
+        pass
+    obj_manager = thread_manager.queue_manager(
+        _migrate_object, options.object_threads,
+        connection_maker=create_connection)
+    with obj_manager as object_queue:
+        if len(args) > 1:
+            for obj in args[1:]:
+                object_queue.put(obj)
+        else:
+            try:
+                for obj in conn.get_container(container,
+                                              prefix=options.prefix,
+                                              full_listing=True)[1]:
+                    object_queue.put(obj['name'])
+            except ClientException as err:
+                if err.http_status != 404:
+                    raise
+                thread_manager.error('Container %r not found', container)
 
 
 st_capabilities_options = "[<proxy_url>]"
@@ -1292,6 +1751,36 @@ def parse_args(parser, args, enforce_requires=True):
         'region_name': options.os_region_name,
     }
 
+    # Shared by all the connections of this process; with --processes, each
+    # process gets an even share of the rate limits.
+    options.shared_conn_options = dict(
+        (name, TokenBucket(rate / options.processes)) for name, rate in (
+            ('upload_limit', options.upload_limit),
+            ('download_limit', options.download_limit),
+            ('request_limit', options.request_limit)) if rate)
+    if options.adaptive_retries:
+        options.shared_conn_options['retry_policy'] = AdaptiveRetryPolicy()
+    for name in ('connect_timeout', 'read_timeout', 'min_speed'):
+        if getattr(options, name):
+            options.shared_conn_options[name] = getattr(options, name)
+    if options.min_speed:
+        options.shared_conn_options['min_speed_period'] = \
+            options.min_speed_period
+    if options.hedge_after == 'auto':
+        options.shared_conn_options['hedge_policy'] = HedgePolicy()
+    elif options.hedge_after:
+        try:
+            delay = float(options.hedge_after)
+        except ValueError:
+            exit('--hedge-after: expected a number of seconds or "auto", '
+                 'not %r' % options.hedge_after)
+        options.shared_conn_options['hedge_policy'] = HedgePolicy(delay)
+    if options.endpoints or options.all_endpoints:
+        options.shared_conn_options['endpoints'] = EndpointPool(
+            options.endpoints)
+    if options.transport != 'requests':
+        options.shared_conn_options['transport'] = options.transport
+
     if len(args) > 1 and args[0] == "capabilities":
         return options, args
 
@@ -1334,7 +1823,13 @@ usage: %%prog [--version] [--help] [--snet] [--verbose]
              [--os-service-type <service-type>]
              [--os-endpoint-type <endpoint-type>]
              [--os-cacert <ca-certificate>] [--insecure]
-             [--no-ssl-compression]
+             [--no-ssl-compression] [--processes <count>]
+             [--upload-limit <bytes/s>] [--download-limit <bytes/s>]
+             [--request-limit <requests/s>] [--adaptive-retries]
+             [--connect-timeout <seconds>] [--read-timeout <seconds>]
+             [--min-speed <bytes/s>] [--min-speed-period <seconds>]
+             [--hedge-after <seconds|auto>] [--endpoint <storage-url>]
+             [--all-endpoints] [--transport <requests|raw>]
              <subcommand> ...
 
 Command-line interface to the OpenStack Swift API.
@@ -1350,6 +1845,9 @@ Positional arguments:
     stat                 Displays information for the account, container,
                          or object.
     upload               Uploads files or directories to the given container
+    copy                 Copy objects within the cluster.
+    move                 Move objects within the cluster.
+    migrate              Copy objects to another cluster.
     capabilities         List cluster capabilities.
 
 
@@ -1483,18 +1981,84 @@ Examples:
                       help='This option is deprecated and not used anymore. '
                            'SSL compression should be disabled by default '
                            'by the system SSL library.')
+    parser.add_option('--processes', type=int, default=1,
+                      metavar='<count>',
+                      help='Split a download or upload between <count> '
+                           'worker processes, each with its own threads and '
+                           'connections, by running it with --partition '
+                           '0/<count> to <count>-1/<count>. Defaults to 1.')
+    parser.add_option('--upload-limit', type=float, metavar='<bytes/s>',
+                      help='Limit the object data uploaded by all threads '
+                           'together to <bytes/s> bytes per second.')
+    parser.add_option('--download-limit', type=float, metavar='<bytes/s>',
+                      help='Limit the object data downloaded by all threads '
+                           'together to <bytes/s> bytes per second.')
+    parser.add_option('--request-limit', type=float,
+                      metavar='<requests/s>',
+                      help='Limit the requests made by all threads together '
+                           'to <requests/s> requests per second.')
+    parser.add_option('--adaptive-retries', action='store_true',
+                      default=False,
+                      help='Retry with jittered backoff, retry ratelimited '
+                           'requests after their Retry-After, and share a '
+                           'retry budget and a circuit breaker between all '
+                           'threads.')
+    parser.add_option('--connect-timeout', type=float, metavar='<seconds>',
+                      help='Give up connecting to the server after '
+                           '<seconds>, and retry.')
+    parser.add_option('--read-timeout', type=float, metavar='<seconds>',
+                      help='Give up on a response when the server sends '
+                           'nothing for <seconds>, and retry.')
+    parser.add_option('--min-speed', type=float, metavar='<bytes/s>',
+                      help='Abort and retry or resume an object download or '
+                           'upload which moves slower than <bytes/s> over '
+                           '--min-speed-period.')
+    parser.add_option('--min-speed-period', type=float, default=30,
+                      metavar='<seconds>',
+                      help='Seconds over which --min-speed is measured. '
+                           'Defaults to 30.')
+    parser.add_option('--hedge-after', metavar='<seconds|auto>',
+                      help='Send a second copy of a HEAD, listing or object '
+                           'GET which has not been answered after <seconds> '
+                           'over another connection, and use whichever '
+                           'answers first; with "auto", after the 95th '
+                           'percentile of the latencies seen so far.')
+    parser.add_option('--endpoint', action='append', dest='endpoints',
+                      metavar='<storage-url>',
+                      help='Spread requests over this storage URL instead '
+                           'of the one from auth. Give it once for each of '
+                           'several proxies or regions serving the same '
+                           'account.')
+    parser.add_option('--all-endpoints', action='store_true', default=False,
+                      help='Spread requests over every matching '
+                           'object-store endpoint of the service catalog.')
+    parser.add_option('--transport', type='choice', default='requests',
+                      choices=('requests', 'raw'),
+                      metavar='<requests|raw>',
+                      help='Make HTTP requests with python-requests (the '
+                           'default) or with the leaner "raw" urllib3 '
+                           'transport, which costs much less CPU per request '
+                           'when most requests are small.')
     parser.disable_interspersed_args()
     (options, args) = parse_args(parser, argv[1:], enforce_requires=False)
     parser.enable_interspersed_args()
 
     commands = ('delete', 'download', 'list', 'post',
-                'stat', 'upload', 'capabilities', 'info')
+                'stat', 'upload', 'capabilities', 'info', 'copy', 'move',
+                'migrate')
     if not args or args[0] not in commands:
         parser.print_usage()
         if args:
             exit('no such command: %s' % args[0])
         exit()
 
+    if options.processes > 1:
+        if args[0] not in ('download', 'upload'):
+            exit('--processes is only supported by download and upload')
+        for opt in ('--partition', '--journal'):
+            if any(arg == opt or arg.startswith(opt + '=') for arg in args):
+                exit('--processes cannot be used with %s' % opt)
+
     signal.signal(signal.SIGINT, immediate_exit)
 
     if options.debug or options.info:
@@ -1506,14 +2070,34 @@ Examples:
 
     had_error = False
 
-    with MultiThreadingManager() as thread_manager:
-        parser.usage = globals()['st_%s_help' % args[0]]
+    def _run_command(command_args, thread_manager):
         try:
-            globals()['st_%s' % args[0]](parser, argv[1:], thread_manager)
+            globals()['st_%s' % args[0]](parser, command_args, thread_manager)
         except (ClientException, RequestException, socket.error) as err:
             thread_manager.error(str(err))
+        finally:
+            close_journals()
+
+    parser.usage = globals()['st_%s_help' % args[0]]
+    workers = None
+    if options.processes > 1:
+        # give each process its partition right after the command, and fork
+        # them before this process starts its printing threads
+        split = len(argv) - len(args) + 1
+        workers = WorkerProcesses(
+            lambda index, manager: _run_command(
+                argv[1:split] + ['--partition', '%d/%d' % (
+                    index, options.processes)] + argv[split:], manager),
+            options.processes)
+
+    with MultiThreadingManager() as thread_manager:
+        if workers:
+            failed = workers.wait(thread_manager)
+        else:
+            _run_command(argv[1:], thread_manager)
+            failed = 0
 
-        had_error = thread_manager.error_count
+        had_error = thread_manager.error_count or failed
 
     if had_error:
         exit(1)
@@ -0,0 +1,1749 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Helpers for moving large objects between Swift and local storage."""
+
+import sys
+from collections import deque, namedtuple
+from errno import EEXIST, ENOENT
+from fnmatch import fnmatchcase
+from hashlib import md5
+from os import listdir, lstat, makedirs, remove, rename, stat as os_stat, \
+    utime
+from os.path import dirname, getmtime, getsize, isdir, isfile, join, \
+    sep as os_path_sep
+from random import shuffle
+from stat import S_ISDIR, S_ISLNK
+from tempfile import SpooledTemporaryFile
+from threading import Event, Thread, local
+from time import time
+from traceback import format_exc
+
+import six
+from six.moves import range
+from six.moves.queue import Queue
+from six.moves.urllib.parse import quote, unquote
+
+try:
+    import simplejson as json
+except ImportError:
+    import json
+
+from swiftclient.exceptions import ClientException
+from swiftclient.journal import FAIL, OK, SKIP
+from swiftclient.multithreading import ConnectionThreadPool
+from swiftclient.utils import config_true_value, in_partition
+
+try:
+    from os import scandir
+except ImportError:
+    try:
+        from scandir import scandir
+    except ImportError:
+        scandir = None
+
+DEFAULT_RANGE_SIZE = 8 * 1024 * 1024
+DEFAULT_PREFETCH_BUFFER = 128 * 1024 * 1024
+DEFAULT_SEGMENT_SIZE = 1024 * 1024 * 1024
+DEFAULT_SPOOL_SIZE = 64 * 1024 * 1024
+DEFAULT_MAX_SEGMENTS = 1000
+DEFAULT_MIGRATE_BUFFER = 1024 * 1024 * 1024
+DEFAULT_SCHEDULE_WINDOW = 1000
+
+
+def get_manifest_segments(conn, container, obj, headers):
+    """
+    Return the segments which make up a large object, in download order.
+
+    Static large objects are resolved by fetching their manifest with
+    ``multipart-manifest=get`` (nested manifests are expanded); dynamic large
+    objects are resolved by listing the segment prefix named in their
+    ``X-Object-Manifest`` header.
+
+    :param conn: a :class:`swiftclient.client.Connection`
+    :param container: container holding the manifest object
+    :param obj: name of the manifest object
+    :param headers: the manifest object's response headers, as returned by
+                    HEAD or GET
+    :returns: a list of dicts with ``container``, ``name``, ``bytes``,
+              ``etag`` and ``offset`` keys, or None if the object is not a
+              manifest
+    """
+    if config_true_value(headers.get('x-static-large-object')):
+        segments = _slo_segments(conn, container, obj)
+    elif headers.get('x-object-manifest'):
+        segments = _dlo_segments(conn, headers['x-object-manifest'])
+    else:
+        return None
+    offset = 0
+    for segment in segments:
+        segment['offset'] = offset
+        offset += segment['bytes']
+    return segments
+
+
+def _slo_segments(conn, container, obj):
+    _junk, manifest_data = conn.get_object(
+        container, obj, query_string='multipart-manifest=get')
+    segments = []
+    for entry in json.loads(manifest_data):
+        scontainer, sobj = entry['name'].lstrip('/').split('/', 1)
+        if entry.get('sub_slo'):
+            segments.extend(_slo_segments(conn, scontainer, sobj))
+        else:
+            segments.append({'container': scontainer, 'name': sobj,
+                             'bytes': int(entry['bytes']),
+                             'etag': entry.get('hash')})
+    return segments
+
+
+def _dlo_segments(conn, manifest):
+    scontainer, sprefix = manifest.split('/', 1)
+    scontainer = unquote(scontainer)
+    sprefix = unquote(sprefix)
+    listing = conn.get_container(scontainer, prefix=sprefix,
+                                 full_listing=True)[1]
+    return [{'container': scontainer, 'name': o['name'],
+             'bytes': int(o['bytes']), 'etag': o.get('hash')}
+            for o in listing]
+
+
+def download_segment(conn, segment, path, chunk_size=65536):
+    """
+    Download one segment into its place within a local file.
+
+    The file at ``path`` must already exist; the segment is written starting
+    at ``segment['offset']`` so that any number of segments of the same object
+    may be downloaded concurrently, each through its own connection.
+
+    :param conn: a :class:`swiftclient.client.Connection`
+    :param segment: a segment dict as returned by
+                    :func:`get_manifest_segments`
+    :param path: the local file to write into
+    :param chunk_size: size of the reads from the response body
+    :returns: the number of bytes written
+    :raises ClientException: the segment's length or md5sum did not match the
+                             manifest
+    """
+    headers, body = conn.get_object(segment['container'], segment['name'],
+                                    resp_chunk_size=chunk_size)
+    md5sum = md5()
+    read_length = 0
+    with open(path, 'r+b') as fp:
+        fp.seek(segment['offset'])
+        for chunk in body:
+            fp.write(chunk)
+            md5sum.update(chunk)
+            read_length += len(chunk)
+    seg_path = '%s/%s' % (segment['container'], segment['name'])
+    if read_length != segment['bytes']:
+        raise ClientException(
+            'Segment %s: read_length != size_bytes, %d != %d'
+            % (seg_path, read_length, segment['bytes']))
+    etag = segment.get('etag')
+    if etag and 'x-object-manifest' not in headers and \
+            'x-static-large-object' not in headers and \
+            md5sum.hexdigest() != etag.strip('"'):
+        raise ClientException('Segment %s: md5sum != etag, %s != %s'
+                              % (seg_path, md5sum.hexdigest(), etag))
+    return read_length
+
+
+def _get_range(conn, container, obj, start, end, headers):
+    range_headers = dict(headers or {})
+    range_headers['Range'] = 'bytes=%d-%d' % (start, end)
+    _junk, data = conn.get_object(container, obj, headers=range_headers)
+    if len(data) != end - start + 1:
+        raise ClientException(
+            'Range %d-%d of %s/%s: read_length != range_length, %d != %d'
+            % (start, end, container, obj, len(data), end - start + 1))
+    return data
+
+
+def iter_object_ranges(connection_maker, container, obj, length,
+                       range_size=DEFAULT_RANGE_SIZE, threads=4,
+                       buffer_size=DEFAULT_PREFETCH_BUFFER, headers=None):
+    """
+    Generate the contents of an object, fetching byte ranges in parallel.
+
+    Consecutive ranges of ``range_size`` bytes are requested ahead of the
+    consumer over up to ``threads`` connections, and yielded strictly in
+    order.  No more than ``buffer_size`` bytes worth of ranges are in flight
+    or waiting to be consumed at any time, so a slow consumer (such as a
+    pipe) bounds memory use rather than growing it.
+
+    :param connection_maker: a callable returning a new
+                             :class:`swiftclient.client.Connection`
+    :param container: container holding the object
+    :param obj: name of the object
+    :param length: the object's length in bytes
+    :param range_size: size of each ranged GET
+    :param threads: number of concurrent ranged GETs
+    :param buffer_size: the memory budget for prefetched data, in bytes
+    :param headers: additional headers to send with each GET, such as an
+                    ``If-Match`` guarding against the object changing part way
+                    through
+    :raises ClientException: a range request failed or came back short
+    """
+    max_pending = max(1, buffer_size // range_size)
+    pool = ConnectionThreadPool(connection_maker, min(threads, max_pending))
+    pending = deque()
+    try:
+        for start in range(0, length, range_size):
+            while len(pending) >= max_pending:
+                yield pending.popleft().result()
+            end = min(start + range_size, length) - 1
+            pending.append(pool.submit(_get_range, container, obj,
+                                       start, end, headers))
+        while pending:
+            yield pending.popleft().result()
+    finally:
+        pool.shutdown(wait=False, cancel=True)
+
+
+def _iter_pages(fetch, marker, prefetch):
+    if prefetch < 1:
+        while True:
+            page = fetch(marker)
+            if not page:
+                return
+            yield page
+            marker = page[-1].get('name', page[-1].get('subdir'))
+    pages = Queue(maxsize=prefetch)
+    stop = Event()
+
+    def produce():
+        next_marker = marker
+        try:
+            while not stop.is_set():
+                page = fetch(next_marker)
+                pages.put((page, None))
+                if not page:
+                    return
+                next_marker = page[-1].get('name', page[-1].get('subdir'))
+        except Exception:
+            pages.put((None, sys.exc_info()))
+
+    producer = Thread(target=produce)
+    producer.daemon = True
+    producer.start()
+    try:
+        while True:
+            page, exc_info = pages.get()
+            if exc_info:
+                six.reraise(*exc_info)
+            if not page:
+                return
+            yield page
+    finally:
+        stop.set()
+        # unblock a producer waiting for room for its page, then wait for a
+        # fetch in flight so that the caller gets conn back unused; having
+        # seen stop, the producer puts at most one more page
+        while not pages.empty():
+            pages.get_nowait()
+        producer.join()
+        while not pages.empty():
+            pages.get_nowait()
+
+
+def iter_account_pages(conn, marker='', prefix=None, prefetch=2):
+    """
+    Generate the pages of an account listing.
+
+    The request for each page is made as soon as the previous page arrives,
+    from a background thread, so that up to ``prefetch`` pages are fetched
+    ahead of the one being consumed.  ``conn`` belongs to that thread until
+    the generator is exhausted or closed.
+
+    :param conn: a :class:`swiftclient.client.Connection`
+    :param marker: only list the containers after ``marker``
+    :param prefix: only list the containers beginning with ``prefix``
+    :param prefetch: number of pages to fetch ahead; 0 fetches each page
+                     only once the previous one has been consumed
+    :raises ClientException: a listing request failed
+    """
+    return _iter_pages(
+        lambda next_marker: conn.get_account(marker=next_marker,
+                                             prefix=prefix)[1],
+        marker, prefetch)
+
+
+def iter_container_pages(conn, container, marker='', prefix=None,
+                         delimiter=None, prefetch=2):
+    """
+    Generate the pages of a container listing, fetching up to ``prefetch``
+    pages ahead of the one being consumed like :func:`iter_account_pages`.
+
+    :param conn: a :class:`swiftclient.client.Connection`
+    :param container: container to list
+    :param marker: only list the objects after ``marker``
+    :param prefix: only list the objects beginning with ``prefix``
+    :param delimiter: roll up the objects with this delimiter into
+                      ``subdir`` items
+    :param prefetch: number of pages to fetch ahead
+    :raises ClientException: a listing request failed
+    """
+    return _iter_pages(
+        lambda next_marker: conn.get_container(
+            container, marker=next_marker, prefix=prefix,
+            delimiter=delimiter)[1],
+        marker, prefetch)
+
+
+class SegmentBuffer(object):
+    """
+    Holds the data for one segment while it is waiting to be uploaded.
+
+    Data is kept in memory up to ``spool_size`` bytes and spilled to a
+    temporary file beyond that.  The buffer's size and md5sum are tracked as
+    data is written so the segment can be uploaded with its ETag.
+    """
+
+    def __init__(self, spool_size=DEFAULT_SPOOL_SIZE):
+        self.fp = SpooledTemporaryFile(max_size=spool_size)
+        self.size = 0
+        self.md5sum = md5()
+
+    def write(self, data):
+        self.fp.write(data)
+        self.md5sum.update(data)
+        self.size += len(data)
+
+    def close(self):
+        self.fp.close()
+
+
+def _put_segment(conn, container, name, buf):
+    try:
+        buf.fp.seek(0)
+        etag = conn.put_object(container, name, buf.fp,
+                               content_length=buf.size,
+                               etag=buf.md5sum.hexdigest())
+    finally:
+        buf.close()
+    return {'path': '/%s/%s' % (container, name), 'etag': etag,
+            'size_bytes': buf.size}
+
+
+class SegmentUploader(object):
+    """
+    Uploads the segments of a static large object and then its manifest.
+
+    Segments are handed over as filled :class:`SegmentBuffer` instances
+    through :meth:`submit` and uploaded in the background over up to
+    ``threads`` connections; each segment is retried on its own by its
+    connection since its buffer can be rewound.  :meth:`new_buffer` blocks
+    while ``threads`` segments are already waiting or in flight, which bounds
+    memory use however fast the buffers are filled.
+    """
+
+    def __init__(self, connection_maker, container, obj,
+                 segment_container=None, segment_size=DEFAULT_SEGMENT_SIZE,
+                 threads=4, spool_size=DEFAULT_SPOOL_SIZE,
+                 segment_prefix=None):
+        """
+        :param connection_maker: a callable returning a new
+                                 :class:`swiftclient.client.Connection`
+        :param container: container for the manifest object
+        :param obj: name of the manifest object
+        :param segment_container: container for the segments; defaults to
+                                  ``<container>_segments``
+        :param segment_size: the size of every segment but the last, used in
+                             the default segment names
+        :param threads: number of segments to upload concurrently
+        :param spool_size: bytes of each segment buffer to hold in memory
+                           before spilling to a temporary file
+        :param segment_prefix: name prefix for the segments; defaults to
+                               ``<obj>/slo/<timestamp>/<segment_size>``
+        """
+        self.container = container
+        self.obj = obj
+        self.segment_container = segment_container or \
+            '%s_segments' % container
+        self.segment_prefix = segment_prefix or '%s/slo/%f/%d' % (
+            obj, time(), segment_size)
+        self.threads = max(1, threads)
+        self.spool_size = spool_size
+        self.pool = ConnectionThreadPool(connection_maker, self.threads)
+        self.segment_count = 0
+        self.segments = []
+        self._pending = deque()
+
+    def new_buffer(self):
+        """
+        Return an empty buffer for the next segment, first waiting for a
+        segment upload to finish if too many are outstanding.
+
+        :raises ClientException: an earlier segment failed to upload
+        """
+        while len(self._pending) >= self.threads:
+            self.segments.append(self._pending.popleft().result())
+        return SegmentBuffer(self.spool_size)
+
+    def submit(self, buf):
+        """Queue a filled buffer for upload as the next segment."""
+        name = '%s/%08d' % (self.segment_prefix, self.segment_count)
+        self.segment_count += 1
+        self._pending.append(self.pool.submit(
+            _put_segment, self.segment_container, name, buf))
+
+    def finish(self, conn, headers=None, content_type=None):
+        """
+        Wait for every segment and then write the manifest.
+
+        :param conn: the :class:`swiftclient.client.Connection` to write the
+                     manifest with
+        :param headers: additional headers for the manifest PUT
+        :param content_type: content type of the large object
+        :returns: the manifest's etag
+        :raises ClientException: a segment or the manifest failed to upload
+        """
+        try:
+            while self._pending:
+                self.segments.append(self._pending.popleft().result())
+        finally:
+            self.pool.shutdown(cancel=True)
+        put_headers = dict(headers or {})
+        put_headers['x-static-large-object'] = 'true'
+        return conn.put_object(self.container, self.obj,
+                               json.dumps(self.segments),
+                               content_type=content_type,
+                               headers=put_headers,
+                               query_string='multipart-manifest=put')
+
+    def abort(self):
+        """Discard any segments which have not been uploaded yet."""
+        self.pool.shutdown(wait=False, cancel=True)
+
+
+def upload_stream(conn, container, obj, fileobj,
+                  segment_size=DEFAULT_SEGMENT_SIZE, segment_container=None,
+                  segment_threads=4, headers=None, content_type=None,
+                  connection_maker=None, spool_size=DEFAULT_SPOOL_SIZE,
+                  read_size=65536):
+    """
+    Upload everything read from a stream of unknown length.
+
+    The stream is cut into ``segment_size`` segments which are uploaded
+    concurrently and tied together with a static large object manifest.  A
+    stream which fits in a single segment is uploaded as a plain object
+    instead.  Every segment is buffered (see :class:`SegmentBuffer`) so it can
+    be retried on its own, unlike a chunked PUT of the whole stream.
+
+    :param conn: the :class:`swiftclient.client.Connection` used for the
+                 manifest or the plain object
+    :param container: container to upload to
+    :param obj: name of the object to create
+    :param fileobj: a file-like object to read the data from
+    :param segment_size: maximum size of each segment, in bytes
+    :param segment_container: container for the segments; defaults to
+                              ``<container>_segments``
+    :param segment_threads: number of segments to upload concurrently
+    :param headers: additional headers for the object or manifest
+    :param content_type: content type of the object
+    :param connection_maker: a callable returning a new connection for each
+                             segment upload thread; defaults to cloning
+                             ``conn``
+    :param spool_size: bytes of each segment to buffer in memory before
+                       spilling to a temporary file
+    :param read_size: size of the reads from ``fileobj``
+    :returns: the etag of the object or manifest
+    :raises ClientException: a segment or the manifest failed to upload
+    """
+    if connection_maker is None:
+        connection_maker = conn._clone
+    uploader = SegmentUploader(connection_maker, container, obj,
+                               segment_container=segment_container,
+                               segment_size=segment_size,
+                               threads=segment_threads, spool_size=spool_size)
+    read_size = min(read_size, segment_size)
+    try:
+        extra = b''
+        while True:
+            buf = uploader.new_buffer()
+            if extra:
+                buf.write(extra)
+            while buf.size < segment_size:
+                data = fileobj.read(min(read_size, segment_size - buf.size))
+                if not data:
+                    break
+                buf.write(data)
+            extra = buf.size == segment_size and fileobj.read(read_size)
+            if not extra and not uploader.segment_count:
+                # The whole stream fit in one segment.
+                uploader.abort()
+                try:
+                    buf.fp.seek(0)
+                    return conn.put_object(container, obj, buf.fp,
+                                           content_length=buf.size,
+                                           etag=buf.md5sum.hexdigest(),
+                                           content_type=content_type,
+                                           headers=headers)
+                finally:
+                    buf.close()
+            if buf.size:
+                uploader.submit(buf)
+            else:
+                buf.close()
+            if not extra:
+                break
+    except BaseException:
+        uploader.abort()
+        raise
+    return uploader.finish(conn, headers=headers, content_type=content_type)
+
+
+def _copied_headers(headers):
+    return dict((k, v) for k, v in headers.items()
+                if k.startswith('x-object-meta-') or k in (
+                    'content-type', 'content-encoding', 'content-disposition',
+                    'x-delete-at'))
+
+
+def copy_object(conn, container, obj, destination_container,
+                destination_obj, headers=None, source_headers=None):
+    """
+    Copy an object within the cluster, without its data passing through the
+    client.
+
+    Plain objects are copied with :meth:`Connection.copy_object`.  A large
+    object is copied by writing a new manifest, with the source's metadata,
+    which refers to the same segments, instead of copying its data into one
+    object.
+
+    :param conn: a :class:`swiftclient.client.Connection`
+    :param container: container of the object to copy
+    :param obj: name of the object to copy
+    :param destination_container: container to copy the object to
+    :param destination_obj: object name to copy the object to
+    :param headers: additional headers for the copy, e.g. metadata
+    :param source_headers: the source object's headers, if already known from
+                           a HEAD; otherwise it is HEADed
+    :returns: the etag of the copy
+    """
+    if source_headers is None:
+        source_headers = conn.head_object(container, obj)
+    if config_true_value(source_headers.get('x-static-large-object')):
+        _junk, manifest_data = conn.get_object(
+            container, obj, query_string='multipart-manifest=get')
+        manifest = [{'path': entry['name'], 'etag': entry.get('hash'),
+                     'size_bytes': int(entry['bytes'])}
+                    for entry in json.loads(manifest_data)]
+        put_headers = _copied_headers(source_headers)
+        put_headers.update(headers or {})
+        put_headers['x-static-large-object'] = 'true'
+        return conn.put_object(destination_container, destination_obj,
+                               json.dumps(manifest), headers=put_headers,
+                               query_string='multipart-manifest=put')
+    if source_headers.get('x-object-manifest'):
+        put_headers = _copied_headers(source_headers)
+        put_headers.update(headers or {})
+        put_headers['x-object-manifest'] = source_headers['x-object-manifest']
+        return conn.put_object(destination_container, destination_obj, '',
+                               content_length=0, headers=put_headers)
+    return conn.copy_object(container, obj, destination_container,
+                            destination_obj, headers=headers)
+
+
+def get_bulk_delete_limit(conn):
+    """
+    Return the number of objects the cluster accepts per bulk delete
+    request, or 0 if it does not advertise bulk delete.
+    """
+    try:
+        capabilities = conn.get_capabilities()
+    except (ClientException, ValueError):
+        return 0
+    bulk = capabilities.get('bulk_delete')
+    if bulk is None:
+        return 0
+    return int(bulk.get('max_deletes_per_request', 10000))
+
+
+def delete_objects(conn, container, names, bulk_limit=0):
+    """
+    Delete objects of a container, in bulk delete requests of up to
+    ``bulk_limit`` names if it is set, or one by one otherwise.  Objects
+    which are already gone are not failures.
+
+    Note that manifests are deleted without their segments.
+
+    :param conn: a :class:`swiftclient.client.Connection`
+    :param container: container of the objects
+    :param names: list of object names
+    :param bulk_limit: maximum number of names per bulk delete request, as
+                       returned by :func:`get_bulk_delete_limit`
+    :returns: a list of (name, error) for the objects which could not be
+              deleted
+    """
+    failures = []
+    if bulk_limit:
+        for start in range(0, len(names), bulk_limit):
+            result = conn.bulk_delete(container,
+                                      names[start:start + bulk_limit])
+            for path, status in result.get('Errors') or []:
+                name = unquote(path).lstrip('/').split('/', 1)[1]
+                failures.append((name, status))
+    else:
+        for name in names:
+            try:
+                conn.delete_object(container, name)
+            except ClientException as err:
+                if err.http_status != 404:
+                    failures.append((name, str(err)))
+    return failures
+
+
+class _BodyReader(object):
+    """
+    File-like reader over the chunks of an object GET which, on reaching the
+    end, checks the length and md5sum of everything read.
+    """
+
+    def __init__(self, body, path, etag=None, length=None):
+        self.body = iter(body)
+        self.path = path
+        self.etag = etag
+        self.length = length
+        self.md5sum = md5()
+        self.read_length = 0
+        self.buf = b''
+        self.checked = False
+
+    def read(self, size=-1):
+        while size < 0 or len(self.buf) < size:
+            chunk = next(self.body, None)
+            if chunk is None:
+                break
+            self.buf += chunk
+        if size < 0:
+            data, self.buf = self.buf, b''
+        else:
+            data, self.buf = self.buf[:size], self.buf[size:]
+        if data:
+            self.md5sum.update(data)
+            self.read_length += len(data)
+        elif not self.checked:
+            self.checked = True
+            if self.length is not None and self.read_length != self.length:
+                raise ClientException(
+                    '%s: read_length != content_length, %d != %d' % (
+                        self.path, self.read_length, self.length))
+            if self.etag and self.md5sum.hexdigest() != self.etag:
+                raise ClientException('%s: md5sum != etag, %s != %s' % (
+                    self.path, self.md5sum.hexdigest(), self.etag))
+        return data
+
+
+def migrate_object(conn, dest_conn, container, obj, dest_container=None,
+                   dest_obj=None, segment_size=DEFAULT_SPOOL_SIZE,
+                   segment_threads=4, dest_connection_maker=None,
+                   max_segments=DEFAULT_MAX_SEGMENTS, headers=None):
+    """
+    Copy an object from one cluster to another, streaming it from the
+    source GET into the destination without a local copy.
+
+    The content type and metadata, including ``x-object-meta-mtime``, are
+    copied along.  Objects larger than ``segment_size`` (and large objects of
+    any kind) are uploaded as static large objects cut into new segments,
+    see :func:`upload_stream`; the segment size is raised if needed to keep
+    within ``max_segments``.  Up to ``segment_threads + 1`` segments are
+    buffered at once.  Segments up to ``DEFAULT_SPOOL_SIZE`` are held in
+    memory, so nothing touches the local disk unless an object is so large
+    that its segments must be bigger than that; those spill to temporary
+    files.  The data read is checked against the source's length and, for
+    plain objects, its ETag before the object or manifest is written at the
+    destination.
+
+    :param conn: connection to the source cluster
+    :param dest_conn: connection to the destination cluster
+    :param container: source container
+    :param obj: source object name
+    :param dest_container: destination container; defaults to ``container``
+    :param dest_obj: destination object name; defaults to ``obj``
+    :param segment_size: size of the segments at the destination
+    :param segment_threads: number of segments to upload concurrently
+    :param dest_connection_maker: a callable returning a new destination
+                                  connection for each segment upload thread
+    :param max_segments: the destination's limit on segments per manifest
+    :param headers: additional headers for the destination object
+    :returns: the etag of the destination object or manifest
+    :raises ClientException: a request failed or the data read did not match
+                             the source's length or ETag
+    """
+    dest_container = dest_container or container
+    dest_obj = dest_obj or obj
+    src_headers, body = conn.get_object(container, obj, resp_chunk_size=65536)
+    length = src_headers.get('content-length')
+    if length is not None:
+        length = int(length)
+        segment_size = max(segment_size, -(-length // max_segments))
+    etag = None
+    if not config_true_value(src_headers.get('x-static-large-object')) and \
+            not src_headers.get('x-object-manifest'):
+        etag = src_headers.get('etag')
+    reader = _BodyReader(body, '%s/%s' % (container, obj), etag=etag,
+                         length=length)
+    put_headers = _copied_headers(src_headers)
+    put_headers.update(headers or {})
+    content_type = put_headers.pop('content-type', None)
+    return upload_stream(dest_conn, dest_container, dest_obj, reader,
+                         segment_size=segment_size,
+                         segment_threads=segment_threads, headers=put_headers,
+                         content_type=content_type,
+                         connection_maker=dest_connection_maker)
+
+
+_UPLOAD_OPTIONS = {
+    'segment_size': None,
+    'segment_container': None,
+    'use_slo': False,
+    'leave_segments': False,
+    'changed': False,
+    'skip_identical': False,
+    'resume': False,
+    'headers': None,
+}
+
+_DOWNLOAD_OPTIONS = {
+    'headers': None,
+    'skip_identical': False,
+    'resume': False,
+    'no_download': False,
+    'parallel_segments': False,
+    'range_threads': 0,
+    'range_size': DEFAULT_RANGE_SIZE,
+    'prefetch_buffer': DEFAULT_PREFETCH_BUFFER,
+    'preserve_mtime': True,
+}
+
+_EMPTY_ETAG = 'd41d8cd98f00b204e9800998ecf8427e'
+
+
+def _options(defaults, options):
+    unknown = set(options) - set(defaults)
+    if unknown:
+        raise TypeError('Unexpected option(s): %s'
+                        % ', '.join(sorted(unknown)))
+    opts = dict(defaults)
+    opts.update(options)
+    return opts
+
+
+def _mkdirs(path):
+    try:
+        makedirs(path)
+    except OSError as err:
+        if err.errno != EEXIST:
+            raise
+
+
+def _hash_file(md5sum, path, start=0, length=None):
+    with open(path, 'rb') as fp:
+        fp.seek(start)
+        while length is None or length > 0:
+            data = fp.read(65536 if length is None else min(65536, length))
+            if not data:
+                break
+            md5sum.update(data)
+            if length is not None:
+                length -= len(data)
+    return md5sum
+
+
+def _object_name(path):
+    obj = path
+    if obj.startswith('./') or obj.startswith('.\\'):
+        obj = obj[2:]
+    if obj.startswith('/'):
+        obj = obj[1:]
+    return obj
+
+
+TreeEntry = namedtuple('TreeEntry',
+                       'path object_name dir_marker size mtime')
+
+
+class _ListdirEntry(object):
+    """
+    The parts of :class:`os.DirEntry` used by :func:`walk_tree`, for Pythons
+    without ``scandir``.
+    """
+
+    def __init__(self, parent, name):
+        self.name = name
+        self.path = join(parent, name)
+        self._stat = {}
+
+    def stat(self, follow_symlinks=True):
+        if follow_symlinks not in self._stat:
+            self._stat[follow_symlinks] = \
+                (os_stat if follow_symlinks else lstat)(self.path)
+        return self._stat[follow_symlinks]
+
+    def is_dir(self, follow_symlinks=True):
+        try:
+            return S_ISDIR(self.stat(follow_symlinks).st_mode)
+        except OSError:
+            return False
+
+    def is_symlink(self):
+        try:
+            return S_ISLNK(self.stat(False).st_mode)
+        except OSError:
+            return False
+
+
+def _scandir(path):
+    if scandir is not None:
+        return list(scandir(path))
+    return [_ListdirEntry(path, name) for name in listdir(path)]
+
+
+def _matches(patterns, name, relpath):
+    return any(fnmatchcase(name, pattern) or fnmatchcase(relpath, pattern)
+               for pattern in patterns)
+
+
+def _scan_tree_dir(_conn, path, object_name, relpath, mtime, include,
+                   exclude, follow_symlinks):
+    """
+    List one directory for :func:`walk_tree`, returning the entries of its
+    files, or of itself as a directory marker if it is empty, and the
+    arguments to scan each of its subdirectories with.
+    """
+    files = []
+    subdirs = []
+    entries = _scandir(path)
+    if not entries and not include:
+        files.append(TreeEntry(path, object_name, True, 0, mtime))
+    for entry in entries:
+        subpath = relpath + entry.name
+        if exclude and _matches(exclude, entry.name, subpath):
+            continue
+        subobj = None
+        if object_name is not None:
+            subobj = join(object_name, entry.name)
+        if entry.is_dir():
+            if entry.is_symlink() and not follow_symlinks:
+                continue
+            st = entry.stat()
+            subdirs.append(((st.st_dev, st.st_ino), (
+                entry.path, subobj, subpath + '/', st.st_mtime)))
+        elif not include or _matches(include, entry.name, subpath):
+            st = entry.stat()
+            files.append(TreeEntry(entry.path, subobj, False, st.st_size,
+                                   st.st_mtime))
+    return files, subdirs
+
+
+def walk_tree(path, object_name=None, include=None, exclude=None,
+              follow_symlinks=False, threads=1):
+    """
+    Generate a :class:`TreeEntry` for every file below ``path`` and for
+    every empty directory, which is uploaded as a directory marker.
+
+    The tree is walked iteratively with ``scandir`` (the ``scandir`` package
+    or ``listdir`` on Pythons without :func:`os.scandir`), and every entry
+    carries the size and mtime found while walking so they need not be
+    looked up again.  With ``threads`` greater than 1, that many directories
+    are listed concurrently, which helps on network filesystems.
+
+    :param path: directory to walk
+    :param object_name: object name prefix to use instead of ``path``; the
+                        entries' ``object_name`` is None if not given
+    :param include: glob patterns; only files whose name or path relative
+                    to ``path`` matches one of them are included, and empty
+                    directories are not
+    :param exclude: glob patterns; files and directories whose name or
+                    relative path matches one of them are skipped
+    :param follow_symlinks: walk symlinked directories too, each directory
+                            being walked at most once; otherwise they are
+                            skipped
+    :param threads: number of directories to list concurrently
+    """
+    include = include or []
+    exclude = exclude or []
+    scan_args = (include, exclude, follow_symlinks)
+    root = os_stat(path)
+    visited = set([(root.st_dev, root.st_ino)])
+    todo = [(path, object_name, '', root.st_mtime)]
+    pool = None
+    if threads > 1:
+        pool = ConnectionThreadPool(lambda: None, threads)
+    running = deque()
+    try:
+        while todo or running:
+            if pool is None:
+                files, subdirs = _scan_tree_dir(
+                    None, *(todo.pop() + scan_args))
+            else:
+                while todo and len(running) < threads * 2:
+                    running.append(pool.submit(
+                        _scan_tree_dir, *(todo.pop() + scan_args)))
+                files, subdirs = running.popleft().result()
+            for entry in files:
+                yield entry
+            for key, args in reversed(subdirs):
+                if follow_symlinks:
+                    if key in visited:
+                        continue
+                    visited.add(key)
+                todo.append(args)
+    finally:
+        if pool is not None:
+            pool.shutdown(wait=False, cancel=True)
+
+
+def _read_part_state(part_file):
+    try:
+        with open(part_file + '.json') as fp:
+            state = json.load(fp)
+        state['bytes'] = getsize(part_file)
+    except (IOError, OSError, ValueError):
+        return None
+    return state
+
+
+def _write_part_state(part_file, headers):
+    with open(part_file + '.json', 'w') as fp:
+        json.dump({'etag': headers.get('etag'),
+                   'last-modified': headers.get('last-modified'),
+                   'manifest': 'x-object-manifest' in headers or
+                   'x-static-large-object' in headers}, fp)
+
+
+def _remove_part_state(part_file):
+    try:
+        remove(part_file + '.json')
+    except OSError as err:
+        if err.errno != ENOENT:
+            raise
+
+
+def _get_resumable(conn, container, obj, part_file, req_headers):
+    """
+    GET an object to continue the partial download in part_file, or from the
+    start if there is none or the object has changed since.
+
+    :returns: a tuple of the response headers, the body and the offset the
+              body starts at
+    """
+    state = _read_part_state(part_file)
+    if state and state['bytes']:
+        get_headers = dict(req_headers)
+        get_headers['Range'] = 'bytes=%d-' % state['bytes']
+        if state.get('etag') and not state.get('manifest'):
+            get_headers['If-Match'] = state['etag']
+        try:
+            headers, body = conn.get_object(
+                container, obj, resp_chunk_size=65536, headers=get_headers)
+        except ClientException as err:
+            # 412: the object has changed; 416: the partial file is already
+            # as long as the object.
+            if err.http_status not in (412, 416):
+                raise
+        else:
+            if 'content-range' not in headers:
+                # The whole object was sent
+                return headers, body, 0
+            if headers.get('etag') == state.get('etag') and \
+                    headers.get('last-modified') == \
+                    state.get('last-modified'):
+                return headers, body, state['bytes']
+    headers, body = conn.get_object(container, obj, resp_chunk_size=65536,
+                                    headers=req_headers)
+    return headers, body, 0
+
+
+class TransferManager(object):
+    """
+    Uploads and downloads files, directory trees and containers in parallel.
+
+    This does everything the ``swift upload`` and ``swift download`` commands
+    do: large files are split into segments which are uploaded concurrently
+    and tied together with a manifest, the segments of an overwritten large
+    object are cleaned up, unchanged and identical files can be skipped, and
+    downloads are checked against their etag, resumed, or fetched segment by
+    segment in parallel.
+
+    Objects are transferred on a pool of ``object_threads`` threads and
+    segments on a separate pool of ``segment_threads`` threads, each thread
+    with its own connection from ``connection_maker``.  Either pool may be
+    a :class:`swiftclient.multithreading.ConnectionThreadPool` shared with
+    other work, as long as the object pool and the segment pool are
+    different pools.
+
+    Every object, segment or listing handled produces a result dict with at
+    least the keys ``action``, ``container``, ``success`` and, for objects
+    and segments, ``object``.  A failure has the exception as ``error`` and
+    its formatted traceback as ``traceback``; an object result also has a
+    ``status`` of ``ok``, ``skip`` or ``fail``, with the ``reason`` for a
+    skip.  Each result is passed to the ``progress`` callback, from the
+    thread which produced it, as soon as it is available.
+
+    Objects are normally transferred in the order they are listed.  With
+    ``largest_first``, the objects of a tree or container are instead
+    scheduled by size, up to ``schedule_window`` of them at a time, so that
+    the largest transfers start early and small ones fill the gaps rather
+    than one huge transfer running on alone at the end.
+
+    With a ``straggler_factor``, a segment of a file still uploading after
+    that many times the median time of the segments already uploaded is
+    uploaded again on another thread, and the first copy to finish is used,
+    so that one slow server does not hold up the whole file.  Segments read
+    from a stream are never uploaded twice.
+    """
+
+    def __init__(self, connection_maker, object_threads=10,
+                 segment_threads=10, object_pool=None, segment_pool=None,
+                 progress=None, journal=None, largest_first=False,
+                 schedule_window=DEFAULT_SCHEDULE_WINDOW,
+                 straggler_factor=None):
+        """
+        :param connection_maker: a callable returning a new
+                                 :class:`swiftclient.client.Connection`
+        :param object_threads: number of objects to transfer concurrently,
+                               if ``object_pool`` is not given
+        :param segment_threads: number of segments to transfer concurrently,
+                                if ``segment_pool`` is not given
+        :param object_pool: a ConnectionThreadPool to transfer objects on
+        :param segment_pool: a ConnectionThreadPool to transfer segments on
+        :param progress: a callable which is passed every result dict
+        :param journal: a :class:`swiftclient.journal.Journal` recording the
+                        outcome of every object; objects it has as done are
+                        skipped
+        :param largest_first: start the largest of the queued objects first;
+                              an ``object_pool`` must have been made with
+                              ``priority`` set for this to have any effect
+        :param schedule_window: number of objects to queue at a time with
+                                ``largest_first``
+        :param straggler_factor: upload a segment of a file again once it
+                                 has taken this many times the median
+                                 segment upload time
+        """
+        self.connection_maker = connection_maker
+        self.progress = progress
+        self.journal = journal
+        self.largest_first = largest_first
+        self.schedule_window = schedule_window
+        self.straggler_factor = straggler_factor
+        self._owned_pools = []
+        self.object_pool = object_pool or self._new_pool(
+            object_threads, priority=largest_first)
+        self.segment_pool = segment_pool or self._new_pool(segment_threads)
+        self._local = local()
+
+    def _new_pool(self, thread_count, priority=False):
+        pool = ConnectionThreadPool(self.connection_maker, thread_count,
+                                    priority=priority)
+        self._owned_pools.append(pool)
+        return pool
+
+    def close(self):
+        """Wait for the threads of the pools this manager created to exit."""
+        for pool in self._owned_pools:
+            pool.shutdown()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def _conn(self):
+        # for listings, made from whichever thread consumes the results
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._local.conn = self.connection_maker()
+        return conn
+
+    def _report(self, result):
+        if self.progress:
+            self.progress(result)
+        return result
+
+    def _succeeded(self, result, conn, status=OK, reason=None):
+        result.update(success=True, status=status,
+                      attempts=conn.attempts)
+        if reason:
+            result['reason'] = reason
+        if self.journal:
+            self.journal.record(
+                status, '%s/%s' % (result['container'], result['object']))
+        return self._report(result)
+
+    def _failed(self, result, err, journal=True):
+        result.update(success=False, status=FAIL, error=err,
+                      traceback=format_exc())
+        if journal and self.journal:
+            self.journal.record(
+                FAIL, '%s/%s' % (result['container'], result['object']))
+        return self._report(result)
+
+    def _skip_done(self, result):
+        if self.journal and self.journal.is_done(
+                '%s/%s' % (result['container'], result['object'])):
+            result.update(success=True, status=SKIP, reason='journal')
+            return self._report(result)
+
+    def _gather(self, jobs, listing):
+        """
+        Submit every ``(size, func, args)`` job to the object pool and yield
+        their results as they complete, keeping a bounded number of jobs
+        queued, so one slow job does not stop the others being started.  An
+        error while producing the jobs is yielded as a failed ``listing``
+        result.
+
+        With ``largest_first``, up to ``schedule_window`` jobs are queued
+        instead, and the largest of them are started first.
+        """
+        pool = self.object_pool
+        if self.largest_first:
+            window = max(self.schedule_window, pool.thread_count * 2)
+        else:
+            window = pool.thread_count * 2
+        done = Queue()
+        outstanding = 0
+        try:
+            for size, func, args in jobs:
+                if self.largest_first:
+                    future = pool.submit_priority(size, func, *args)
+                else:
+                    future = pool.submit(func, *args)
+                future.add_done_callback(done.put)
+                outstanding += 1
+                while outstanding >= window:
+                    outstanding -= 1
+                    yield done.get().result()
+        except Exception as err:
+            yield self._failed(listing, err, journal=False)
+        while outstanding:
+            outstanding -= 1
+            yield done.get().result()
+
+    def upload_file(self, container, path, obj=None, fileobj=None,
+                    **options):
+        """
+        Upload one file, or create a directory marker for a directory.
+
+        :param container: container to upload to
+        :param path: the local file; only used in results if ``fileobj`` is
+                     given
+        :param obj: name of the object; defaults to ``path`` without any
+                    leading ``./`` or ``/``
+        :param fileobj: a stream of unknown length, such as stdin, to upload
+                        instead of ``path``; see :func:`upload_stream`
+        :param options: the upload options accepted by :meth:`upload_tree`
+        :returns: the result dict of the object
+        """
+        opts = _options(_UPLOAD_OPTIONS, options)
+        return self.object_pool.submit(
+            self._upload, container, path, obj, fileobj,
+            fileobj is None and isdir(path), opts).result()
+
+    def upload_tree(self, container, paths, object_name=None, include=None,
+                    exclude=None, follow_symlinks=False, scan_threads=1,
+                    partition=None, **options):
+        """
+        Upload files and directory trees.  Empty directories are uploaded as
+        directory markers.  The uploads start as soon as the first files are
+        found, while the trees are still being walked (see
+        :func:`walk_tree`).
+
+        :param container: container to upload to
+        :param paths: a file or directory, or a list of them
+        :param object_name: name of the object for a single file, or the
+                            name prefix to use instead of the directory's
+                            path for a directory
+        :param include: only upload the files below directories matching
+                        one of these glob patterns
+        :param exclude: skip the files and subdirectories below directories
+                        matching one of these glob patterns
+        :param follow_symlinks: walk symlinked directories too
+        :param scan_threads: number of directories to list concurrently
+        :param partition: an ``(index, count)`` tuple; only upload the files
+                          whose object name is in that partition (see
+                          :func:`swiftclient.utils.in_partition`)
+        :param segment_size: upload files larger than this many bytes in
+                             segments tied together by a manifest
+        :param segment_container: container for the segments; defaults to
+                                  ``<container>_segments``
+        :param use_slo: create a static rather than a dynamic large object
+        :param leave_segments: do not delete the segments of a large object
+                               which is overwritten
+        :param changed: skip files whose size and mtime match the object
+        :param skip_identical: skip files whose md5sum matches the object
+        :param resume: reuse segments left behind by an interrupted upload
+                       of the same file whose size and md5sum match
+        :param headers: additional headers for every object
+        :returns: an iterator of the result dicts of the objects, as they
+                  complete;
+                  the uploads proceed as it is consumed
+        """
+        opts = _options(_UPLOAD_OPTIONS, options)
+        if isinstance(paths, six.string_types):
+            paths = [paths]
+
+        def jobs():
+            for path in paths:
+                if isdir(path):
+                    for entry in walk_tree(
+                            path, object_name, include=include,
+                            exclude=exclude, follow_symlinks=follow_symlinks,
+                            threads=scan_threads):
+                        if not in_partition(entry.object_name or
+                                            _object_name(entry.path),
+                                            partition):
+                            continue
+                        yield entry.size, self._upload, (
+                            container, entry.path, entry.object_name, None,
+                            entry.dir_marker, opts, entry)
+                elif in_partition(object_name or _object_name(path),
+                                  partition):
+                    try:
+                        size = getsize(path)
+                    except OSError:
+                        size = 0
+                    yield size, self._upload, (container, path, object_name,
+                                               None, False, opts)
+
+        return self._gather(jobs(), {'action': 'list_directory',
+                                     'container': container})
+
+    def _upload(self, conn, container, path, obj, fileobj, dir_marker,
+                opts, entry=None):
+        if obj is None:
+            obj = _object_name(path)
+        result = {'action': 'upload_object', 'container': container,
+                  'object': obj, 'path': path}
+        if self._skip_done(result):
+            return result
+        try:
+            size = None
+            if fileobj is not None:
+                mtime = time()
+            elif entry is not None:
+                mtime, size = entry.mtime, entry.size
+            else:
+                mtime = getmtime(path)
+            put_headers = {'x-object-meta-mtime': '%f' % mtime}
+            if dir_marker:
+                reason = self._upload_dir_marker(conn, container, obj,
+                                                 put_headers, opts)
+            else:
+                reason = self._upload_object(conn, container, path, obj,
+                                             fileobj, put_headers, opts,
+                                             size)
+        except Exception as err:
+            return self._failed(result, err)
+        if reason:
+            return self._succeeded(result, conn, SKIP, reason)
+        return self._succeeded(result, conn)
+
+    def _upload_dir_marker(self, conn, container, obj, put_headers, opts):
+        if opts['changed']:
+            try:
+                headers = conn.head_object(container, obj)
+                ct = headers.get('content-type')
+                cl = int(headers.get('content-length'))
+                et = headers.get('etag')
+                mt = headers.get('x-object-meta-mtime')
+                if ct.split(';', 1)[0] == 'text/directory' and cl == 0 and \
+                        et == _EMPTY_ETAG and \
+                        mt == put_headers['x-object-meta-mtime']:
+                    return 'unchanged'
+            except ClientException as err:
+                if err.http_status != 404:
+                    raise
+        conn.put_object(container, obj, '', content_length=0,
+                        content_type='text/directory', headers=put_headers)
+
+    def _upload_object(self, conn, container, path, obj, fileobj,
+                       put_headers, opts, size=None):
+        stream = fileobj is not None
+        if size is None and not stream:
+            size = getsize(path)
+        segment_size = opts['segment_size'] and int(opts['segment_size'])
+        seg_container = opts['segment_container'] or \
+            '%s_segments' % container
+        # We need to HEAD all objects now in case we're overwriting a
+        # manifest object and need to delete the old segments ourselves.
+        old_manifest = None
+        old_slo_manifest_paths = []
+        new_slo_manifest_paths = set()
+        if opts['changed'] or opts['skip_identical'] or \
+                not opts['leave_segments']:
+            checksum = None
+            if opts['skip_identical'] and not stream:
+                try:
+                    checksum = _hash_file(md5(), path).hexdigest()
+                except IOError:
+                    pass
+            try:
+                headers = conn.head_object(container, obj)
+                cl = int(headers.get('content-length'))
+                mt = headers.get('x-object-meta-mtime')
+                if opts['skip_identical'] and \
+                        checksum == headers.get('etag'):
+                    return 'identical'
+                if opts['changed'] and not stream and \
+                        cl == size and \
+                        mt == put_headers['x-object-meta-mtime']:
+                    return 'unchanged'
+                if not opts['leave_segments']:
+                    old_manifest = headers.get('x-object-manifest')
+                    if config_true_value(
+                            headers.get('x-static-large-object')):
+                        headers, manifest_data = conn.get_object(
+                            container, obj,
+                            query_string='multipart-manifest=get')
+                        for old_seg in json.loads(manifest_data):
+                            seg_path = old_seg['name'].lstrip('/')
+                            if isinstance(seg_path, six.text_type):
+                                seg_path = seg_path.encode('utf-8')
+                            old_slo_manifest_paths.append(seg_path)
+            except ClientException as err:
+                if err.http_status != 404:
+                    raise
+        put_headers.update(opts['headers'] or {})
+        if stream:
+            upload_stream(conn, container, obj, fileobj,
+                          segment_size=segment_size or DEFAULT_SEGMENT_SIZE,
+                          segment_container=seg_container,
+                          segment_threads=self.segment_pool.thread_count,
+                          headers=put_headers,
+                          connection_maker=self.connection_maker)
+        # Don't do segment job if object is not big enough
+        elif segment_size and size > segment_size:
+            full_size = size
+            segment_prefix = '%s/%s%s/%s/%s/' % (
+                obj, 'slo/' if opts['use_slo'] else '',
+                put_headers['x-object-meta-mtime'], full_size,
+                opts['segment_size'])
+            segments = self._upload_segments(
+                conn, container, path, obj, seg_container, segment_prefix,
+                full_size, segment_size, opts['resume'])
+            if opts['use_slo']:
+                for seg in segments:
+                    seg_loc = seg['segment_location'].lstrip('/')
+                    if isinstance(seg_loc, six.text_type):
+                        seg_loc = seg_loc.encode('utf-8')
+                    new_slo_manifest_paths.add(seg_loc)
+                manifest_data = json.dumps([
+                    {'path': d['segment_location'], 'etag': d['etag'],
+                     'size_bytes': d['segment_size']} for d in segments])
+                put_headers['x-static-large-object'] = 'true'
+                conn.put_object(container, obj, manifest_data,
+                                headers=put_headers,
+                                query_string='multipart-manifest=put')
+            else:
+                new_object_manifest = '%s/%s/%s/%s/%s/' % (
+                    quote(seg_container), quote(obj),
+                    put_headers['x-object-meta-mtime'], full_size,
+                    opts['segment_size'])
+                if old_manifest and old_manifest.rstrip('/') == \
+                        new_object_manifest.rstrip('/'):
+                    old_manifest = None
+                put_headers['x-object-manifest'] = new_object_manifest
+                conn.put_object(container, obj, '', content_length=0,
+                                headers=put_headers)
+        else:
+            with open(path, 'rb') as fp:
+                conn.put_object(container, obj, fp,
+                                content_length=size,
+                                headers=put_headers)
+        if old_manifest or old_slo_manifest_paths:
+            self._delete_old_segments(conn, old_manifest, [
+                seg for seg in old_slo_manifest_paths
+                if seg not in new_slo_manifest_paths])
+
+    def _upload_segments(self, conn, container, path, obj, seg_container,
+                         segment_prefix, full_size, segment_size, resume):
+        existing_segments = {}
+        if resume:
+            try:
+                for seg in conn.get_container(
+                        seg_container, prefix=segment_prefix,
+                        full_listing=True)[1]:
+                    seg_name = seg['name']
+                    if isinstance(seg_name, six.text_type):
+                        seg_name = seg_name.encode('utf-8')
+                    existing_segments[seg_name] = seg
+            except ClientException as err:
+                if err.http_status != 404:
+                    raise
+        results = []
+        futures = []
+        segment_start = 0
+        while segment_start < full_size:
+            index = len(futures)
+            size = min(segment_size, full_size - segment_start)
+            segment_name = '%s%08d' % (segment_prefix, index)
+            results.append({
+                'action': 'upload_segment', 'container': seg_container,
+                'object': segment_name, 'for_object': obj,
+                'index': index, 'path': path,
+                'segment_start': segment_start, 'segment_size': size})
+            futures.append(self.segment_pool.submit(
+                self._upload_segment, results[-1],
+                existing_segments.get(segment_name)))
+            segment_start += size
+        segments = self._await_segments(futures, results, existing_segments)
+        if not all(seg['success'] for seg in segments):
+            raise ClientException(
+                'Aborting manifest creation because not all segments could '
+                'be uploaded. %s/%s' % (container, obj))
+        return segments
+
+    def _await_segments(self, futures, results, existing_segments):
+        """
+        Wait for the uploads of the segments of a file, uploading stragglers
+        again if there is a ``straggler_factor``, and return their results.
+        """
+        if not self.straggler_factor:
+            return [future.result() for future in futures]
+        wake = Event()
+        attempts = [[future] for future in futures]
+        for future in futures:
+            future.add_done_callback(lambda future: wake.set())
+        segments = [None] * len(futures)
+        durations = []
+        pending = set(range(len(futures)))
+        while pending:
+            wake.clear()
+            now = time()
+            for index in list(pending):
+                for future in attempts[index]:
+                    if not future.done():
+                        continue
+                    seg = future.result()
+                    if seg['success'] or all(
+                            f.done() for f in attempts[index]):
+                        segments[index] = seg
+                        pending.discard(index)
+                        if seg['success'] and not seg['reused']:
+                            durations.append(now - seg['start_time'])
+                        break
+            if len(durations) < 3:
+                wake.wait(1)
+                continue
+            limit = self.straggler_factor * sorted(durations)[
+                len(durations) // 2]
+            timeout = limit
+            for index in pending:
+                start = results[index].get('start_time')
+                if len(attempts[index]) > 1 or start is None:
+                    continue
+                if now - start < limit:
+                    timeout = min(timeout, start + limit - now)
+                    continue
+                copy = dict(results[index])
+                copy.pop('start_time')
+                future = self.segment_pool.submit(
+                    self._upload_segment, copy,
+                    existing_segments.get(copy['object']))
+                future.add_done_callback(lambda future: wake.set())
+                attempts[index].append(future)
+            wake.wait(timeout)
+        return segments
+
+    def _upload_segment(self, conn, result, existing):
+        result['start_time'] = time()
+        try:
+            if existing and existing['bytes'] == result['segment_size'] and \
+                    existing['hash'] == _hash_file(
+                        md5(), result['path'], result['segment_start'],
+                        result['segment_size']).hexdigest():
+                etag = existing['hash']
+                result['reused'] = True
+            else:
+                with open(result['path'], 'rb') as fp:
+                    fp.seek(result['segment_start'])
+                    etag = conn.put_object(
+                        result['container'], result['object'], fp,
+                        content_length=result['segment_size'])
+                result['reused'] = False
+        except Exception as err:
+            return self._failed(result, err, journal=False)
+        result['etag'] = etag
+        result['segment_location'] = '/%s/%s' % (result['container'],
+                                                 result['object'])
+        result.update(success=True, attempts=conn.attempts)
+        return self._report(result)
+
+    def _delete_old_segments(self, conn, old_manifest, old_slo_paths):
+        segments = []
+        if old_manifest:
+            scontainer, sprefix = old_manifest.split('/', 1)
+            scontainer = unquote(scontainer)
+            sprefix = unquote(sprefix).rstrip('/') + '/'
+            for delobj in conn.get_container(scontainer, prefix=sprefix)[1]:
+                segments.append((scontainer, delobj['name']))
+        for seg_path in old_slo_paths:
+            segments.append(tuple(seg_path.split('/', 1)))
+        futures = [self.segment_pool.submit(self._delete_segment, {
+            'action': 'delete_segment', 'container': seg_container,
+            'object': seg_name}) for seg_container, seg_name in segments]
+        for future in futures:
+            future.result()
+
+    def _delete_segment(self, conn, result):
+        try:
+            conn.delete_object(result['container'], result['object'])
+        except Exception as err:
+            return self._failed(result, err, journal=False)
+        result.update(success=True, attempts=conn.attempts)
+        return self._report(result)
+
+    def download_file(self, container, obj, path=None, fileobj=None,
+                      **options):
+        """
+        Download one object.
+
+        :param container: container of the object
+        :param obj: name of the object
+        :param path: local file to write; defaults to the object name
+        :param fileobj: a file-like object, such as stdout, to write to
+                        instead of a local file
+        :param options: the download options accepted by
+                        :meth:`download_container`
+        :returns: the result dict of the object
+        """
+        opts = _options(_DOWNLOAD_OPTIONS, options)
+        return self.object_pool.submit(
+            self._download, container, obj, path, fileobj, opts).result()
+
+    def download_container(self, container, objects=None, prefix=None,
+                           marker='', output_dir=None, partition=None,
+                           **options):
+        """
+        Download the objects of a container.
+
+        :param container: container to download from
+        :param objects: names of the objects to download; defaults to every
+                        object in the container
+        :param prefix: only download the objects beginning with ``prefix``
+        :param marker: only download the objects after ``marker``
+        :param output_dir: directory to download into; defaults to the
+                           current directory
+        :param partition: an ``(index, count)`` tuple; only download the
+                          objects in that partition (see
+                          :func:`swiftclient.utils.in_partition`)
+        :param headers: additional headers for every GET
+        :param skip_identical: skip objects whose etag matches the md5sum of
+                               the local file
+        :param resume: download into ``<file>.part`` and continue an earlier
+                       interrupted download of an unchanged object
+        :param no_download: read the objects but do not write them anywhere
+        :param parallel_segments: download the segments of large objects
+                                  concurrently, on the segment pool
+        :param range_threads: when writing to a ``fileobj``, fetch ranges of
+                              the object over this many connections
+        :param range_size: size of each range fetched by ``range_threads``
+        :param prefetch_buffer: bytes fetched by ``range_threads`` ahead of
+                                what has been written
+        :param preserve_mtime: set the mtime of files to the object's
+                               ``X-Object-Meta-Mtime``
+        :returns: an iterator of the result dicts of the objects, as they
+                  complete;
+                  the downloads proceed as it is consumed
+        """
+        opts = _options(_DOWNLOAD_OPTIONS, options)
+
+        def listing():
+            if objects is not None:
+                for obj in objects:
+                    yield obj, 0
+                return
+            for page in iter_container_pages(
+                    self._conn(), container, marker=marker, prefix=prefix):
+                page = [(o['name'], o.get('bytes', 0)) for o in page]
+                shuffle(page)
+                for item in page:
+                    yield item
+
+        def jobs():
+            for obj, size in listing():
+                if not in_partition(obj, partition):
+                    continue
+                path = obj.lstrip(os_path_sep)
+                if output_dir:
+                    path = join(output_dir, path)
+                yield size, self._download, (container, obj, path, None,
+                                             opts)
+
+        return self._gather(jobs(), {'action': 'list_container',
+                                     'container': container})
+
+    def _download(self, conn, container, obj, path, fileobj, opts):
+        if path is None:
+            path = obj.lstrip(os_path_sep)
+        result = {'action': 'download_object', 'container': container,
+                  'object': obj, 'path': path}
+        if self._skip_done(result):
+            return result
+        try:
+            self._download_object(conn, result, fileobj, opts)
+        except ClientException as err:
+            if err.http_status == 304 and opts['skip_identical']:
+                return self._succeeded(result, conn, SKIP, 'identical')
+            return self._failed(result, err)
+        except Exception as err:
+            return self._failed(result, err)
+        return self._succeeded(result, conn)
+
+    def _download_object(self, conn, result, fileobj, opts):
+        container, obj, path = \
+            result['container'], result['object'], result['path']
+        req_headers = dict(opts['headers'] or {})
+        to_file = fileobj is None and not opts['no_download']
+        if opts['skip_identical'] and fileobj is None:
+            try:
+                req_headers['If-None-Match'] = \
+                    _hash_file(md5(), path).hexdigest()
+            except IOError:
+                pass
+        part_file = None
+        resume_from = 0
+        if opts['resume'] and to_file and 'Range' not in req_headers:
+            part_file = path + '.part'
+        result['start_time'] = time()
+        segments = None
+        if opts['parallel_segments'] and to_file and \
+                'Range' not in req_headers:
+            headers = conn.head_object(container, obj)
+            segments = get_manifest_segments(conn, container, obj, headers)
+        md5sum = None
+        if segments is not None:
+            result['headers_receipt'] = time()
+            content_length = sum(seg['bytes'] for seg in segments)
+            # Each segment's md5sum is checked as it is downloaded.
+            if dirname(path) and not isdir(dirname(path)):
+                _mkdirs(dirname(path))
+            read_length = self._download_segments(path, segments)
+        else:
+            if fileobj is not None and opts['range_threads'] and \
+                    'Range' not in req_headers:
+                headers = conn.head_object(container, obj)
+                body = self._stream_ranges(container, obj, headers,
+                                           req_headers, opts)
+            elif part_file:
+                headers, body, resume_from = _get_resumable(
+                    conn, container, obj, part_file, req_headers)
+            else:
+                headers, body = conn.get_object(
+                    container, obj, resp_chunk_size=65536,
+                    headers=req_headers)
+            result['headers_receipt'] = time()
+            if 'content-length' in headers:
+                content_length = int(headers.get('content-length')) + \
+                    resume_from
+            else:
+                content_length = None
+            if 'x-object-manifest' not in headers and \
+                    'x-static-large-object' not in headers:
+                md5sum = md5()
+            content_type = headers.get('content-type') or ''
+            if content_type.split(';', 1)[0] == 'text/directory':
+                if to_file and not isdir(path):
+                    _mkdirs(path)
+                fp = None
+                read_length = 0
+            else:
+                if to_file and dirname(path) and not isdir(dirname(path)):
+                    _mkdirs(dirname(path))
+                if fileobj is not None:
+                    fp = fileobj
+                elif opts['no_download']:
+                    fp = None
+                elif part_file and resume_from:
+                    fp = open(part_file, 'ab')
+                    _hash_file(md5sum or md5(), part_file, 0, resume_from)
+                elif part_file:
+                    _write_part_state(part_file, headers)
+                    fp = open(part_file, 'wb')
+                else:
+                    fp = open(path, 'wb')
+                read_length = resume_from
+            try:
+                for chunk in body:
+                    if fp is not None:
+                        fp.write(chunk)
+                    read_length += len(chunk)
+                    if md5sum:
+                        md5sum.update(chunk)
+            finally:
+                if fp is not None and fp is not fileobj:
+                    fp.close()
+        result['finish_time'] = time()
+        result['read_length'] = read_length
+        result['auth_end_time'] = conn.auth_end_time
+        etag = headers.get('etag')
+        bad_md5 = md5sum and md5sum.hexdigest() != etag
+        bad_length = content_length is not None and \
+            read_length != content_length
+        if part_file and isfile(part_file):
+            if not bad_md5 and not bad_length:
+                rename(part_file, path)
+                _remove_part_state(part_file)
+            elif bad_md5 or read_length > content_length:
+                # Corrupt rather than short; start over next time.
+                remove(part_file)
+                _remove_part_state(part_file)
+        if 'x-object-meta-mtime' in headers and opts['preserve_mtime'] and \
+                to_file and not (part_file and isfile(part_file)):
+            mtime = float(headers['x-object-meta-mtime'])
+            utime(path, (mtime, mtime))
+        if bad_md5:
+            raise ClientException('%s: md5sum != etag, %s != %s'
+                                  % (path, md5sum.hexdigest(), etag))
+        if bad_length:
+            raise ClientException(
+                '%s: read_length != content_length, %d != %d'
+                % (path, read_length, content_length))
+
+    def _stream_ranges(self, container, obj, headers, req_headers, opts):
+        range_headers = dict(req_headers)
+        if 'x-object-manifest' not in headers and \
+                'x-static-large-object' not in headers and \
+                headers.get('etag'):
+            range_headers['If-Match'] = headers['etag']
+        return iter_object_ranges(
+            self.connection_maker, container, obj,
+            int(headers.get('content-length', 0)),
+            range_size=opts['range_size'], threads=opts['range_threads'],
+            buffer_size=opts['prefetch_buffer'], headers=range_headers)
+
+    def _download_segments(self, path, segments):
+        total_size = sum(seg['bytes'] for seg in segments)
+        with open(path, 'wb') as fp:
+            fp.truncate(total_size)
+        futures = [self.segment_pool.submit(self._download_segment, {
+            'action': 'download_segment', 'container': segment['container'],
+            'object': segment['name'], 'path': path}, segment)
+            for segment in segments]
+        results = [future.result() for future in futures]
+        if not all(seg['success'] for seg in results):
+            raise ClientException(
+                'Aborting download of %s because not all segments could be '
+                'downloaded.' % path)
+        return total_size
+
+    def _download_segment(self, conn, result, segment):
+        try:
+            download_segment(conn, segment, result['path'])
+        except Exception as err:
+            return self._failed(result, err, journal=False)
+        result.update(success=True, attempts=conn.attempts)
+        return self._report(result)
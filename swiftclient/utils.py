@@ -14,6 +14,10 @@
 # limitations under the License.
 """Miscellaneous utility functions for use with Swift."""
 
+from hashlib import md5
+from threading import Lock
+from time import sleep, time
+
 import six
 
 TRUE_VALUES = set(('true', '1', 'yes', 'on', 't', 'y'))
@@ -59,6 +63,95 @@ def prt_bytes(bytes, human_flag):
     return(bytes)
 
 
+def parse_partition(value):
+    """
+    Parse an ``INDEX/COUNT`` partition such as ``0/4`` into a tuple of
+    ``(index, count)``.
+
+    :raises ValueError: the partition is malformed or out of range
+    """
+    try:
+        index, count = [int(part) for part in value.split('/')]
+    except (AttributeError, ValueError):
+        raise ValueError('partition must be INDEX/COUNT, not %r' % (value,))
+    if not 0 <= index < count:
+        raise ValueError('partition index must be from 0 to COUNT - 1, '
+                         'not %r' % (value,))
+    return index, count
+
+
+def in_partition(name, partition):
+    """
+    Returns True if the object or container ``name`` belongs to the
+    ``(index, count)`` partition, or if ``partition`` is None.
+
+    The partition of a name only depends on a hash of the name, so that
+    separate processes given the partitions ``0/N`` to ``N-1/N`` of the
+    same names each handle a disjoint share of them, together covering all
+    of them, without any coordination.
+    """
+    if partition is None:
+        return True
+    index, count = partition
+    if isinstance(name, six.text_type):
+        name = name.encode('utf-8')
+    return int(md5(name).hexdigest(), 16) % count == index
+
+
+class TokenBucket(object):
+    """
+    A token bucket which limits the rate of something, such as bytes or
+    requests, to ``rate`` per second, however many threads take from it.
+
+    Tokens accrue at ``rate`` per second, up to ``burst`` (by default one
+    second's worth).  :meth:`take` may take more tokens than there are and
+    leave the bucket in debt, which later takers wait out; so single
+    amounts larger than ``burst`` still pass, at the limited rate.
+
+    The limits may be changed with :meth:`set_rate` while the bucket is in
+    use.  A ``rate`` of None or 0 means no limit.
+    """
+
+    def __init__(self, rate, burst=None):
+        self._lock = Lock()
+        self._last = time()
+        self.rate = self.burst = None
+        self._tokens = 0.0
+        self.set_rate(rate, burst)
+        self._tokens = float(self.burst or 0)
+
+    def set_rate(self, rate, burst=None):
+        with self._lock:
+            self._refill()
+            self.rate = rate
+            self.burst = burst or rate
+            if self.burst:
+                self._tokens = min(self._tokens, self.burst)
+
+    def _refill(self):
+        now = time()
+        if self.rate:
+            self._tokens = min(self.burst, self._tokens +
+                               (now - self._last) * self.rate)
+        self._last = now
+
+    def take(self, amount=1):
+        """
+        Take ``amount`` tokens, first waiting for the bucket to be out of
+        debt.
+        """
+        while True:
+            with self._lock:
+                if not self.rate:
+                    return
+                self._refill()
+                if self._tokens >= 0:
+                    self._tokens -= amount
+                    return
+                wait = -self._tokens / self.rate
+            sleep(wait)
+
+
 class LengthWrapper(object):
 
     def __init__(self, readable, length):
@@ -0,0 +1,115 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+try:
+    from unittest import mock
+except ImportError:
+    import mock
+import requests
+import testtools
+
+from swiftclient import endpoints
+
+A = 'http://a:8080/v1/AUTH_test'
+B = 'http://b:8080/v1/AUTH_test'
+C = 'http://c:8080/v1/AUTH_test'
+
+
+class TestEndpointPool(testtools.TestCase):
+
+    def setUp(self):
+        super(TestEndpointPool, self).setUp()
+        self.now = 1000
+        patcher = mock.patch('swiftclient.endpoints.time',
+                             lambda: self.now)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_empty(self):
+        pool = endpoints.EndpointPool()
+        self.assertTrue(pool.discover)
+        self.assertEqual(None, pool.choose())
+        pool.set_urls([A])
+        self.assertEqual(A, pool.choose())
+        self.assertFalse(endpoints.EndpointPool([A]).discover)
+
+    def test_least_outstanding(self):
+        pool = endpoints.EndpointPool([A, B, C])
+        for url in (A, A, B):
+            pool.start(url)
+        self.assertEqual(C, pool.choose())
+        pool.start(C)
+        self.assertEqual(B, pool.choose())
+        pool.finish(A, True)
+        pool.finish(A, True)
+        self.assertEqual(A, pool.choose())
+        self.assertEqual(B, pool.choose(avoid=A))
+
+    def test_latency(self):
+        pool = endpoints.EndpointPool([A, B], latency_weight=0.5)
+        pool.start(A)
+        pool.finish(A, True, 2)
+        # endpoints without a latency are tried first
+        self.assertEqual(B, pool.choose())
+        pool.start(B)
+        pool.finish(B, True, 1)
+        self.assertEqual(B, pool.choose())
+        pool.start(B)
+        pool.finish(B, True, 5)
+        self.assertEqual(3, pool._endpoints[1].latency)
+        self.assertEqual(A, pool.choose())
+
+    def test_ejection(self):
+        pool = endpoints.EndpointPool([A, B], max_failures=2,
+                                      ejection_period=10)
+        for url in (A, B, B):
+            pool.start(url)
+            pool.finish(url, True, 1)
+        pool.start(A)
+        pool.finish(A, False)
+        self.assertEqual(A, pool.choose())
+        pool.start(A)
+        pool.finish(A, False)
+        self.assertEqual(B, pool.choose())
+        # with every endpoint ejected, the one due back first is used
+        self.now += 5
+        pool.start(B)
+        pool.finish(B, False)
+        pool.start(B)
+        pool.finish(B, False)
+        self.assertEqual(A, pool.choose())
+        # back after the ejection period, and out again on its next failure
+        self.now += 6
+        self.assertEqual(A, pool.choose())
+        pool.start(A)
+        pool.finish(A, False)
+        self.assertEqual(B, pool.choose())
+        pool.set_urls([A, C])
+        self.assertEqual(C, pool.choose())
+
+    @mock.patch('swiftclient.endpoints.requests.get')
+    def test_check(self, mock_get):
+        pool = endpoints.EndpointPool([A, B])
+        pool.start(B)
+        pool.finish(B, True, 1)
+        mock_get.side_effect = [mock.Mock(status_code=503),
+                                requests.ConnectionError()]
+        self.assertEqual({A: False, B: False}, pool.check(verify=False))
+        mock_get.assert_called_with('http://b:8080/healthcheck', timeout=5,
+                                    verify=False)
+        self.assertEqual(A, pool.choose())
+        mock_get.side_effect = None
+        mock_get.return_value = mock.Mock(status_code=200)
+        self.assertEqual({A: True, B: True}, pool.check())
+        self.assertEqual(A, pool.choose())
+        self.assertEqual(B, pool.choose(avoid=A))
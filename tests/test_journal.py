@@ -0,0 +1,69 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+import shutil
+import tempfile
+
+import testtools
+
+from swiftclient import journal
+
+
+class TestJournal(testtools.TestCase):
+
+    def setUp(self):
+        super(TestJournal, self).setUp()
+        self.tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmpdir)
+        self.path = os.path.join(self.tmpdir, 'journal')
+
+    def _read(self):
+        with open(self.path) as fp:
+            return fp.read()
+
+    def test_new_journal(self):
+        with journal.Journal(self.path) as j:
+            self.assertFalse(j.is_done('c/o'))
+            j.record(journal.OK, 'c/o')
+            j.record(journal.FAIL, u'c/\u2603')
+        self.assertEqual('["ok","c/o"]\n["fail","c/\\u2603"]\n',
+                         self._read())
+
+    def test_restart(self):
+        with open(self.path, 'w') as fp:
+            fp.write('["ok","c/a"]\n["skip","c/b"]\n["fail","c/c"]\n'
+                     '["ok","c/d"]\n["fail","c/d"]\n["fail","c/e"]\n'
+                     '["ok","c/e"]\n["ok","c/f')
+        with journal.Journal(self.path) as j:
+            self.assertEqual(set(['c/a', 'c/b', 'c/e']), j.done)
+            j.record(journal.OK, 'c/c')
+        with journal.Journal(self.path) as j:
+            self.assertTrue(j.is_done('c/c'))
+            self.assertFalse(j.is_done('c/f'))
+
+    def test_group_commit(self):
+        j = journal.Journal(self.path, flush_interval=60)
+        self.addCleanup(j.close)
+        j.record(journal.OK, 'c/a')
+        j.record(journal.OK, 'c/b')
+        self.assertEqual('', self._read())
+        journal.flush_journals()
+        self.assertEqual('["ok","c/a"]\n["ok","c/b"]\n', self._read())
+
+    def test_close_journals(self):
+        j = journal.Journal(self.path)
+        j.record(journal.SKIP, 'c/a')
+        journal.close_journals()
+        self.assertEqual('["skip","c/a"]\n', self._read())
+        self.assertTrue(j._fp.closed)
@@ -234,6 +234,112 @@ class TestQueueFunctionManager(ThreadTestCase):
         self.assertEqual(self.stored_results, ['best result EVAR!'] * 20)
 
 
+class TestConnectionThreadPool(ThreadTestCase):
+
+    def test_results_and_exceptions(self):
+        conns = []
+
+        def conn_maker():
+            conns.append(object())
+            return conns[-1]
+
+        def func(conn, item, suffix=''):
+            if item == 'go boom':
+                raise Exception('I went boom!')
+            return conn, item + suffix
+
+        with mt.ConnectionThreadPool(conn_maker, 3) as pool:
+            futures = [pool.submit(func, str(i), suffix='!')
+                       for i in range(10)]
+            boom = pool.submit(func, 'go boom')
+
+        results = [f.result() for f in futures]
+        self.assertEqual(['%d!' % i for i in range(10)],
+                         [r[1] for r in results])
+        # every thread made exactly one connection and reused it; a thread
+        # may have run nothing but the boom, so not every one shows up here
+        self.assertTrue(1 <= len(conns) <= 3)
+        self.assertTrue(set(r[0] for r in results) <= set(conns))
+        self.assertTrue(boom.done())
+        self.assertEqual('I went boom!', str(boom.exception()))
+        self.assertRaises(Exception, boom.result)
+        self.assertEqual(self.starting_thread_count, threading.active_count())
+        self.assertRaises(RuntimeError, pool.submit, func, 'late')
+
+    def test_no_connection_maker(self):
+        with mt.ConnectionThreadPool(None, 2) as pool:
+            future = pool.submit(lambda a, b: a + b, 1, b=2)
+        self.assertEqual(3, future.result())
+
+    def test_cancel(self):
+        started = threading.Event()
+        release = threading.Event()
+
+        def block():
+            started.set()
+            release.wait()
+            return 'first'
+
+        pool = mt.ConnectionThreadPool(None, 1)
+        first = pool.submit(block)
+        second = pool.submit(lambda: 'second')
+        started.wait()
+        pool.shutdown(wait=False, cancel=True)
+        release.set()
+        self.assertEqual('first', first.result(timeout=5))
+        self.assertFalse(second.done())
+
+    def test_cancel_future(self):
+        started = threading.Event()
+        release = threading.Event()
+        ran = []
+
+        def block():
+            started.set()
+            release.wait()
+
+        with mt.ConnectionThreadPool(None, 1) as pool:
+            first = pool.submit(block)
+            second = pool.submit(ran.append, 'second')
+            started.wait()
+            self.assertFalse(first.cancel())
+            self.assertTrue(second.cancel())
+            release.set()
+        self.assertTrue(first.done())
+        self.assertFalse(second.done())
+        self.assertEqual([], ran)
+
+    def test_priority(self):
+        started = threading.Event()
+        release = threading.Event()
+        order = []
+
+        def block():
+            started.set()
+            release.wait()
+
+        with mt.ConnectionThreadPool(None, 1, priority=True) as pool:
+            pool.submit(block)
+            started.wait()
+            for name, priority in [('a', 1), ('b', 5), ('c', 3), ('d', 5)]:
+                pool.submit_priority(priority, order.append, name)
+            pool.submit(order.append, 'e')
+            release.set()
+        self.assertEqual(['b', 'd', 'c', 'a', 'e'], order)
+
+    def test_done_callback(self):
+        release = threading.Event()
+        done = []
+        with mt.ConnectionThreadPool(None, 1) as pool:
+            future = pool.submit(release.wait)
+            future.add_done_callback(done.append)
+            self.assertEqual([], done)
+            release.set()
+        self.assertEqual([future], done)
+        future.add_done_callback(done.append)
+        self.assertEqual([future, future], done)
+
+
 class TestMultiThreadingManager(ThreadTestCase):
 
     @mock.patch('swiftclient.multithreading.QueueFunctionManager')
@@ -342,6 +448,118 @@ class TestMultiThreadingManager(ThreadTestCase):
 
         self.assertEqual(3, thread_manager.error_count)
 
+    def test_print_lines(self):
+        out_stream = mock.Mock()
+        release = threading.Event()
+
+        class Plug(object):
+            def __str__(self):
+                release.wait()
+                return 'plugged'
+
+        with mt.MultiThreadingManager(print_stream=out_stream,
+                                      error_stream=six.StringIO(),
+                                      flush_size=10) as thread_manager:
+            # hold up the printer until everything has been queued
+            thread_manager.print_msg(Plug())
+            thread_manager.print_lines([])
+            thread_manager.print_lines(['a', 'b', 'c'])
+            thread_manager.print_msg('%s', 'd')
+            release.set()
+        written = ''.join(c[0][0] for c in out_stream.write.call_args_list)
+        self.assertEqual('plugged\na\nb\nc\nd\n', written)
+        # however the messages were queued, they were written together
+        self.assertTrue(out_stream.write.call_count <= 2)
+        self.assertTrue(out_stream.flush.called)
+
+
+class TestBatchedWriter(testtools.TestCase):
+
+    def test_flush_size(self):
+        stream = mock.Mock()
+        writer = mt.BatchedWriter(stream, flush_size=5, flush_interval=60)
+        writer.write('ab')
+        writer.write('cd')
+        self.assertFalse(stream.write.called)
+        writer.write('ef')
+        stream.write.assert_called_once_with('abcdef')
+        writer.write('g')
+        writer.flush()
+        self.assertEqual([mock.call('abcdef'), mock.call('g')],
+                         stream.write.call_args_list)
+        self.assertEqual(2, stream.flush.call_count)
+
+    @mock.patch('swiftclient.multithreading.time')
+    def test_flush_interval(self, mock_time):
+        stream = mock.Mock()
+        mock_time.return_value = 100
+        writer = mt.BatchedWriter(stream, flush_size=1000, flush_interval=1)
+        writer.write('a')
+        self.assertFalse(stream.write.called)
+        mock_time.return_value = 101
+        writer.write('b')
+        stream.write.assert_called_once_with('ab')
+
+
+class TestWorkerProcesses(testtools.TestCase):
+
+    def test_output_merged(self):
+        def work(index, thread_manager):
+            thread_manager.print_msg('out %d', index)
+            if index == 1:
+                thread_manager.error('error %d', index)
+            if index == 2:
+                sys.exit(3)
+
+        out_stream = six.StringIO()
+        err_stream = six.StringIO()
+        workers = mt.WorkerProcesses(work, 3)
+        with mt.MultiThreadingManager(print_stream=out_stream,
+                                      error_stream=err_stream) as manager:
+            failed = workers.wait(manager)
+        self.assertEqual(1, failed)
+        self.assertEqual(['out 0', 'out 1', 'out 2'],
+                         sorted(out_stream.getvalue().splitlines()))
+        self.assertEqual('error 1\n', err_stream.getvalue())
+        self.assertEqual(1, manager.error_count)
+
+    def test_concurrent_printing(self):
+        class SlowStream(object):
+            def __init__(self):
+                self.lock = threading.Lock()
+                self.lines = []
+
+            def write(self, text):
+                with self.lock:
+                    time.sleep(0.001)
+                    self.lines.extend(text.splitlines())
+
+        stream = SlowStream()
+
+        def work(index, thread_manager):
+            # the parent's printer was writing to stream at the fork
+            stream.write('direct %d\n' % index)
+            for i in range(100):
+                thread_manager.print_msg('out %d %d', index, i)
+
+        workers = mt.WorkerProcesses(work, 4)
+        result = []
+        with mt.MultiThreadingManager(print_stream=stream,
+                                      flush_size=1) as manager:
+            for i in range(100):
+                manager.print_msg('parent %d', i)
+            waiter = threading.Thread(
+                target=lambda: result.append(workers.wait(manager)))
+            waiter.daemon = True
+            waiter.start()
+            waiter.join(30)
+        self.assertEqual([0], result)
+        self.assertEqual(500, len(stream.lines))
+        self.assertEqual(
+            sorted('out %d %d' % (index, i)
+                   for index in range(4) for i in range(100)),
+            sorted(line for line in stream.lines if line.startswith('out')))
+
 
 if __name__ == '__main__':
     testtools.main()
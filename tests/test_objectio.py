@@ -0,0 +1,220 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import io
+import json
+import threading
+from hashlib import md5
+
+import testtools
+
+from swiftclient import objectio
+from swiftclient.exceptions import ClientException
+
+
+class FakeConnection(object):
+    """Serves ranged GETs of one object and records the ranges asked for."""
+
+    def __init__(self, data, etag='abc', headers=None):
+        self.data = data
+        self.etag = etag
+        self.headers = dict(headers or {})
+        self.ranges = []
+        self.lock = threading.Lock()
+
+    def head_object(self, container, obj):
+        return dict(self.headers, **{'content-length': str(len(self.data)),
+                                     'etag': self.etag})
+
+    def get_object(self, container, obj, headers=None):
+        start, end = headers['Range'][len('bytes='):].split('-')
+        start, end = int(start), int(end)
+        with self.lock:
+            self.ranges.append((start, end, headers.get('If-Match')))
+        return {'etag': self.etag}, self.data[start:end + 1]
+
+
+class TestObjectReader(testtools.TestCase):
+
+    def setUp(self):
+        super(TestObjectReader, self).setUp()
+        self.data = b''.join(b'%03d' % i for i in range(100))
+        self.conn = FakeConnection(self.data)
+
+    def _open(self, **kwargs):
+        kwargs.setdefault('connection_maker', lambda: self.conn)
+        reader = objectio.ObjectReader(self.conn, 'c', 'o', **kwargs)
+        self.addCleanup(reader.close)
+        return reader
+
+    def test_random_access(self):
+        reader = self._open(block_size=10, readahead=0)
+        self.assertTrue(reader.seekable())
+        self.assertEqual(300, reader.seek(0, io.SEEK_END))
+        reader.seek(125)
+        self.assertEqual(b'10420', reader.read(5))
+        self.assertEqual(130, reader.tell())
+        reader.seek(-4, io.SEEK_END)
+        self.assertEqual(b'8099', reader.read())
+        self.assertEqual(b'', reader.read(1))
+        reader.seek(-10, io.SEEK_CUR)
+        self.assertEqual(b'60', reader.read(2))
+        self.assertEqual([(120, 129, 'abc'), (290, 299, 'abc')],
+                         self.conn.ranges)
+        self.assertRaises(ValueError, reader.seek, -1)
+
+    def test_read_spans_blocks(self):
+        reader = io.BufferedReader(self._open(block_size=7, readahead=0),
+                                   buffer_size=7)
+        self.assertEqual(self.data, reader.read())
+
+    def test_lru_cache(self):
+        reader = self._open(block_size=10, cache_size=20, readahead=0)
+        for pos in (0, 50, 0, 100, 0, 50):
+            reader.seek(pos)
+            reader.read(1)
+        # block 5 was evicted by block 10 while block 0 stayed in use
+        self.assertEqual([0, 50, 100, 50],
+                         [r[0] for r in self.conn.ranges])
+
+    def test_sequential_readahead(self):
+        reader = self._open(block_size=10, cache_size=100, readahead=3)
+        reader.read(10)
+        reader.seek(200)
+        reader.read(10)
+        self.assertEqual([0, 200], [r[0] for r in self.conn.ranges])
+        self.assertEqual(b'07007', reader.read(5))
+        for future in list(reader._pending.values()):
+            future.result()
+        self.assertEqual([0, 200, 210, 220, 230, 240],
+                         sorted(r[0] for r in self.conn.ranges))
+        self.assertEqual(self.data[215:], reader.read())
+        self.assertEqual(11, len(self.conn.ranges))
+
+    def test_seek_drops_stale_readahead(self):
+        reader = self._open(block_size=16, cache_size=8 * 16, readahead=2)
+        for i in range(45):
+            pos = reader.seek((i * 7 % 17) * 16)
+            self.assertEqual(self.data[pos:pos + 32],
+                             reader.read(16) + reader.read(16))
+            self.assertTrue(
+                len(reader._cache) + len(reader._pending) <= 8)
+        self.assertTrue(len(reader._pending) <= 2)
+
+    def test_manifest_not_pinned(self):
+        self.conn.headers['x-static-large-object'] = 'true'
+        reader = self._open(block_size=10, readahead=0)
+        reader.read(1)
+        self.assertEqual([(0, 9, None)], self.conn.ranges)
+
+    def test_changed_object(self):
+        self.conn.headers['x-object-manifest'] = 'c_segments/o/'
+        reader = self._open(block_size=10, readahead=0)
+        self.conn.etag = 'def'
+        exc = self.assertRaises(ClientException, reader.read, 1)
+        self.assertIn('changed', str(exc))
+
+    def test_closed(self):
+        reader = self._open()
+        reader.close()
+        self.assertTrue(reader.closed)
+        self.assertRaises(ValueError, reader.read, 1)
+
+
+class FakePutConnection(object):
+    """Records the objects PUT to it."""
+
+    def __init__(self, fail_on=None):
+        self.puts = {}
+        self.fail_on = fail_on
+        self.lock = threading.Lock()
+
+    def _clone(self):
+        return self
+
+    def put_object(self, container, obj, contents, content_length=None,
+                   etag=None, content_type=None, headers=None,
+                   query_string=None):
+        data = contents if isinstance(contents, str) else contents.read()
+        if obj == self.fail_on:
+            raise ClientException('Object PUT failed', http_status=503)
+        with self.lock:
+            self.puts['%s/%s' % (container, obj)] = (data, headers,
+                                                     query_string)
+        return md5(data).hexdigest()
+
+
+class TestObjectWriter(testtools.TestCase):
+
+    def setUp(self):
+        super(TestObjectWriter, self).setUp()
+        self.conn = FakePutConnection()
+
+    def _open(self, **kwargs):
+        return objectio.ObjectWriter(self.conn, 'c', 'o', **kwargs)
+
+    def test_small_object(self):
+        writer = self._open(segment_size=10, headers={'x-object-meta-a': 1})
+        self.assertTrue(writer.writable())
+        self.assertFalse(writer.seekable())
+        writer.write(b'abcd')
+        writer.write(b'efghij')
+        self.assertEqual(10, writer.tell())
+        writer.close()
+        self.assertEqual({'c/o': (b'abcdefghij', {'x-object-meta-a': 1},
+                                  None)}, self.conn.puts)
+        self.assertEqual(md5(b'abcdefghij').hexdigest(), writer.etag)
+
+    def test_empty_object(self):
+        with self._open(segment_size=10):
+            pass
+        self.assertEqual({'c/o': (b'', None, None)}, self.conn.puts)
+
+    def test_segmented_object(self):
+        with self._open(segment_size=4, segment_threads=2) as writer:
+            writer.write(b'abcdefghij')
+            writer.write(b'kl')
+        data, headers, query_string = self.conn.puts.pop('c/o')
+        self.assertEqual('multipart-manifest=put', query_string)
+        self.assertEqual('true', headers['x-static-large-object'])
+        manifest = json.loads(data)
+        self.assertEqual([4, 4, 4], [s['size_bytes'] for s in manifest])
+        self.assertEqual(
+            [b'abcd', b'efgh', b'ijkl'],
+            [self.conn.puts[s['path'][1:]][0] for s in manifest])
+        self.assertEqual(3, len(self.conn.puts))
+
+    def test_bounded_segments(self):
+        writer = self._open(segment_size=2, segment_threads=2)
+        self.addCleanup(writer.abort)
+        writer.write(b'x' * 20)
+        self.assertTrue(len(writer._uploader._pending) <= 2)
+
+    def test_exception_discards_upload(self):
+        try:
+            with self._open(segment_size=4) as writer:
+                writer.write(b'abcdef')
+                raise ValueError()
+        except ValueError:
+            pass
+        self.assertTrue(writer.closed)
+        self.assertNotIn('c/o', self.conn.puts)
+        self.assertRaises(ValueError, writer.write, b'a')
+
+    def test_failed_segment(self):
+        writer = self._open(segment_size=2, segment_threads=1)
+        self.conn.fail_on = writer._uploader.segment_prefix + '/00000000'
+        writer.write(b'ab')
+        self.assertRaises(ClientException, writer.write, b'cd')
+        self.assertTrue(writer.closed)
+        self.assertNotIn('c/o', self.conn.puts)
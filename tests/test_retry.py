@@ -0,0 +1,144 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import socket
+from email.utils import formatdate
+
+try:
+    from unittest import mock
+except ImportError:
+    import mock
+import testtools
+
+from swiftclient import retry
+from swiftclient.exceptions import ClientException
+
+
+def _error(status, headers=None):
+    return ClientException('failed', http_status=status,
+                           http_response_headers=headers)
+
+
+class TestRetryAfter(testtools.TestCase):
+
+    def test_retry_after(self):
+        self.assertEqual(None, retry.retry_after(_error(503)))
+        self.assertEqual(None, retry.retry_after(socket.error()))
+        self.assertEqual(2.5, retry.retry_after(
+            _error(503, {'retry-after': '2.5'})))
+        self.assertEqual(None, retry.retry_after(
+            _error(503, {'retry-after': 'soon'})))
+        with mock.patch('swiftclient.retry.time', return_value=1000):
+            self.assertEqual(30, retry.retry_after(
+                _error(503, {'retry-after': formatdate(1030)})))
+            self.assertEqual(0, retry.retry_after(
+                _error(503, {'retry-after': formatdate(900)})))
+
+
+class TestRetryPolicy(testtools.TestCase):
+
+    def test_should_retry(self):
+        policy = retry.RetryPolicy()
+        self.assertTrue(policy.should_retry(socket.error()))
+        for status in (408, 500, 503):
+            self.assertTrue(policy.should_retry(_error(status)))
+        for status in (404, 429, 498):
+            self.assertFalse(policy.should_retry(_error(status)))
+        policy = retry.RetryPolicy(retry_on_ratelimit=True)
+        self.assertTrue(policy.should_retry(_error(498)))
+
+    def test_backoff(self):
+        policy = retry.RetryPolicy(starting_backoff=1, max_backoff=5)
+        self.assertEqual([1, 2, 4, 5, 5], [
+            policy.backoff(attempt, None, _error(503))
+            for attempt in range(1, 6)])
+        self.assertEqual(0, policy.wait())
+
+
+class TestAdaptiveRetryPolicy(testtools.TestCase):
+
+    def test_should_retry(self):
+        policy = retry.AdaptiveRetryPolicy()
+        for status in (429, 498, 503):
+            self.assertTrue(policy.should_retry(_error(status)))
+        self.assertFalse(policy.should_retry(_error(404)))
+
+    @mock.patch('swiftclient.retry.random.uniform')
+    def test_backoff(self, uniform):
+        uniform.side_effect = lambda low, high: high
+        policy = retry.AdaptiveRetryPolicy(starting_backoff=1,
+                                           max_backoff=20)
+        self.assertEqual(3, policy.backoff(1, None, _error(503)))
+        self.assertEqual(9, policy.backoff(2, 3, _error(503)))
+        self.assertEqual(20, policy.backoff(3, 9, _error(503)))
+        self.assertEqual([mock.call(1, 3), mock.call(1, 9),
+                          mock.call(1, 27)], uniform.call_args_list)
+        # Retry-After is honoured even beyond max_backoff
+        self.assertEqual(60, policy.backoff(
+            1, None, _error(429, {'retry-after': '60'})))
+
+    def test_budget(self):
+        policy = retry.AdaptiveRetryPolicy(budget=2, budget_ratio=0.5)
+        self.assertNotEqual(None, policy.backoff(1, None, _error(503)))
+        self.assertNotEqual(None, policy.backoff(1, None, _error(503)))
+        self.assertEqual(None, policy.backoff(1, None, _error(503)))
+        policy.record(True)
+        self.assertEqual(None, policy.backoff(1, None, _error(503)))
+        policy.record(True)
+        self.assertNotEqual(None, policy.backoff(1, None, _error(503)))
+        for _junk in range(10):
+            policy.record(True)
+        self.assertEqual(2, policy._tokens)
+
+    @mock.patch('swiftclient.retry.time')
+    def test_breaker(self, mock_time):
+        mock_time.return_value = 100
+        policy = retry.AdaptiveRetryPolicy(breaker_threshold=3,
+                                           breaker_cooldown=10)
+        policy.record(False)
+        policy.record(False)
+        policy.record(True)
+        policy.record(False)
+        policy.record(False)
+        self.assertEqual(0, policy.wait())
+        policy.record(False)
+        self.assertEqual(10, policy.wait())
+        mock_time.return_value = 104
+        self.assertEqual(6, policy.wait())
+        mock_time.return_value = 111
+        self.assertEqual(0, policy.wait())
+
+
+class TestHedgePolicy(testtools.TestCase):
+
+    def test_fixed_delay(self):
+        policy = retry.HedgePolicy(delay=0.5)
+        self.assertEqual(0.5, policy.delay())
+        policy.record(10)
+        self.assertEqual(0.5, policy.delay())
+
+    def test_percentile(self):
+        policy = retry.HedgePolicy(percentile=90, window=10, min_samples=5)
+        for latency in range(4):
+            policy.record(latency)
+        self.assertEqual(None, policy.delay())
+        policy.record(4)
+        self.assertEqual(4, policy.delay())
+        for latency in range(10, 20):
+            policy.record(latency)
+        # only the last ten latencies are kept
+        self.assertEqual(19, policy.delay())
+        policy = retry.HedgePolicy(percentile=50, min_samples=1)
+        for latency in (5, 1, 3):
+            policy.record(latency)
+        self.assertEqual(3, policy.delay())
@@ -13,12 +13,15 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import json
 import mock
 import os
 import tempfile
 import unittest
+from hashlib import md5
 
 import swiftclient
+import swiftclient.retry
 import swiftclient.shell
 
 mocked_os_environ = {
@@ -164,6 +167,68 @@ class TestShell(unittest.TestCase):
                  mock.call('           0')]
         mock_print.assert_has_calls(calls)
 
+    @mock.patch('swiftclient.shell.MultiThreadingManager._print')
+    @mock.patch('swiftclient.shell.Connection')
+    def test_list_account_long(self, connection, mock_print):
+        connection.return_value.get_account.side_effect = [
+            [None, [{'name': 'c1', 'count': 1, 'bytes': 2},
+                    {'name': 'c2', 'count': 3, 'bytes': 4}]],
+            [None, []],
+        ]
+        connection.return_value.batch.return_value = iter([
+            {'success': True, 'result': {'x-timestamp': '0'}},
+            {'success': False, 'error': swiftclient.ClientException('')}])
+        argv = ["", "list", "--long", "--container-threads", "5"]
+        swiftclient.shell.main(argv)
+        connection.return_value.batch.assert_called_once_with(
+            [{'op': 'head', 'container': 'c1'},
+             {'op': 'head', 'container': 'c2'}], concurrency=5,
+            pool=mock.ANY)
+        self.assertFalse(connection.return_value.head_container.called)
+        calls = [mock.call('    1            2 1970-01-01 00:00:00 c1\n'
+                           '    3            4 ????-??-?? ??:??:?? c2'),
+                 mock.call('    4            6')]
+        mock_print.assert_has_calls(calls)
+
+    @mock.patch('swiftclient.shell.MultiThreadingManager._print')
+    @mock.patch('swiftclient.shell.Connection')
+    def test_list_account_long_pages_share_pool(self, connection,
+                                                mock_print):
+        connection.return_value.get_account.side_effect = [
+            [None, [{'name': 'c1', 'count': 1, 'bytes': 2}]],
+            [None, [{'name': 'c2', 'count': 3, 'bytes': 4}]],
+            [None, []],
+        ]
+        connection.return_value.batch.side_effect = lambda ops, **kw: iter(
+            [{'success': True, 'result': {'x-timestamp': '0'}}] * len(ops))
+        swiftclient.shell.main(["", "list", "--long"])
+        pools = [call[1]['pool']
+                 for call in connection.return_value.batch.call_args_list]
+        self.assertEqual(2, len(pools))
+        self.assertIs(pools[0], pools[1])
+
+    @mock.patch('swiftclient.shell.MultiThreadingManager._print')
+    @mock.patch('swiftclient.shell.Connection')
+    def test_list_container_metadata(self, connection, mock_print):
+        connection.return_value.get_container.side_effect = [
+            [None, [{'name': 'a'}, {'subdir': 'd/'}, {'name': 'b'}]],
+            [None, []],
+        ]
+        connection.return_value.batch.return_value = iter([
+            {'success': True, 'result': {'x-object-meta-color': 'blue'}},
+            {'success': False, 'error': swiftclient.ClientException('')}])
+        argv = ["", "list", "container", "-m", "X-Object-Meta-Color",
+                "--metadata", "size"]
+        swiftclient.shell.main(argv)
+        connection.return_value.batch.assert_called_once_with(
+            [{'op': 'head', 'container': 'container', 'object': 'a'},
+             {'op': 'head', 'container': 'container', 'object': 'b'}],
+            concurrency=10, pool=mock.ANY)
+        mock_print.assert_called_once_with('blue - a\n- - d/\n? ? b')
+
+        argv = ["", "list", "--metadata", "color"]
+        self.assertRaises(SystemExit, swiftclient.shell.main, argv)
+
     @mock.patch('__builtin__.open')
     @mock.patch('swiftclient.shell.Connection')
     def test_download(self, connection, mock_open):
@@ -189,7 +254,167 @@ class TestShell(unittest.TestCase):
         connection.return_value.get_object.assert_called_with(
             'container', 'object', headers={}, resp_chunk_size=65536)
 
-    @mock.patch('swiftclient.shell.listdir')
+    @mock.patch('__builtin__.open', new_callable=mock.mock_open)
+    @mock.patch('swiftclient.shell.Journal')
+    @mock.patch('swiftclient.shell.Connection')
+    def test_download_journal(self, connection, journal, mock_open):
+        journal.return_value.is_done.side_effect = \
+            lambda key: key == 'container/done'
+        connection.return_value.get_object.return_value = [
+            {'content-type': 'text/plain',
+             'etag': 'd41d8cd98f00b204e9800998ecf8427e'}, '']
+        connection.return_value.get_container.side_effect = [
+            [None, [{'name': 'done'}, {'name': 'todo'}]],
+            [None, []],
+        ]
+        argv = ["", "download", "container", "--journal", "journal"]
+        swiftclient.shell.main(argv)
+        journal.assert_called_once_with('journal')
+        connection.return_value.get_object.assert_called_once_with(
+            'container', 'todo', headers={}, resp_chunk_size=65536)
+        journal.return_value.record.assert_called_once_with(
+            'ok', 'container/todo')
+
+    @mock.patch('swiftclient.shell.Journal')
+    @mock.patch('swiftclient.shell.Connection')
+    def test_delete_journal(self, connection, journal):
+        journal.return_value.is_done.return_value = False
+        connection.return_value.head_object.return_value = {}
+        connection.return_value.delete_object.side_effect = [
+            None, swiftclient.ClientException('oops', http_status=500)]
+        argv = ["", "delete", "container", "a", "b", "--journal", "journal",
+                "--object-threads", "1"]
+        try:
+            swiftclient.shell.main(argv)
+        except SystemExit:
+            pass
+        self.assertEqual(
+            [mock.call('ok', 'container/a'), mock.call('fail', 'container/b')],
+            journal.return_value.record.call_args_list)
+
+    @mock.patch('swiftclient.shell.Connection')
+    def test_delete_journal_restart_missing(self, connection):
+        connection.return_value.head_object.return_value = {}
+        connection.return_value.delete_object.side_effect = \
+            swiftclient.ClientException('gone', http_status=404)
+        with open(self.tmpfile, 'w') as fp:
+            fp.write('["fail","container/a"]\n')
+        argv = ["", "delete", "container", "a", "--journal", self.tmpfile]
+        self.assertRaises(SystemExit, swiftclient.shell.main, argv)
+        self.assertEqual(1, connection.return_value.delete_object.call_count)
+        # the restart finds the missing object done and leaves it alone
+        swiftclient.shell.main(argv)
+        self.assertEqual(1, connection.return_value.delete_object.call_count)
+        with open(self.tmpfile) as fp:
+            self.assertEqual('["skip","container/a"]',
+                             fp.read().splitlines()[-1])
+
+    @mock.patch('swiftclient.shell.Connection')
+    def test_download_segments(self, connection):
+        manifest = json.dumps([
+            {'name': '/c_segments/o/1', 'bytes': 3,
+             'hash': md5('abc').hexdigest()},
+            {'name': '/c_segments/o/2', 'bytes': 2,
+             'hash': md5('de').hexdigest()}])
+        bodies = {('container', 'object'): manifest,
+                  ('c_segments', 'o/1'): ['abc'],
+                  ('c_segments', 'o/2'): ['de']}
+
+        def get_object(container, obj, **kwargs):
+            return {}, bodies[(container, obj)]
+        connection.return_value.head_object.return_value = {
+            'x-static-large-object': 'true', 'etag': 'etag'}
+        connection.return_value.get_object.side_effect = get_object
+
+        argv = ["", "download", "container", "object", "-o", self.tmpfile,
+                "--segment-threads", "2"]
+        swiftclient.shell.main(argv)
+        with open(self.tmpfile, 'rb') as fp:
+            self.assertEqual('abcde', fp.read())
+
+    @mock.patch('swiftclient.shell.Connection')
+    def test_download_resume(self, connection):
+        data = '0123456789'
+        part_file = self.tmpfile + '.part'
+        self.addCleanup(lambda: os.path.exists(part_file) and
+                        os.remove(part_file))
+        with open(part_file, 'wb') as fp:
+            fp.write(data[:4])
+        with open(part_file + '.json', 'w') as fp:
+            json.dump({'etag': md5(data).hexdigest(), 'last-modified': 'lm',
+                       'manifest': False}, fp)
+        connection.return_value.get_object.return_value = (
+            {'content-type': 'text/plain', 'content-length': '6',
+             'content-range': 'bytes 4-9/10', 'last-modified': 'lm',
+             'etag': md5(data).hexdigest()}, [data[4:]])
+
+        argv = ["", "download", "container", "object", "-o", self.tmpfile,
+                "--resume"]
+        swiftclient.shell.main(argv)
+        connection.return_value.get_object.assert_called_once_with(
+            'container', 'object', resp_chunk_size=65536,
+            headers={'Range': 'bytes=4-',
+                     'If-Match': md5(data).hexdigest()})
+        with open(self.tmpfile, 'rb') as fp:
+            self.assertEqual(data, fp.read())
+        self.assertFalse(os.path.exists(part_file))
+        self.assertFalse(os.path.exists(part_file + '.json'))
+
+    @mock.patch('swiftclient.shell.Connection')
+    def test_download_resume_changed(self, connection):
+        data = '0123456789'
+        part_file = self.tmpfile + '.part'
+        self.addCleanup(lambda: os.path.exists(part_file) and
+                        os.remove(part_file))
+        with open(part_file, 'wb') as fp:
+            fp.write('abcd')
+        with open(part_file + '.json', 'w') as fp:
+            json.dump({'etag': 'old', 'last-modified': 'lm',
+                       'manifest': False}, fp)
+        headers = {'content-type': 'text/plain', 'content-length': '10',
+                   'etag': md5(data).hexdigest()}
+        connection.return_value.get_object.side_effect = [
+            swiftclient.ClientException('changed', http_status=412),
+            (headers, [data])]
+
+        argv = ["", "download", "container", "object", "-o", self.tmpfile,
+                "--resume"]
+        swiftclient.shell.main(argv)
+        self.assertEqual(
+            [mock.call('container', 'object', resp_chunk_size=65536,
+                       headers={'Range': 'bytes=4-', 'If-Match': 'old'}),
+             mock.call('container', 'object', resp_chunk_size=65536,
+                       headers={})],
+            connection.return_value.get_object.call_args_list)
+        with open(self.tmpfile, 'rb') as fp:
+            self.assertEqual(data, fp.read())
+        self.assertFalse(os.path.exists(part_file + '.json'))
+
+    @mock.patch('swiftclient.shell.stdout')
+    @mock.patch('swiftclient.shell.Connection')
+    def test_download_stream_threads(self, connection, mock_stdout):
+        data = '0123456789'
+
+        def get_object(container, obj, headers=None):
+            start, end = headers['Range'][len('bytes='):].split('-')
+            return {}, data[int(start):int(end) + 1]
+        connection.return_value.head_object.return_value = {
+            'content-type': 'text/plain', 'content-length': '10',
+            'etag': md5(data).hexdigest()}
+        connection.return_value.get_object.side_effect = get_object
+
+        argv = ["", "download", "container", "object", "-o", "-",
+                "--stream-threads", "3", "--stream-range-size", "4"]
+        swiftclient.shell.main(argv)
+        self.assertEqual(
+            [mock.call('0123'), mock.call('4567'), mock.call('89')],
+            mock_stdout.write.call_args_list)
+        for call in connection.return_value.get_object.call_args_list:
+            self.assertEqual(md5(data).hexdigest(),
+                             call[1]['headers']['If-Match'])
+
+    @mock.patch('swiftclient.transfer.scandir', None)
+    @mock.patch('swiftclient.transfer.listdir')
     @mock.patch('swiftclient.shell.Connection')
     def test_upload(self, connection, listdir):
         connection.return_value.head_object.return_value = {
@@ -227,6 +452,64 @@ class TestShell(unittest.TestCase):
             headers={'x-object-manifest': mock.ANY,
             'x-object-meta-mtime': mock.ANY})
 
+    @mock.patch('swiftclient.shell.stdin')
+    @mock.patch('swiftclient.shell.Connection')
+    def test_upload_stdin(self, connection, mock_stdin):
+        chunks = ['12345', '67890', '1', '']
+        mock_stdin.read.side_effect = lambda size: chunks.pop(0)
+        connection.return_value.head_object.side_effect = \
+            swiftclient.ClientException('not found', http_status=404)
+        connection.return_value.put_object.return_value = 'etag'
+        argv = ["", "upload", "container", "-", "--object-name", "object",
+                "-S", "5"]
+        swiftclient.shell.main(argv)
+        connection.return_value.put_container.assert_any_call(
+            'container_segments')
+        put_calls = connection.return_value.put_object.call_args_list
+        self.assertEqual(4, len(put_calls))
+        manifest = put_calls[-1]
+        self.assertEqual(('container', 'object'), manifest[0][:2])
+        self.assertEqual('multipart-manifest=put',
+                         manifest[1]['query_string'])
+        self.assertEqual([5, 5, 1], [
+            s['size_bytes'] for s in json.loads(manifest[0][2])])
+
+        # an object name is required
+        argv = ["", "upload", "container", "-"]
+        connection.reset_mock()
+        try:
+            swiftclient.shell.main(argv)
+        except SystemExit:
+            # only if the error was counted before main() checked
+            pass
+        self.assertEqual([], connection.return_value.put_object.mock_calls)
+
+    @mock.patch('swiftclient.shell.Connection')
+    def test_upload_resume(self, connection):
+        with open(self.tmpfile, "wb") as fh:
+            fh.write('12345678901234567890')
+        prefix = '%s/slo/%f/20/10/' % (self.tmpfile.lstrip('/'),
+                                       os.path.getmtime(self.tmpfile))
+        connection.return_value.head_object.side_effect = \
+            swiftclient.ClientException('not found', http_status=404)
+        connection.return_value.get_container.return_value = (None, [
+            {'name': prefix + '00000000', 'bytes': 10,
+             'hash': md5('1234567890').hexdigest()},
+            {'name': prefix + '00000001', 'bytes': 10, 'hash': 'stale'}])
+        connection.return_value.put_object.return_value = 'etag'
+        argv = ["", "upload", "container", self.tmpfile, "-S", "10",
+                "--use-slo", "--resume"]
+        swiftclient.shell.main(argv)
+        connection.return_value.get_container.assert_called_once_with(
+            'container_segments', prefix=prefix, full_listing=True)
+        put_calls = connection.return_value.put_object.call_args_list
+        self.assertEqual([('container_segments', prefix + '00000001'),
+                          ('container', self.tmpfile.lstrip('/'))],
+                         [call[0][:2] for call in put_calls])
+        manifest = json.loads(put_calls[-1][0][2])
+        self.assertEqual([md5('1234567890').hexdigest(), 'etag'],
+                         [seg['etag'] for seg in manifest])
+
     @mock.patch('swiftclient.shell.Connection')
     def test_delete_account(self, connection):
         connection.return_value.get_account.side_effect = [
@@ -267,6 +550,92 @@ class TestShell(unittest.TestCase):
         connection.return_value.delete_object.assert_called_with(
             'container', 'object', query_string=None)
 
+    @mock.patch('swiftclient.shell.Connection')
+    def test_copy(self, connection):
+        connection.return_value.head_object.return_value = {}
+        argv = ["", "copy", "container", "object", "-d", "other/renamed"]
+        swiftclient.shell.main(argv)
+        connection.return_value.copy_object.assert_called_once_with(
+            'container', 'object', 'other', 'renamed', headers={})
+        self.assertFalse(connection.return_value.bulk_delete.called)
+        self.assertFalse(connection.return_value.delete_object.called)
+
+    @mock.patch('swiftclient.shell.Connection')
+    def test_move(self, connection):
+        connection.return_value.get_container.return_value = (None, [
+            {'name': 'a'}, {'name': 'b'}])
+        connection.return_value.head_object.return_value = {}
+        connection.return_value.get_capabilities.return_value = {
+            'bulk_delete': {'max_deletes_per_request': 10}}
+        connection.return_value.bulk_delete.return_value = {'Errors': []}
+        argv = ["", "move", "container", "--prefix", "p", "-d", "other",
+                "--object-threads", "1"]
+        swiftclient.shell.main(argv)
+        connection.return_value.get_container.assert_called_once_with(
+            'container', prefix='p', full_listing=True)
+        self.assertEqual(
+            [mock.call('container', 'a', 'other', 'a', headers={}),
+             mock.call('container', 'b', 'other', 'b', headers={})],
+            sorted(connection.return_value.copy_object.call_args_list))
+        args = connection.return_value.bulk_delete.call_args[0]
+        self.assertEqual('container', args[0])
+        self.assertEqual(['a', 'b'], sorted(args[1]))
+
+    @mock.patch('swiftclient.shell.Connection')
+    def test_migrate(self, connection):
+        data = 'abc'
+        connection.return_value._clone.return_value = connection.return_value
+        connection.return_value.get_object.return_value = (
+            {'content-length': '3', 'etag': md5(data).hexdigest(),
+             'x-object-meta-mtime': '1'}, [data])
+        connection.return_value.put_object.return_value = 'etag'
+        argv = ["", "migrate", "container", "object",
+                "--dest-auth", "http://dest/auth", "--dest-user", "u",
+                "--dest-key", "k", "--dest-container", "other"]
+        swiftclient.shell.main(argv)
+        self.assertTrue(mock.call('http://dest/auth', 'u', 'k', mock.ANY,
+                                  auth_version=mock.ANY, os_options=mock.ANY,
+                                  cacert=None, insecure=False,
+                                  ssl_compression=True)
+                        in connection.call_args_list)
+        connection.return_value.put_container.assert_any_call('other')
+        args, kwargs = connection.return_value.put_object.call_args
+        self.assertEqual(('other', 'object'), args[:2])
+        self.assertEqual({'x-object-meta-mtime': '1'}, kwargs['headers'])
+
+    @mock.patch('swiftclient.shell.migrate_object')
+    @mock.patch('swiftclient.shell.Connection')
+    def test_migrate_buffer_size(self, connection, migrate_object):
+        argv = ["", "migrate", "container", "object",
+                "--dest-auth", "http://dest/auth"]
+        swiftclient.shell.main(argv)
+        # 10 object threads with 4 segments in flight and 1 filling
+        self.assertEqual(1024 * 1024 * 1024 // 50,
+                         migrate_object.call_args[1]['segment_size'])
+        swiftclient.shell.main(argv + ["--buffer-size", "100000000",
+                                       "--object-threads", "1",
+                                       "--segment-threads", "1"])
+        self.assertEqual(50000000,
+                         migrate_object.call_args[1]['segment_size'])
+        swiftclient.shell.main(argv + ["--segment-size", "1000"])
+        self.assertEqual(1000, migrate_object.call_args[1]['segment_size'])
+
+    @mock.patch('swiftclient.shell.Connection')
+    def test_migrate_segments_share_dest_auth(self, connection):
+        data = 'abcdefg'
+        connection.return_value._clone.return_value = connection.return_value
+        connection.return_value.get_object.return_value = (
+            {'content-length': '7', 'etag': md5(data).hexdigest()}, [data])
+        connection.return_value.put_object.return_value = 'etag'
+        argv = ["", "migrate", "container", "object", "--segment-size", "2",
+                "--dest-auth", "http://dest/auth", "--dest-user", "u",
+                "--dest-key", "k"]
+        swiftclient.shell.main(argv)
+        self.assertEqual(5, connection.return_value.put_object.call_count)
+        self.assertEqual(1, len([
+            call for call in connection.call_args_list
+            if call[0][:1] == ('http://dest/auth',)]))
+
     @mock.patch('swiftclient.shell.Connection')
     def test_post_account(self, connection):
         argv = ["", "post"]
@@ -311,6 +680,228 @@ class TestShell(unittest.TestCase):
                 'Content-Type': 'text/plain',
                 'X-Object-Meta-Color': 'Blue'})
 
+    @mock.patch('swiftclient.shell.MultiThreadingManager._print')
+    @mock.patch('swiftclient.shell.Connection')
+    def test_stat_objects(self, connection, mock_print):
+        argv = ["", "stat", "container", "obj1", "obj2",
+                "--object-threads", "3"]
+        connection.return_value.url = 'http://127.0.0.1/v1/AUTH_account'
+        ops = []
+
+        def batch(op_iter, **kwargs):
+            ops.extend(op_iter)
+            return [
+                {'op': 'head', 'container': 'container', 'object': 'obj1',
+                 'success': True, 'result': {'content-length': 42}},
+                {'op': 'head', 'container': 'container', 'object': 'obj2',
+                 'success': False,
+                 'error': swiftclient.ClientException('', http_status=404)}]
+        connection.return_value.batch.side_effect = batch
+        try:
+            swiftclient.shell.main(argv)
+        except SystemExit:
+            pass
+        self.assertEqual(
+            [{'op': 'head', 'container': 'container', 'object': 'obj1',
+              'headers': None},
+             {'op': 'head', 'container': 'container', 'object': 'obj2',
+              'headers': None}], ops)
+        self.assertEqual({'concurrency': 3},
+                         connection.return_value.batch.call_args[1])
+        mock_print.assert_any_call('       Account: AUTH_account\n' +
+                                   '     Container: container\n' +
+                                   '        Object: obj1\n' +
+                                   'Content Length: 42')
+        self.assertFalse(connection.return_value.head_object.called)
+
+    @mock.patch('swiftclient.shell.Connection')
+    def test_post_prefix(self, connection):
+        argv = ["", "post", "container", "--prefix", "pre",
+                "--meta", "Color:Blue"]
+        connection.return_value.get_container.side_effect = [
+            [None, [{'name': 'pre1'}, {'name': 'pre2'}]], [None, []]]
+        ops = []
+
+        def batch(op_iter, **kwargs):
+            # the listing is read a page at a time as the batch takes ops
+            self.assertEqual(
+                0, connection.return_value.get_container.call_count)
+            ops.extend(op_iter)
+            return []
+        connection.return_value.batch.side_effect = batch
+        swiftclient.shell.main(argv)
+        self.assertEqual(
+            [mock.call('container', marker='', prefix='pre', delimiter=None),
+             mock.call('container', marker='pre2', prefix='pre',
+                       delimiter=None)],
+            connection.return_value.get_container.call_args_list)
+        headers = {'X-Object-Meta-Color': 'Blue'}
+        self.assertEqual(
+            [{'op': 'post', 'container': 'container', 'object': 'pre1',
+              'headers': headers},
+             {'op': 'post', 'container': 'container', 'object': 'pre2',
+              'headers': headers}], ops)
+        self.assertEqual({'concurrency': 10},
+                         connection.return_value.batch.call_args[1])
+        self.assertFalse(connection.return_value.post_container.called)
+
+    @mock.patch('swiftclient.shell.MultiThreadingManager.error')
+    @mock.patch('swiftclient.shell.Connection')
+    def test_stat_prefix_missing_container(self, connection, mock_error):
+        connection.return_value.get_container.side_effect = \
+            swiftclient.ClientException('', http_status=404)
+        connection.return_value.batch.side_effect = lambda ops, **kw: (
+            dict(op, success=True) for op in ops)
+        swiftclient.shell.main(["", "stat", "container", "--prefix", "p"])
+        mock_error.assert_called_once_with('Container %r not found',
+                                           'container')
+
+    @mock.patch('swiftclient.shell.Connection')
+    def test_prefix_needs_container(self, connection):
+        for command in ('stat', 'post'):
+            argv = ["", command, "--prefix", "p"]
+            self.assertRaises(SystemExit, swiftclient.shell.main, argv)
+        self.assertFalse(connection.return_value.head_account.called)
+        self.assertFalse(connection.return_value.post_account.called)
+
+    @mock.patch('swiftclient.shell.Connection')
+    def test_delete_partition(self, connection):
+        names = ['obj%d' % i for i in range(10)]
+        connection.return_value.get_container.side_effect = [
+            [None, [{'name': n} for n in names]],
+            [None, []],
+        ]
+        connection.return_value.head_object.return_value = {}
+        argv = ["", "delete", "container", "--partition", "1/3",
+                "--object-threads", "1"]
+        swiftclient.shell.main(argv)
+        self.assertEqual(
+            [mock.call('container', n, query_string=None) for n in names
+             if swiftclient.utils.in_partition(n, (1, 3))],
+            connection.return_value.delete_object.call_args_list)
+        self.assertFalse(connection.return_value.delete_container.called)
+
+        argv = ["", "delete", "container", "--partition", "3/3"]
+        self.assertRaises(SystemExit, swiftclient.shell.main, argv)
+
+    @mock.patch('swiftclient.shell.MultiThreadingManager._print')
+    @mock.patch('swiftclient.shell.Connection')
+    def test_list_partition(self, connection, mock_print):
+        names = ['obj%d' % i for i in range(10)]
+        connection.return_value.get_container.side_effect = [
+            [None, [{'name': n} for n in names]],
+            [None, []],
+        ]
+        argv = ["", "list", "container", "--partition", "0/2"]
+        swiftclient.shell.main(argv)
+        mock_print.assert_called_once_with('\n'.join(
+            n for n in names if swiftclient.utils.in_partition(n, (0, 2))))
+
+    @mock.patch('swiftclient.shell.st_download')
+    @mock.patch('swiftclient.shell.WorkerProcesses')
+    def test_processes(self, workers, st_download):
+        def _workers(func, count):
+            def wait(thread_manager):
+                for index in range(count):
+                    func(index, thread_manager)
+                return 0
+            return mock.Mock(wait=wait)
+
+        workers.side_effect = _workers
+        argv = ["", "--processes", "2", "download", "container", "-a"]
+        swiftclient.shell.main(argv)
+        self.assertEqual(
+            [mock.call(mock.ANY, ["--processes", "2", "download",
+                                  "--partition", "%d/2" % index,
+                                  "container", "-a"], mock.ANY)
+             for index in range(2)],
+            st_download.call_args_list)
+
+        workers.side_effect = None
+        workers.return_value.wait.return_value = 1
+        self.assertRaises(SystemExit, swiftclient.shell.main, argv)
+
+        workers.reset_mock()
+        for argv in (["", "--processes", "2", "list", "container"],
+                     ["", "--processes", "2", "download", "container",
+                      "--partition=0/2"]):
+            self.assertRaises(SystemExit, swiftclient.shell.main, argv)
+        self.assertFalse(workers.called)
+
+    @mock.patch('swiftclient.shell.MultiThreadingManager')
+    @mock.patch('swiftclient.shell.WorkerProcesses')
+    def test_processes_fork_before_printing(self, workers, manager):
+        order = []
+        workers.side_effect = lambda func, count: order.append('fork') or \
+            mock.Mock(**{'wait.return_value': 0})
+        manager.return_value.__enter__.side_effect = \
+            lambda: order.append('print') or manager.return_value
+        manager.return_value.error_count = 0
+        swiftclient.shell.main(["", "--processes", "2", "download", "c"])
+        self.assertEqual(['fork', 'print'], order)
+
+    @mock.patch('swiftclient.shell.Connection')
+    def test_rate_limits(self, connection):
+        connection.return_value.head_account.return_value = {}
+        argv = ["", "--upload-limit", "1000", "--request-limit", "50",
+                "--processes", "1", "stat"]
+        swiftclient.shell.main(argv)
+        kwargs = connection.call_args[1]
+        self.assertEqual(1000, kwargs['upload_limit'].rate)
+        self.assertEqual(50, kwargs['request_limit'].rate)
+        self.assertNotIn('download_limit', kwargs)
+        self.assertNotIn('retry_policy', kwargs)
+
+        argv = ["", "--adaptive-retries", "stat"]
+        swiftclient.shell.main(argv)
+        self.assertTrue(isinstance(connection.call_args[1]['retry_policy'],
+                                   swiftclient.retry.AdaptiveRetryPolicy))
+
+    @mock.patch('swiftclient.shell.Connection')
+    def test_timeouts(self, connection):
+        connection.return_value.head_account.return_value = {}
+        argv = ["", "--read-timeout", "30", "--min-speed", "1000", "stat"]
+        swiftclient.shell.main(argv)
+        kwargs = connection.call_args[1]
+        self.assertEqual((30, 1000, 30), (kwargs['read_timeout'],
+                                          kwargs['min_speed'],
+                                          kwargs['min_speed_period']))
+        self.assertNotIn('connect_timeout', kwargs)
+
+    @mock.patch('swiftclient.shell.Connection')
+    def test_endpoints(self, connection):
+        connection.return_value.head_account.return_value = {}
+        swiftclient.shell.main(["", "--endpoint", "http://a/v1/AUTH_t",
+                                "--endpoint", "http://b/v1/AUTH_t", "stat"])
+        pool = connection.call_args[1]['endpoints']
+        self.assertEqual(['http://a/v1/AUTH_t', 'http://b/v1/AUTH_t'],
+                         pool.urls)
+        swiftclient.shell.main(["", "--all-endpoints", "stat"])
+        self.assertTrue(connection.call_args[1]['endpoints'].discover)
+        swiftclient.shell.main(["", "stat"])
+        self.assertNotIn('endpoints', connection.call_args[1])
+
+    @mock.patch('swiftclient.shell.Connection')
+    def test_transport(self, connection):
+        connection.return_value.head_account.return_value = {}
+        swiftclient.shell.main(["", "--transport", "raw", "stat"])
+        self.assertEqual('raw', connection.call_args[1]['transport'])
+        swiftclient.shell.main(["", "stat"])
+        self.assertNotIn('transport', connection.call_args[1])
+
+    @mock.patch('swiftclient.shell.Connection')
+    def test_hedge_after(self, connection):
+        connection.return_value.head_account.return_value = {}
+        swiftclient.shell.main(["", "--hedge-after", "0.5", "stat"])
+        policy = connection.call_args[1]['hedge_policy']
+        self.assertEqual(0.5, policy.fixed_delay)
+        swiftclient.shell.main(["", "--hedge-after", "auto", "stat"])
+        policy = connection.call_args[1]['hedge_policy']
+        self.assertTrue(isinstance(policy, swiftclient.retry.HedgePolicy))
+        self.assertEqual(None, policy.fixed_delay)
+        self.assertRaises(SystemExit, swiftclient.shell.main,
+                          ["", "--hedge-after", "soon", "stat"])
+
     @mock.patch('swiftclient.shell.Connection')
     def test_capabilities(self, connection):
         argv = ["", "capabilities"]
@@ -14,6 +14,7 @@
 # limitations under the License.
 
 # TODO: More tests
+import json
 import logging
 
 try:
@@ -26,6 +27,7 @@ import socket
 import types
 import StringIO
 import testtools
+import threading
 import warnings
 from six.moves.urllib.parse import urlparse
 from six.moves import reload_module
@@ -34,6 +36,8 @@ from six.moves import reload_module
 from .utils import fake_http_connect, fake_get_keystoneclient_2_0
 
 from swiftclient import client as c
+import swiftclient.endpoints
+import swiftclient.retry
 import swiftclient.utils
 
 
@@ -370,6 +374,20 @@ class TestGetAuth(MockHttpTest):
         self.assertTrue(url.startswith("http"))
         self.assertTrue(token)
 
+    def test_auth_all_endpoints(self):
+        c.http_connection = self.fake_http_connection(200, auth_v1=True)
+        url, token = c.get_auth('http://www.test.com', 'asdf', 'asdf',
+                                all_endpoints=True)
+        self.assertEqual(['storageURL'], url)
+        with mock.patch('swiftclient.client.get_keystoneclient_2_0',
+                        return_value=(['http://a', 'http://b'], 'tok')) \
+                as mock_ks:
+            url, token = c.get_auth('http://www.test.com', 'asdf', 'asdf',
+                                    os_options={'tenant_name': 'asdf'},
+                                    auth_version='2.0', all_endpoints=True)
+        self.assertEqual(['http://a', 'http://b'], url)
+        self.assertTrue(mock_ks.call_args[1]['all_endpoints'])
+
     def test_auth_v2_no_endpoint(self):
         os_options = {'region_name': 'unknown_region',
                       'tenant_name': 'asdf'}
@@ -496,6 +514,13 @@ class TestHeadAccount(MockHttpTest):
             new_body = "[first 60 chars of response] " + body[0:60]
             self.assertEqual(e.__str__()[-89:], new_body)
 
+    def test_error_headers(self):
+        c.http_connection = self.fake_http_connection(
+            503, headers={'Retry-After': '7'})
+        exc = self.assertRaises(c.ClientException, c.head_account,
+                                'http://www.tests.com', 'asdf')
+        self.assertEqual('7', exc.http_response_headers['retry-after'])
+
 
 class TestGetContainer(MockHttpTest):
 
@@ -802,6 +827,66 @@ class TestDeleteObject(MockHttpTest):
                         query_string="hello=20")
 
 
+def mock_http_conn(status, body='', etag=None):
+    conn = mock.Mock()
+    resp = conn.getresponse.return_value
+    resp.status = status
+    resp.read.return_value = body
+    resp.getheader.side_effect = lambda k, d=None: etag if k == 'etag' else d
+    return urlparse('http://www.test.com/v1/AUTH_a'), conn
+
+
+class TestCopyObject(MockHttpTest):
+
+    def test_ok(self):
+        parsed, conn = mock_http_conn(201, etag='"abc"')
+        etag = c.copy_object('http://www.test.com/v1/AUTH_a', 'tok',
+                             'c 1', 'o', 'c2', 'o 2',
+                             headers={'X-Object-Meta-A': 'b'},
+                             http_conn=(parsed, conn))
+        self.assertEqual('abc', etag)
+        conn.request.assert_called_once_with(
+            'PUT', '/v1/AUTH_a/c2/o%202', '',
+            {'X-Auth-Token': 'tok', 'X-Copy-From': '/c%201/o',
+             'Content-Length': '0', 'X-Object-Meta-A': 'b'})
+
+    def test_server_error(self):
+        c.http_connection = self.fake_http_connection(500)
+        self.assertRaises(c.ClientException, c.copy_object,
+                          'http://www.test.com', 'asdf', 'c', 'o', 'c2', 'o')
+
+
+class TestBulkDelete(MockHttpTest):
+
+    def test_ok(self):
+        parsed, conn = mock_http_conn(200, body=json.dumps({
+            'Number Deleted': 1, 'Number Not Found': 0, 'Errors': [],
+            'Response Status': '200 OK'}))
+        result = c.bulk_delete('http://www.test.com/v1/AUTH_a', 'tok', 'c',
+                               ['o 1', 'o2'], http_conn=(parsed, conn))
+        self.assertEqual(1, result['Number Deleted'])
+        conn.request.assert_called_once_with(
+            'DELETE', '/v1/AUTH_a?bulk-delete', '/c/o%201\n/c/o2',
+            {'X-Auth-Token': 'tok', 'Content-Type': 'text/plain',
+             'Accept': 'application/json'})
+
+    def test_errors(self):
+        parsed, conn = mock_http_conn(200, body=json.dumps({
+            'Number Deleted': 0, 'Errors': [['/c/o', '409 Conflict']],
+            'Response Status': '400 Bad Request'}))
+        result = c.bulk_delete('http://www.test.com/v1/AUTH_a', 'tok', 'c',
+                               ['o'], http_conn=(parsed, conn))
+        self.assertEqual([['/c/o', '409 Conflict']], result['Errors'])
+
+    def test_failed(self):
+        parsed, conn = mock_http_conn(200, body=json.dumps({
+            'Errors': [], 'Response Status': '413 Request Entity Too Large'}))
+        exc = self.assertRaises(
+            c.ClientException, c.bulk_delete, 'http://www.test.com/v1/AUTH_a',
+            'tok', 'c', ['o'], http_conn=(parsed, conn))
+        self.assertEqual(413, exc.http_status)
+
+
 class TestGetCapabilities(MockHttpTest):
 
     def test_ok(self):
@@ -839,6 +924,150 @@ class TestHTTPConnection(MockHttpTest):
         conn = c.http_connection(u'http://www.test.com/', insecure=True)
         self.assertEquals(conn[1].requests_args['verify'], False)
 
+    def test_timeout(self):
+        conn = c.http_connection(u'http://www.test.com/')
+        self.assertNotIn('timeout', conn[1].requests_args)
+        conn = c.http_connection(u'http://www.test.com/', timeout=(5, 60))
+        self.assertEqual((5, 60), conn[1].requests_args['timeout'])
+
+        conn = c.Connection('http://www.test.com', 'asdf', 'asdf',
+                            preauthurl='http://www.test.com/v1/a',
+                            read_timeout=60)
+        self.assertEqual((None, 60),
+                         conn.http_connection()[1].requests_args['timeout'])
+        self.assertEqual(60, conn._clone().read_timeout)
+
+
+class TestRawHTTPConnection(MockHttpTest):
+
+    def _fake_request(self, conn, status=200, headers=None, body=b''):
+        calls = []
+        raw = mock.Mock(status=status, reason='OK',
+                        headers=headers or {})
+        raw.read.return_value = body
+
+        def fake_request(method, url, headers, body):
+            calls.append((method, url, headers, body))
+            return raw
+        conn._request = fake_request
+        return calls
+
+    def test_transport(self):
+        _junk, conn = c.http_connection(u'http://www.test.com/',
+                                        transport='raw')
+        self.assertTrue(isinstance(conn, c.RawHTTPConnection))
+        _junk, conn = c.http_connection(u'http://www.test.com/',
+                                        transport=c.RawHTTPConnection)
+        self.assertTrue(isinstance(conn, c.RawHTTPConnection))
+        self.assertRaises(KeyError, c.http_connection,
+                          u'http://www.test.com/', transport='bogus')
+
+        conn = c.Connection('http://www.test.com', 'asdf', 'asdf',
+                            preauthurl='http://www.test.com/v1/a',
+                            transport='raw')
+        self.assertTrue(isinstance(conn.http_connection()[1],
+                                   c.RawHTTPConnection))
+        self.assertEqual('raw', conn._clone().transport)
+
+    def test_request(self):
+        _junk, conn = c.http_connection(u'http://www.test.com/',
+                                        transport='raw')
+        calls = self._fake_request(conn, headers={'etag': 'abc'},
+                                   body=b'data')
+        conn.request('PUT', '/v1/a/c/o', b'data',
+                     {'X-Object-Meta-Name': u'\u2603'})
+        resp = conn.getresponse()
+        method, url, headers, body = calls[0]
+        self.assertEqual(('PUT', b'/v1/a/c/o', b'data'), (method, url, body))
+        self.assertEqual(u'\u2603'.encode('utf8'),
+                         headers['x-object-meta-name'])
+        self.assertTrue(headers['user-agent'].startswith(
+            'python-swiftclient-'))
+        self.assertEqual(200, resp.status)
+        self.assertEqual('abc', resp.getheader('etag'))
+        self.assertEqual([('etag', 'abc')], resp.getheaders())
+        self.assertEqual(b'data', resp.read())
+
+        conn.request('GET', '/', '', {'User-Agent': 'Me'})
+        self.assertEqual('Me', calls[1][2]['user-agent'])
+        self.assertEqual(None, calls[1][3])
+
+    def test_proxy(self):
+        _junk, conn = c.http_connection(u'http://www.test.com/',
+                                        proxy='http://localhost:8080',
+                                        transport='raw')
+        calls = self._fake_request(conn)
+        conn.request('HEAD', '/v1/a', '')
+        self.assertEqual(b'http://www.test.com/v1/a', calls[0][1])
+        self.assertEqual('www.test.com', calls[0][2]['host'])
+
+    def test_timeout(self):
+        _junk, conn = c.http_connection(u'http://www.test.com/',
+                                        timeout=(5, 60), transport='raw')
+        self.assertEqual(5, conn.pool.timeout.connect_timeout)
+        self.assertEqual(60, conn.pool.timeout.read_timeout)
+
+    def test_errors(self):
+        _junk, conn = c.http_connection(u'http://www.test.com/',
+                                        transport='raw')
+        urllib3 = c.urllib3
+        for err, expected in (
+                (urllib3.exceptions.ProtocolError('reset'),
+                 c.requests.exceptions.ConnectionError),
+                (urllib3.exceptions.ReadTimeoutError(None, '/', 'slow'),
+                 c.requests.exceptions.ReadTimeout),
+                (urllib3.exceptions.SSLError('bad cert'),
+                 c.requests.exceptions.SSLError)):
+            conn._request = mock.Mock(side_effect=err)
+            self.assertRaises(expected, conn.request, 'GET', '/')
+
+    def test_errors_old_urllib3(self):
+        # no NewConnectionError, nor requests' ConnectTimeout/ReadTimeout
+        _junk, conn = c.http_connection(u'http://www.test.com/',
+                                        transport='raw')
+        urllib3 = c.urllib3
+        timeout = c.requests.exceptions.Timeout
+        with mock.patch.multiple(
+                c, _Urllib3NewConnectionError=(
+                    urllib3.exceptions.ConnectTimeoutError),
+                _ConnectTimeout=timeout, _ReadTimeout=timeout):
+            for err, expected in (
+                    (urllib3.exceptions.ConnectTimeoutError('refused'),
+                     c.requests.exceptions.ConnectionError),
+                    (urllib3.exceptions.ReadTimeoutError(None, '/', 'slow'),
+                     timeout),
+                    (urllib3.exceptions.ProtocolError('reset'),
+                     c.requests.exceptions.ConnectionError)):
+                conn._request = mock.Mock(side_effect=err)
+                self.assertRaises(expected, conn.request, 'GET', '/')
+
+    def test_chunked_body(self):
+        _junk, conn = c.http_connection(u'http://www.test.com/',
+                                        transport='raw')
+        conn.pool = mock.Mock()
+        conn._request('PUT', '/', {'x': 'y'}, iter([b'ab', b'', b'cdef']))
+        kwargs = conn.pool.urlopen.call_args[1]
+        self.assertEqual(c._URLOPEN_CHUNKED, kwargs.get('chunked', False))
+
+        with mock.patch.object(c, '_URLOPEN_CHUNKED', False):
+            conn._request('PUT', '/', {'x': 'y'},
+                          iter([b'ab', b'', u'cdef']))
+            conn._request('PUT', '/', {}, b'data')
+        kwargs = conn.pool.urlopen.call_args_list[1][1]
+        self.assertFalse('chunked' in kwargs)
+        self.assertEqual({'x': 'y', 'transfer-encoding': 'chunked'},
+                         kwargs['headers'])
+        self.assertEqual(b'2\r\nab\r\n4\r\ncdef\r\n0\r\n\r\n',
+                         b''.join(kwargs['body']))
+        kwargs = conn.pool.urlopen.call_args_list[2][1]
+        self.assertEqual(({}, b'data'), (kwargs['headers'], kwargs['body']))
+
+    def test_files(self):
+        _junk, conn = c.http_connection(u'http://www.test.com/',
+                                        transport='raw')
+        self.assertRaises(c.ClientException, conn.putrequest, '/',
+                          files={'f': b'data'})
+
 
 class TestConnection(MockHttpTest):
 
@@ -966,12 +1195,14 @@ class TestConnection(MockHttpTest):
         c.http_connection = self.fake_http_connection(401)
 
         def get_auth(*args, **kwargs):
+            self.get_auth_called = True
+            c.http_connection = self.fake_http_connection(200)
             return 'http://www.new.com', 'new'
+        c.get_auth = get_auth
+        self.get_auth_called = False
 
         def swap_sleep(*args):
             self.swap_sleep_called = True
-            c.get_auth = get_auth
-            c.http_connection = self.fake_http_connection(200)
         c.sleep = swap_sleep
         self.swap_sleep_called = False
 
@@ -986,7 +1217,9 @@ class TestConnection(MockHttpTest):
 
         conn.head_account()
 
-        self.assertTrue(self.swap_sleep_called)
+        self.assertTrue(self.get_auth_called)
+        # a new token is fetched straight away
+        self.assertFalse(self.swap_sleep_called)
         self.assertEqual(conn.attempts, 2)
         self.assertEqual(conn.url, 'http://www.new.com')
         self.assertEqual(conn.token, 'new')
@@ -1092,6 +1325,579 @@ class TestConnection(MockHttpTest):
         finally:
             c.http_connection = orig_conn
 
+    def test_clone(self):
+        conn = c.Connection('http://www.example.com', 'asdf', 'asdf',
+                            retries=2, os_options={'region_name': 'r'},
+                            insecure=True, retry_on_ratelimit=True)
+        conn.url, conn.token = 'http://storage.example.com/v1/a', 'tok'
+        clone = conn._clone()
+        self.assertFalse(clone is conn)
+        self.assertEqual((conn.url, conn.token), (clone.url, clone.token))
+        self.assertEqual(2, clone.retries)
+        self.assertEqual({'region_name': 'r'}, clone.os_options)
+        self.assertFalse(clone.os_options is conn.os_options)
+        self.assertTrue(clone.insecure)
+        self.assertTrue(clone.retry_on_ratelimit)
+        self.assertEqual(None, clone.http_conn)
+
+    def test_upload_stream(self):
+        conn = c.Connection('http://www.example.com', 'asdf', 'asdf')
+        contents = StringIO.StringIO('data')
+        with mock.patch('swiftclient.transfer.upload_stream') as upload:
+            upload.return_value = 'etag'
+            self.assertEqual('etag', conn.upload_stream(
+                'c', 'o', contents, segment_size=2, segment_threads=3))
+        upload.assert_called_once_with(
+            conn, 'c', 'o', contents, segment_size=2,
+            segment_container=None, segment_threads=3, headers=None,
+            content_type=None, connection_maker=conn._clone)
+
+    def test_open_object(self):
+        conn = c.Connection('http://www.example.com', 'asdf', 'asdf')
+        with mock.patch('swiftclient.objectio.ObjectReader') as reader:
+            self.assertEqual(reader.return_value,
+                             conn.open_object('c', 'o', block_size=10))
+        reader.assert_called_once_with(
+            conn, 'c', 'o', block_size=10, cache_size=32 * 1024 * 1024,
+            readahead=4, connection_maker=conn._clone, headers=None)
+
+    def test_create_object(self):
+        conn = c.Connection('http://www.example.com', 'asdf', 'asdf')
+        with mock.patch('swiftclient.objectio.ObjectWriter') as writer:
+            self.assertEqual(writer.return_value,
+                             conn.create_object('c', 'o', segment_size=10))
+        writer.assert_called_once_with(
+            conn, 'c', 'o', segment_size=10, segment_container=None,
+            segment_threads=4, headers=None, content_type=None,
+            connection_maker=conn._clone)
+
+    def _batch_conn(self):
+        conn = c.Connection('http://www.example.com', 'asdf', 'asdf')
+        clone = mock.Mock()
+        conn._clone = lambda: clone
+        release = threading.Event()
+
+        def head_object(container, obj):
+            if obj == 'missing':
+                raise c.ClientException('Object HEAD failed',
+                                        http_status=404)
+            if obj == 'slow':
+                release.wait()
+            return {'x-object-meta-name': obj}
+        clone.head_object.side_effect = head_object
+        return conn, clone, release
+
+    def test_batch_ordered(self):
+        conn, clone, release = self._batch_conn()
+        release.set()
+        ops = ({'op': 'head', 'container': 'c', 'object': name}
+               for name in ['slow', 'missing', 'a', 'b'])
+        results = list(conn.batch(ops, concurrency=4))
+        self.assertEqual([0, 1, 2, 3], [r['index'] for r in results])
+        self.assertEqual([True, False, True, True],
+                         [r['success'] for r in results])
+        self.assertEqual({'x-object-meta-name': 'slow'},
+                         results[0]['result'])
+        self.assertEqual(404, results[1]['error'].http_status)
+        self.assertEqual('missing', results[1]['object'])
+
+    def test_batch_completion_order(self):
+        conn, clone, release = self._batch_conn()
+        ops = [{'op': 'head', 'container': 'c', 'object': name}
+               for name in ['slow', 'a']]
+        results = conn.batch(ops, concurrency=2, ordered=False)
+        self.assertEqual('a', next(results)['object'])
+        release.set()
+        self.assertEqual(['slow'], [r['object'] for r in results])
+
+    def test_batch_shared_pool(self):
+        conn, clone, release = self._batch_conn()
+        release.set()
+        made = []
+
+        def connection_maker():
+            made.append(clone)
+            return clone
+        pool = c.ConnectionThreadPool(connection_maker, 2)
+        self.addCleanup(pool.shutdown)
+        for names in (['a', 'b', 'c'], ['d', 'e']):
+            ops = [{'op': 'head', 'container': 'c', 'object': name}
+                   for name in names]
+            results = list(conn.batch(ops, concurrency=2, pool=pool))
+            self.assertEqual(names, [r['object'] for r in results])
+        self.assertTrue(len(made) <= 2)
+
+    def test_batch_ops(self):
+        conn, clone, release = self._batch_conn()
+        clone.put_object.return_value = 'etag'
+        ops = [{'op': 'post', 'container': 'c', 'object': 'o',
+                'headers': {'x-object-meta-k': 'v'}},
+               {'op': 'delete', 'container': 'c'},
+               {'op': 'put', 'container': 'c', 'object': 'o',
+                'contents': 'data'},
+               {'op': 'copy', 'container': 'c', 'object': 'o'}]
+        results = list(conn.batch(ops, concurrency=1))
+        clone.post_object.assert_called_once_with(
+            'c', 'o', {'x-object-meta-k': 'v'})
+        clone.delete_container.assert_called_once_with('c')
+        clone.put_object.assert_called_once_with(
+            'c', 'o', 'data', content_type=None, headers={})
+        self.assertEqual('etag', results[2]['result'])
+        self.assertFalse(results[3]['success'])
+        self.assertTrue(isinstance(results[3]['error'], ValueError))
+
+
+class TestRetryBody(testtools.TestCase):
+
+    def setUp(self):
+        super(TestRetryBody, self).setUp()
+        self.conn = c.Connection('http://www.example.com', 'asdf', 'asdf',
+                                 retries=2, starting_backoff=.0001,
+                                 preauthurl='http://www.example.com/v1/a',
+                                 preauthtoken='tok')
+        self.conn.http_connection = mock.Mock(return_value='http_conn')
+        self.headers = {'etag': 'abc', 'content-length': '6'}
+        self.requests = []
+
+    def _broken(self, chunks):
+        for chunk in chunks:
+            yield chunk
+        raise socket.error('reset')
+
+    def _get_object(self, bodies, headers=None):
+        def get_object(url, token, container, name, headers=None, **kwargs):
+            self.requests.append(headers)
+            body, resp_headers = bodies.pop(0)
+            return dict(resp_headers or self.headers), body
+        return mock.patch('swiftclient.client.get_object',
+                          side_effect=get_object)
+
+    def test_resumes_after_error(self):
+        bodies = [(self._broken(['ab']), None),
+                  (iter(['cd', 'ef']), {'etag': 'abc',
+                                        'content-range': 'bytes 2-5/6'})]
+        with self._get_object(bodies):
+            headers, body = self.conn.get_object('c', 'o', resp_chunk_size=2)
+            self.assertEqual('abcdef', ''.join(body))
+        self.assertEqual([None, {'Range': 'bytes=2-', 'If-Match': 'abc'}],
+                         self.requests)
+
+    def test_resumes_short_body(self):
+        bodies = [(iter(['abcd']), None),
+                  (iter(['ef']), {'etag': 'abc',
+                                  'content-range': 'bytes 4-5/6'})]
+        with self._get_object(bodies):
+            headers, body = self.conn.get_object(
+                'c', 'o', resp_chunk_size=4, headers={'X-Foo': 'bar'})
+            self.assertEqual('abcdef', ''.join(body))
+        self.assertEqual([{'X-Foo': 'bar'},
+                          {'X-Foo': 'bar', 'Range': 'bytes=4-',
+                           'If-Match': 'abc'}], self.requests)
+
+    def test_whole_object_resent(self):
+        bodies = [(self._broken(['abc']), None),
+                  (iter(['ab', 'cdef']), None)]
+        with self._get_object(bodies):
+            headers, body = self.conn.get_object('c', 'o', resp_chunk_size=2)
+            self.assertEqual('abcdef', ''.join(body))
+
+    def test_manifest_changed(self):
+        new_body = mock.Mock()
+        bodies = [(self._broken(['ab']), {'etag': 'abc',
+                                          'content-length': '6',
+                                          'x-static-large-object': 'True'}),
+                  (new_body, {'etag': 'new',
+                              'content-range': 'bytes 2-5/6'})]
+        with self._get_object(bodies):
+            headers, body = self.conn.get_object('c', 'o', resp_chunk_size=2)
+            self.assertEqual('ab', next(body))
+            self.assertRaises(c.ClientException, next, body)
+        self.assertEqual({'Range': 'bytes=2-'}, self.requests[1])
+        new_body.close.assert_called_once_with()
+
+    def test_close(self):
+        class Body(object):
+            def __init__(self, chunks):
+                self.chunks = iter(chunks)
+                self.close = mock.Mock()
+
+            def next(self):
+                return next(self.chunks)
+            __next__ = next
+
+        first = Body(self._broken([]))
+        second = Body(['ab', 'cd'])
+        bodies = [(first, None),
+                  (second, {'etag': 'abc', 'content-range': 'bytes 0-5/6'})]
+        with self._get_object(bodies):
+            headers, body = self.conn.get_object('c', 'o', resp_chunk_size=2)
+            self.assertEqual('ab', next(body))
+            # the broken response was released before resuming
+            first.close.assert_called_once_with()
+            body.close()
+        second.close.assert_called_once_with()
+
+    def test_gives_up(self):
+        bodies = [(self._broken(['a']), None), (self._broken(['b']), None),
+                  (self._broken(['c']), None)]
+        with self._get_object(bodies):
+            headers, body = self.conn.get_object('c', 'o', resp_chunk_size=2)
+            self.assertRaises(socket.error, list, body)
+        self.assertEqual(3, len(self.requests))
+
+    def test_not_wrapped(self):
+        body = iter(['ab'])
+        with self._get_object([(body, None), (body, None)]):
+            self.assertTrue(self.conn.get_object(
+                'c', 'o', resp_chunk_size=2,
+                headers={'range': 'bytes=0-1'})[1] is body)
+            self.assertTrue(self.conn.get_object(
+                'c', 'o', resp_chunk_size=2,
+                query_string='multipart-manifest=get')[1] is body)
+
+
+class TestWatchdog(testtools.TestCase):
+
+    def setUp(self):
+        super(TestWatchdog, self).setUp()
+        self.now = 0
+        patcher = mock.patch('swiftclient.client.time', lambda: self.now)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.conn = c.Connection('http://www.example.com', 'asdf', 'asdf',
+                                 retries=2, starting_backoff=.0001,
+                                 preauthurl='http://www.example.com/v1/a',
+                                 preauthtoken='tok', min_speed=10,
+                                 min_speed_period=1)
+        self.conn.http_connection = mock.Mock(return_value='http_conn')
+
+    def test_watchdog(self):
+        watchdog = c._Watchdog(10, 5)
+        watchdog.update(30, 2)
+        self.assertRaises(socket.timeout, watchdog.update, 10, 3)
+        watchdog.reset()
+        watchdog.update(100, 6)
+        watchdog.update(1, 1)
+        self.assertEqual((1, 1), (watchdog.bytes, watchdog.seconds))
+
+    def _chunks(self, chunks):
+        for chunk, seconds in chunks:
+            self.now += seconds
+            yield chunk
+
+    def test_get_resumes_stalled(self):
+        bodies = [self._chunks([('ab', 0), ('cd', 2)]),
+                  self._chunks([('cdef', 0)])]
+        requests = []
+
+        def get_object(url, token, container, name, headers=None, **kwargs):
+            requests.append(headers)
+            resp_headers = {'etag': 'abc', 'content-length': '6'}
+            if headers:
+                resp_headers['content-range'] = 'bytes 2-5/6'
+            return resp_headers, bodies.pop(0)
+
+        with mock.patch('swiftclient.client.get_object',
+                        side_effect=get_object):
+            headers, body = self.conn.get_object('c', 'o', resp_chunk_size=2)
+            self.assertEqual('ab', next(body))
+            # the 2 bytes/s of the first response are too slow
+            self.assertEqual('cdef', ''.join(body))
+        self.assertEqual([None, {'Range': 'bytes=2-', 'If-Match': 'abc'}],
+                         requests)
+
+    def test_get_not_resumable(self):
+        with mock.patch('swiftclient.client.get_object',
+                        return_value=({}, self._chunks([('ab', 1)]))):
+            headers, body = self.conn.get_object(
+                'c', 'o', resp_chunk_size=2, headers={'Range': 'bytes=0-3'})
+            self.assertRaises(socket.timeout, list, body)
+
+    def test_put_retries_stalled(self):
+        attempts = []
+
+        def put_object(url, token, container, name, contents, **kwargs):
+            attempts.append(contents.read(2))
+            self.now += 5 if len(attempts) == 1 else 0
+            return attempts[-1] + contents.read()
+
+        contents = StringIO.StringIO('abcdef')
+        with mock.patch('swiftclient.client.put_object',
+                        side_effect=put_object):
+            self.assertEqual('abcdef', self.conn.put_object('c', 'o',
+                                                            contents))
+        self.assertEqual(['ab', 'ab'], attempts)
+
+
+class TestRateLimits(testtools.TestCase):
+
+    def setUp(self):
+        super(TestRateLimits, self).setUp()
+        self.buckets = dict((name, mock.Mock()) for name in (
+            'upload_limit', 'download_limit', 'request_limit'))
+        self.conn = c.Connection('http://www.example.com', 'asdf', 'asdf',
+                                 preauthurl='http://www.example.com/v1/a',
+                                 preauthtoken='tok', **self.buckets)
+        self.conn.http_connection = mock.Mock(return_value='http_conn')
+
+    def _taken(self, name):
+        return [call[0][0] for call in
+                self.buckets[name].take.call_args_list]
+
+    def test_download(self):
+        with mock.patch('swiftclient.client.get_object',
+                        return_value=({}, iter(['ab', 'cde']))):
+            headers, body = self.conn.get_object('c', 'o', resp_chunk_size=3)
+            self.assertEqual([], self._taken('download_limit'))
+            self.assertEqual('abcde', ''.join(body))
+        with mock.patch('swiftclient.client.get_object',
+                        return_value=({}, 'abcd')):
+            self.conn.get_object('c', 'o')
+        self.assertEqual([2, 3, 4], self._taken('download_limit'))
+        self.assertEqual(2, self.buckets['request_limit'].take.call_count)
+        self.assertFalse(self.buckets['upload_limit'].take.called)
+
+    def test_upload(self):
+        def put_object(url, token, container, name, contents, **kwargs):
+            if hasattr(contents, 'read'):
+                return ''.join(iter(lambda: contents.read(2), ''))
+            return ''.join(contents)
+
+        with mock.patch('swiftclient.client.put_object',
+                        side_effect=put_object):
+            self.assertEqual('abcde', self.conn.put_object(
+                'c', 'o', StringIO.StringIO('abcde')))
+            self.assertEqual('xyz', self.conn.put_object('c', 'o', 'xyz'))
+            self.assertEqual('abc', self.conn.put_object(
+                'c', 'o', iter(['ab', 'c'])))
+        self.assertEqual([2, 2, 1, 0, 3, 2, 1], self._taken('upload_limit'))
+        self.assertEqual(3, self.buckets['request_limit'].take.call_count)
+
+    def test_upload_strings(self):
+        sent = []
+
+        def put_object(url, token, container, name, contents, **kwargs):
+            sent.append(contents)
+        with mock.patch('swiftclient.client.put_object',
+                        side_effect=put_object):
+            self.conn.put_object('c', 'o', b'data')
+            self.conn.put_object('c', 'o', u'\u2603x')
+        # strings are sent whole, not iterated a character at a time
+        self.assertEqual([b'data', u'\u2603x'], sent)
+        self.assertEqual([4, 4], self._taken('upload_limit'))
+
+    def test_clone_shares_buckets(self):
+        clone = self.conn._clone()
+        for name, bucket in self.buckets.items():
+            self.assertTrue(getattr(clone, name) is bucket)
+
+
+class TestRetryPolicy(testtools.TestCase):
+
+    def setUp(self):
+        super(TestRetryPolicy, self).setUp()
+        self.policy = mock.Mock(spec=swiftclient.retry.RetryPolicy)
+        self.policy.wait.return_value = 0
+        self.policy.should_retry.return_value = True
+        self.policy.backoff.side_effect = [2, 3, None]
+        self.conn = c.Connection('http://www.example.com', 'asdf', 'asdf',
+                                 preauthurl='http://www.example.com/v1/a',
+                                 preauthtoken='tok',
+                                 retry_policy=self.policy)
+        self.conn.http_connection = mock.Mock(return_value='http_conn')
+
+    @mock.patch('swiftclient.client.sleep')
+    def test_policy(self, mock_sleep):
+        err = c.ClientException('Account HEAD failed', http_status=429,
+                                http_response_headers={'retry-after': '2'})
+        with mock.patch('swiftclient.client.head_account',
+                        side_effect=[err, socket.error(), {}]):
+            self.assertEqual({}, self.conn.head_account())
+        self.assertEqual([mock.call(1, None, err), mock.call(2, 2, mock.ANY)],
+                         self.policy.backoff.call_args_list)
+        self.assertEqual([mock.call(2), mock.call(3)],
+                         mock_sleep.call_args_list)
+        self.assertEqual([mock.call(False), mock.call(False),
+                          mock.call(True)], self.policy.record.call_args_list)
+        self.assertEqual(3, self.policy.wait.call_count)
+        self.assertTrue(self.conn._clone().retry_policy is self.policy)
+
+    @mock.patch('swiftclient.client.sleep')
+    def test_policy_gives_up(self, mock_sleep):
+        self.policy.backoff.side_effect = [None]
+        err = c.ClientException('Account HEAD failed', http_status=503)
+        with mock.patch('swiftclient.client.head_account', side_effect=err):
+            self.assertRaises(c.ClientException, self.conn.head_account)
+        self.assertEqual(1, self.conn.attempts)
+        self.assertFalse(mock_sleep.called)
+
+        self.policy.should_retry.return_value = False
+        with mock.patch('swiftclient.client.head_account', side_effect=err):
+            self.assertRaises(c.ClientException, self.conn.head_account)
+        self.assertEqual(1, self.policy.backoff.call_count)
+
+    @mock.patch('swiftclient.client.sleep')
+    def test_reauth_skips_budget(self, mock_sleep):
+        policy = swiftclient.retry.AdaptiveRetryPolicy(budget=0)
+        self.conn.retry_policy = policy
+        self.conn.get_auth = mock.Mock(
+            return_value=('http://www.example.com/v1/a', 'new'))
+        err = c.ClientException('Account HEAD failed', http_status=401)
+        with mock.patch('swiftclient.client.head_account',
+                        side_effect=[err, {}]) as head:
+            self.assertEqual({}, self.conn.head_account())
+        self.assertEqual('new', head.call_args[0][1])
+        self.assertEqual(2, self.conn.attempts)
+        self.assertFalse(mock_sleep.called)
+
+        # a spent budget still stops other retries
+        err = c.ClientException('Account HEAD failed', http_status=503)
+        with mock.patch('swiftclient.client.head_account', side_effect=err):
+            self.assertRaises(c.ClientException, self.conn.head_account)
+        self.assertEqual(1, self.conn.attempts)
+
+    @mock.patch('swiftclient.client.sleep')
+    def test_breaker_wait(self, mock_sleep):
+        self.policy.wait.return_value = 5
+        with mock.patch('swiftclient.client.head_account', return_value={}):
+            self.conn.head_account()
+        mock_sleep.assert_called_once_with(5)
+
+
+class TestHedging(testtools.TestCase):
+
+    def setUp(self):
+        super(TestHedging, self).setUp()
+        patcher = mock.patch.object(c.Connection, 'http_connection',
+                                    return_value='http_conn')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.release = threading.Event()
+        self.addCleanup(self.release.set)
+        self.calls = []
+
+    def _conn(self, policy):
+        return c.Connection('http://www.example.com', 'asdf', 'asdf',
+                            preauthurl='http://www.example.com/v1/a',
+                            preauthtoken='tok', hedge_policy=policy)
+
+    def _head_account(self, url, token, http_conn):
+        self.calls.append(url)
+        if len(self.calls) == 1:
+            self.release.wait(5)
+            return {'answer': 'slow'}
+        return {'answer': 'fast'}
+
+    def test_slow_request_hedged(self):
+        policy = swiftclient.retry.HedgePolicy(delay=0.01)
+        conn = self._conn(policy)
+        with mock.patch('swiftclient.client.head_account',
+                        side_effect=self._head_account):
+            self.assertEqual({'answer': 'fast'}, conn.head_account())
+        self.assertEqual(2, len(self.calls))
+        self.assertEqual(1, conn.attempts)
+        # the first copy never answered, so its latency is not known yet
+        self.assertEqual(0, len(policy._latencies))
+        conn.close()
+
+    def test_not_hedged(self):
+        policy = swiftclient.retry.HedgePolicy(min_samples=1)
+        conn = self._conn(policy)
+        self.release.set()
+        with mock.patch('swiftclient.client.head_account',
+                        side_effect=self._head_account):
+            # no latencies known yet, so the request is made directly
+            self.assertEqual(None, policy.delay())
+            self.assertEqual({'answer': 'slow'}, conn.head_account())
+        self.assertEqual(1, len(self.calls))
+        self.assertEqual([], conn._spares)
+        self.assertEqual(1, len(policy._latencies))
+        self.assertNotEqual(None, policy.delay())
+
+    def test_errors(self):
+        conn = self._conn(swiftclient.retry.HedgePolicy(delay=5))
+        conn.retries = 0
+        err = c.ClientException('Account HEAD failed', http_status=404)
+        with mock.patch('swiftclient.client.head_account', side_effect=err):
+            self.assertRaises(c.ClientException, conn.head_account)
+        self.assertEqual(1, conn.attempts)
+
+
+class TestEndpoints(testtools.TestCase):
+
+    urls = ['http://a/v1/AUTH_test', 'http://b/v1/AUTH_test']
+
+    def setUp(self):
+        super(TestEndpoints, self).setUp()
+        patcher = mock.patch.object(
+            c.Connection, 'http_connection',
+            side_effect=lambda url=None: ('parsed', url))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.calls = []
+
+    def _head_account(self, url, token, http_conn):
+        self.calls.append((url, http_conn))
+        if url == self.urls[0]:
+            raise socket.error()
+        return {}
+
+    @mock.patch('swiftclient.client.sleep')
+    def test_failover(self, mock_sleep):
+        pool = swiftclient.endpoints.EndpointPool(self.urls, max_failures=1)
+        conn = c.Connection('http://auth', 'asdf', 'asdf',
+                            preauthurl='http://vip/v1/AUTH_test',
+                            preauthtoken='tok', endpoints=pool)
+        with mock.patch('swiftclient.client.head_account',
+                        side_effect=self._head_account):
+            conn.head_account()
+            conn.head_account()
+        self.assertEqual([(url, ('parsed', url)) for url in self.urls] +
+                         [(self.urls[1], ('parsed', self.urls[1]))],
+                         self.calls)
+        self.assertEqual(1, mock_sleep.call_count)
+        self.assertEqual(self.urls[1], pool.choose())
+        self.assertTrue(conn._clone().endpoints is pool)
+
+    def test_streamed_body_keeps_endpoint_busy(self):
+        pool = swiftclient.endpoints.EndpointPool(self.urls)
+        conn = c.Connection('http://auth', 'asdf', 'asdf',
+                            preauthurl='http://vip/v1/AUTH_test',
+                            preauthtoken='tok', endpoints=pool, retries=0)
+
+        def get_object(url, token, container, obj, **kwargs):
+            return {}, iter([b'ab', b'cd'])
+        outstanding = lambda: [e.outstanding for e in pool._endpoints]
+        with mock.patch('swiftclient.client.get_object',
+                        side_effect=get_object):
+            _junk, body = conn.get_object('c', 'o', resp_chunk_size=2)
+            self.assertEqual(1, sum(outstanding()))
+            self.assertEqual(b'ab', next(body))
+            self.assertEqual(1, sum(outstanding()))
+            self.assertEqual([b'cd'], list(body))
+            self.assertEqual(0, sum(outstanding()))
+
+            _junk, body = conn.get_object('c', 'o', resp_chunk_size=2)
+            self.assertEqual(1, sum(outstanding()))
+            body.close()
+            self.assertEqual(0, sum(outstanding()))
+
+            conn.get_object('c', 'o')
+            self.assertEqual(0, sum(outstanding()))
+
+    def test_discover(self):
+        pool = swiftclient.endpoints.EndpointPool()
+        conn = c.Connection('http://auth', 'asdf', 'asdf', endpoints=pool)
+        with mock.patch('swiftclient.client.get_auth',
+                        return_value=(self.urls, 'tok')) as mock_auth:
+            with mock.patch('swiftclient.client.head_account',
+                            return_value={}) as mock_head:
+                conn.head_account()
+        self.assertTrue(mock_auth.call_args[1]['all_endpoints'])
+        self.assertEqual((self.urls[0], 'tok'), (conn.url, conn.token))
+        self.assertEqual(self.urls, pool.urls)
+        self.assertEqual(self.urls[0], mock_head.call_args[0][0])
+
 
 class TestLogging(MockHttpTest):
     """
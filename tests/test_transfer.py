@@ -0,0 +1,835 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import errno
+import json
+import os
+import random
+import shutil
+import tempfile
+import threading
+import time
+from hashlib import md5
+
+try:
+    from unittest import mock
+except ImportError:
+    import mock
+
+import six
+import testtools
+
+from swiftclient import transfer
+from swiftclient.exceptions import ClientException
+from swiftclient.multithreading import ConnectionThreadPool
+
+
+class TestGetManifestSegments(testtools.TestCase):
+
+    def test_not_a_manifest(self):
+        conn = mock.Mock()
+        self.assertEqual(None, transfer.get_manifest_segments(
+            conn, 'c', 'o', {'content-length': '3'}))
+        self.assertEqual([], conn.method_calls)
+
+    def test_slo(self):
+        conn = mock.Mock()
+        conn.get_object.return_value = ({}, json.dumps([
+            {'name': '/c_segments/o/1', 'bytes': 3, 'hash': 'a'},
+            {'name': '/c_segments/o/2', 'bytes': 2, 'hash': 'b'},
+        ]))
+        segments = transfer.get_manifest_segments(
+            conn, 'c', 'o', {'x-static-large-object': 'True'})
+        conn.get_object.assert_called_once_with(
+            'c', 'o', query_string='multipart-manifest=get')
+        self.assertEqual([
+            {'container': 'c_segments', 'name': 'o/1', 'bytes': 3,
+             'etag': 'a', 'offset': 0},
+            {'container': 'c_segments', 'name': 'o/2', 'bytes': 2,
+             'etag': 'b', 'offset': 3},
+        ], segments)
+
+    def test_nested_slo(self):
+        manifests = {
+            'o': [{'name': '/c_segments/sub', 'bytes': 5, 'hash': 'x',
+                   'sub_slo': True},
+                  {'name': '/c_segments/o/2', 'bytes': 2, 'hash': 'b'}],
+            'sub': [{'name': '/c_segments/sub/1', 'bytes': 5, 'hash': 'a'}],
+        }
+
+        def get_object(container, obj, query_string=None):
+            return {}, json.dumps(manifests[obj])
+        conn = mock.Mock()
+        conn.get_object.side_effect = get_object
+        segments = transfer.get_manifest_segments(
+            conn, 'c', 'o', {'x-static-large-object': 'true'})
+        self.assertEqual([('sub/1', 0), ('o/2', 5)],
+                         [(s['name'], s['offset']) for s in segments])
+
+    def test_dlo(self):
+        conn = mock.Mock()
+        conn.get_container.return_value = ({}, [
+            {'name': 'o/1', 'bytes': 4, 'hash': 'a'},
+            {'name': 'o/2', 'bytes': 1, 'hash': 'b'},
+        ])
+        segments = transfer.get_manifest_segments(
+            conn, 'c', 'o', {'x-object-manifest': 'c%20segs/o/'})
+        conn.get_container.assert_called_once_with(
+            'c segs', prefix='o/', full_listing=True)
+        self.assertEqual([
+            {'container': 'c segs', 'name': 'o/1', 'bytes': 4,
+             'etag': 'a', 'offset': 0},
+            {'container': 'c segs', 'name': 'o/2', 'bytes': 1,
+             'etag': 'b', 'offset': 4},
+        ], segments)
+
+
+class TestDownloadSegment(testtools.TestCase):
+
+    def setUp(self):
+        super(TestDownloadSegment, self).setUp()
+        self.tmpfile = tempfile.NamedTemporaryFile()
+        self.tmpfile.write(b'.' * 10)
+        self.tmpfile.flush()
+
+    def tearDown(self):
+        self.tmpfile.close()
+        super(TestDownloadSegment, self).tearDown()
+
+    def _segment(self, data, etag=None):
+        return {'container': 'c_segments', 'name': 'o/1', 'offset': 4,
+                'bytes': len(data),
+                'etag': etag or md5(data).hexdigest()}
+
+    def test_writes_at_offset(self):
+        conn = mock.Mock()
+        conn.get_object.return_value = ({}, iter([b'ab', b'c']))
+        self.assertEqual(3, transfer.download_segment(
+            conn, self._segment(b'abc'), self.tmpfile.name, chunk_size=2))
+        conn.get_object.assert_called_once_with(
+            'c_segments', 'o/1', resp_chunk_size=2)
+        with open(self.tmpfile.name, 'rb') as fp:
+            self.assertEqual(b'....abc...', fp.read())
+
+    def test_bad_etag(self):
+        conn = mock.Mock()
+        conn.get_object.return_value = ({}, iter([b'abc']))
+        exc = self.assertRaises(
+            ClientException, transfer.download_segment, conn,
+            self._segment(b'abc', etag='nope'), self.tmpfile.name)
+        self.assertTrue('md5sum != etag' in str(exc))
+
+    def test_short_read(self):
+        conn = mock.Mock()
+        conn.get_object.return_value = ({}, iter([b'ab']))
+        exc = self.assertRaises(
+            ClientException, transfer.download_segment, conn,
+            self._segment(b'abc'), self.tmpfile.name)
+        self.assertTrue('read_length != size_bytes' in str(exc))
+
+
+class TestIterObjectRanges(testtools.TestCase):
+
+    def setUp(self):
+        super(TestIterObjectRanges, self).setUp()
+        self.data = b''.join(chr(ord('a') + i % 26).encode('ascii')
+                             for i in range(1000))
+        self.lock = threading.Lock()
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.requests = []
+
+    def connection_maker(self):
+        conn = mock.Mock()
+
+        def get_object(container, obj, headers=None):
+            with self.lock:
+                self.requests.append(headers)
+                self.in_flight += 1
+                self.max_in_flight = max(self.in_flight, self.max_in_flight)
+            time.sleep(random.random() / 100)
+            start, end = headers['Range'][len('bytes='):].split('-')
+            with self.lock:
+                self.in_flight -= 1
+            return {}, self.data[int(start):int(end) + 1]
+        conn.get_object.side_effect = get_object
+        return conn
+
+    def test_ordered(self):
+        chunks = list(transfer.iter_object_ranges(
+            self.connection_maker, 'c', 'o', len(self.data), range_size=64,
+            threads=4, buffer_size=64 * 8, headers={'If-Match': 'abc'}))
+        self.assertEqual(self.data, b''.join(chunks))
+        self.assertEqual(16, len(chunks))
+        self.assertTrue(self.max_in_flight <= 4)
+        self.assertEqual(set(['abc']),
+                         set(h['If-Match'] for h in self.requests))
+        self.assertEqual(
+            sorted('bytes=%d-%d' % (start, min(start + 63, 999))
+                   for start in range(0, 1000, 64)),
+            sorted(h['Range'] for h in self.requests))
+
+    def test_bounded_by_buffer(self):
+        ranges = transfer.iter_object_ranges(
+            self.connection_maker, 'c', 'o', len(self.data), range_size=100,
+            threads=8, buffer_size=300)
+        self.assertEqual(self.data[:100], next(ranges))
+        time.sleep(0.1)
+        # no more than buffer_size bytes were requested, including the range
+        # which has already been consumed
+        self.assertEqual(3, len(self.requests))
+        ranges.close()
+
+    def test_empty(self):
+        self.assertEqual([], list(transfer.iter_object_ranges(
+            self.connection_maker, 'c', 'o', 0)))
+
+    def test_short_range(self):
+        def connection_maker():
+            conn = mock.Mock()
+            conn.get_object.return_value = ({}, b'abc')
+            return conn
+        ranges = transfer.iter_object_ranges(
+            connection_maker, 'c', 'o', 10, range_size=5)
+        self.assertRaises(ClientException, list, ranges)
+
+
+class TestIterPages(testtools.TestCase):
+
+    def test_container_pages(self):
+        conn = mock.Mock()
+        conn.get_container.side_effect = [
+            (None, [{'name': 'a'}, {'subdir': 'b/'}]),
+            (None, [{'name': 'c'}]),
+            (None, [])]
+        self.assertEqual(
+            [[{'name': 'a'}, {'subdir': 'b/'}], [{'name': 'c'}]],
+            list(transfer.iter_container_pages(conn, 'c', marker='m',
+                                               prefix='p', delimiter='/')))
+        self.assertEqual(
+            [mock.call('c', marker='m', prefix='p', delimiter='/'),
+             mock.call('c', marker='b/', prefix='p', delimiter='/'),
+             mock.call('c', marker='c', prefix='p', delimiter='/')],
+            conn.get_container.call_args_list)
+
+    def test_prefetch(self):
+        fetched = threading.Event()
+
+        def get_account(marker, prefix):
+            if marker == 'b':
+                fetched.set()
+            return None, {'': [{'name': 'a'}], 'a': [{'name': 'b'}],
+                          'b': [{'name': 'c'}]}.get(marker, [])
+        conn = mock.Mock()
+        conn.get_account.side_effect = get_account
+        pages = transfer.iter_account_pages(conn, prefetch=2)
+        self.assertEqual([{'name': 'a'}], next(pages))
+        # the third page is requested while the first is being consumed
+        self.assertTrue(fetched.wait(5))
+        self.assertEqual([[{'name': 'b'}], [{'name': 'c'}]], list(pages))
+
+    def test_close_waits_for_fetch(self):
+        in_fetch = threading.Event()
+        release = threading.Event()
+        running = []
+
+        def get_account(marker, prefix):
+            running.append(marker)
+            if marker == 'a':
+                in_fetch.set()
+                release.wait()
+            running.remove(marker)
+            return None, [{'name': chr(ord(marker or '`') + 1)}]
+        conn = mock.Mock()
+        conn.get_account.side_effect = get_account
+        pages = transfer.iter_account_pages(conn, prefetch=1)
+        self.assertEqual([{'name': 'a'}], next(pages))
+        self.assertTrue(in_fetch.wait(5))
+        threading.Timer(0.1, release.set).start()
+        pages.close()
+        self.assertEqual([], running)
+        calls = conn.get_account.call_count
+        time.sleep(0.1)
+        self.assertEqual(calls, conn.get_account.call_count)
+
+    def test_no_prefetch(self):
+        conn = mock.Mock()
+        conn.get_account.side_effect = [
+            (None, [{'name': 'a'}]), (None, [])]
+        pages = transfer.iter_account_pages(conn, prefetch=0)
+        self.assertEqual([{'name': 'a'}], next(pages))
+        self.assertEqual(1, conn.get_account.call_count)
+        self.assertEqual([], list(pages))
+
+    def test_error(self):
+        conn = mock.Mock()
+        conn.get_container.side_effect = [
+            (None, [{'name': 'a'}]),
+            ClientException('Container GET failed', http_status=404)]
+        pages = transfer.iter_container_pages(conn, 'c')
+        self.assertEqual([{'name': 'a'}], next(pages))
+        exc = self.assertRaises(ClientException, next, pages)
+        self.assertEqual(404, exc.http_status)
+
+
+class TestUploadStream(testtools.TestCase):
+
+    def setUp(self):
+        super(TestUploadStream, self).setUp()
+        self.lock = threading.Lock()
+        self.puts = {}
+        self.conn = self.connection_maker()
+
+    def connection_maker(self):
+        conn = mock.Mock()
+
+        def put_object(container, obj, contents, content_length=None,
+                       etag=None, **kwargs):
+            data = contents if isinstance(contents, str) else contents.read()
+            if content_length is not None:
+                self.assertEqual(content_length, len(data))
+            if etag is not None:
+                self.assertEqual(md5(data).hexdigest(), etag)
+            with self.lock:
+                self.puts[(container, obj)] = (data, kwargs)
+            return md5(data).hexdigest()
+        conn.put_object.side_effect = put_object
+        return conn
+
+    def test_small_stream(self):
+        fileobj = six.BytesIO(b'abc')
+        etag = transfer.upload_stream(
+            self.conn, 'c', 'o', fileobj, segment_size=3,
+            connection_maker=self.connection_maker,
+            headers={'x-object-meta-a': 'b'}, content_type='text/plain')
+        self.assertEqual(md5(b'abc').hexdigest(), etag)
+        self.assertEqual({('c', 'o'): (b'abc', {
+            'content_type': 'text/plain',
+            'headers': {'x-object-meta-a': 'b'}})}, self.puts)
+
+    def test_segmented(self):
+        data = b''.join(chr(ord('a') + i % 26).encode('ascii')
+                        for i in range(1000))
+        transfer.upload_stream(
+            self.conn, 'c', 'o', six.BytesIO(data), segment_size=300,
+            segment_threads=2, connection_maker=self.connection_maker,
+            spool_size=100, read_size=64)
+        manifest, kwargs = self.puts.pop(('c', 'o'))
+        self.assertEqual('multipart-manifest=put', kwargs['query_string'])
+        self.assertEqual('true',
+                         kwargs['headers']['x-static-large-object'])
+        manifest = json.loads(manifest)
+        self.assertEqual([300, 300, 300, 100],
+                         [s['size_bytes'] for s in manifest])
+        segments = []
+        for seg in manifest:
+            container, name = seg['path'].lstrip('/').split('/', 1)
+            self.assertEqual('c_segments', container)
+            self.assertTrue(name.startswith('o/slo/'))
+            self.assertTrue(name.endswith('/300/%08d' % len(segments)))
+            segment, _ = self.puts.pop((container, name))
+            self.assertEqual(md5(segment).hexdigest(), seg['etag'])
+            segments.append(segment)
+        self.assertEqual(data, b''.join(segments))
+        self.assertEqual({}, self.puts)
+
+    def test_exact_multiple(self):
+        transfer.upload_stream(
+            self.conn, 'c', 'o', six.BytesIO(b'abcdef'), segment_size=3,
+            segment_container='segs', connection_maker=self.connection_maker)
+        manifest = json.loads(self.puts[('c', 'o')][0])
+        self.assertEqual([3, 3], [s['size_bytes'] for s in manifest])
+        self.assertTrue(manifest[0]['path'].startswith('/segs/o/slo/'))
+
+    def test_segment_failure(self):
+        def connection_maker():
+            conn = mock.Mock()
+            conn.put_object.side_effect = ClientException('oops')
+            return conn
+        self.assertRaises(
+            ClientException, transfer.upload_stream, self.conn, 'c', 'o',
+            six.BytesIO(b'abcdefg'), segment_size=3,
+            connection_maker=connection_maker)
+        self.assertEqual({}, self.puts)
+
+    def test_bounded_buffers(self):
+        started = threading.Event()
+        release = threading.Event()
+
+        def connection_maker():
+            conn = mock.Mock()
+
+            def put_object(*args, **kwargs):
+                started.set()
+                release.wait()
+                return 'etag'
+            conn.put_object.side_effect = put_object
+            return conn
+        fileobj = six.BytesIO(b'x' * 100)
+        thread = threading.Thread(target=transfer.upload_stream, args=(
+            self.conn, 'c', 'o', fileobj), kwargs={
+            'segment_size': 10, 'segment_threads': 2,
+            'connection_maker': connection_maker})
+        thread.start()
+        started.wait()
+        time.sleep(0.1)
+        # two segments are in flight and a third is waiting for a buffer
+        self.assertEqual(30, fileobj.tell())
+        release.set()
+        thread.join()
+        self.assertEqual(100, fileobj.tell())
+
+
+class TestCopyObject(testtools.TestCase):
+
+    def test_plain_object(self):
+        conn = mock.Mock()
+        conn.head_object.return_value = {'etag': 'abc'}
+        conn.copy_object.return_value = 'abc'
+        self.assertEqual('abc', transfer.copy_object(
+            conn, 'c', 'o', 'c2', 'o2', headers={'x-object-meta-a': 'b'}))
+        conn.copy_object.assert_called_once_with(
+            'c', 'o', 'c2', 'o2', headers={'x-object-meta-a': 'b'})
+
+    def test_slo(self):
+        conn = mock.Mock()
+        conn.get_object.return_value = ({}, json.dumps([
+            {'name': '/c_segments/o/1', 'bytes': 3, 'hash': 'a'},
+            {'name': '/c_segments/o/2', 'bytes': 2, 'hash': 'b'}]))
+        transfer.copy_object(conn, 'c', 'o', 'c2', 'o2', source_headers={
+            'x-static-large-object': 'True', 'content-type': 'text/plain',
+            'x-object-meta-mtime': '1', 'etag': '"x"', 'x-timestamp': '1'})
+        conn.get_object.assert_called_once_with(
+            'c', 'o', query_string='multipart-manifest=get')
+        self.assertFalse(conn.head_object.called)
+        self.assertFalse(conn.copy_object.called)
+        args, kwargs = conn.put_object.call_args
+        self.assertEqual(('c2', 'o2'), args[:2])
+        self.assertEqual([
+            {'path': '/c_segments/o/1', 'etag': 'a', 'size_bytes': 3},
+            {'path': '/c_segments/o/2', 'etag': 'b', 'size_bytes': 2},
+        ], json.loads(args[2]))
+        self.assertEqual({'content-type': 'text/plain',
+                          'x-object-meta-mtime': '1',
+                          'x-static-large-object': 'true'},
+                         kwargs['headers'])
+        self.assertEqual('multipart-manifest=put', kwargs['query_string'])
+
+    def test_dlo(self):
+        conn = mock.Mock()
+        conn.head_object.return_value = {'x-object-manifest': 'c_segs/o/',
+                                         'x-object-meta-a': 'b'}
+        transfer.copy_object(conn, 'c', 'o', 'c2', 'o2')
+        conn.put_object.assert_called_once_with(
+            'c2', 'o2', '', content_length=0,
+            headers={'x-object-manifest': 'c_segs/o/',
+                     'x-object-meta-a': 'b'})
+
+
+class TestDeleteObjects(testtools.TestCase):
+
+    def test_bulk_delete_limit(self):
+        conn = mock.Mock()
+        conn.get_capabilities.return_value = {
+            'bulk_delete': {'max_deletes_per_request': 2}}
+        self.assertEqual(2, transfer.get_bulk_delete_limit(conn))
+        conn.get_capabilities.return_value = {'swift': {}}
+        self.assertEqual(0, transfer.get_bulk_delete_limit(conn))
+        conn.get_capabilities.side_effect = ClientException('no /info')
+        self.assertEqual(0, transfer.get_bulk_delete_limit(conn))
+
+    def test_bulk(self):
+        conn = mock.Mock()
+        conn.bulk_delete.side_effect = [
+            {'Errors': [['/c/o%202', '409 Conflict']]}, {'Errors': []}]
+        self.assertEqual([('o 2', '409 Conflict')], transfer.delete_objects(
+            conn, 'c', ['o1', 'o 2', 'o3'], bulk_limit=2))
+        self.assertEqual([mock.call('c', ['o1', 'o 2']),
+                          mock.call('c', ['o3'])],
+                         conn.bulk_delete.call_args_list)
+
+    def test_one_by_one(self):
+        conn = mock.Mock()
+        conn.delete_object.side_effect = [
+            None, ClientException('gone', http_status=404),
+            ClientException('oops', http_status=500)]
+        failures = transfer.delete_objects(conn, 'c', ['o1', 'o2', 'o3'])
+        self.assertEqual(['o3'], [name for name, _err in failures])
+        self.assertFalse(conn.bulk_delete.called)
+
+
+class TestMigrateObject(testtools.TestCase):
+
+    def setUp(self):
+        super(TestMigrateObject, self).setUp()
+        self.data = b'x' * 10
+        self.src = mock.Mock()
+        self.src.get_object.return_value = (
+            {'content-length': '10', 'etag': md5(self.data).hexdigest(),
+             'content-type': 'text/plain', 'x-object-meta-mtime': '1.5',
+             'x-timestamp': '2'},
+            iter([self.data[:4], self.data[4:]]))
+        self.puts = []
+        self.dest = self.connection_maker()
+
+    def connection_maker(self):
+        conn = mock.Mock()
+
+        def put_object(container, obj, contents, **kwargs):
+            data = contents if isinstance(contents, str) else contents.read()
+            self.puts.append((container, obj, data, kwargs))
+            return md5(data).hexdigest()
+        conn.put_object.side_effect = put_object
+        return conn
+
+    def test_plain_object(self):
+        etag = transfer.migrate_object(self.src, self.dest, 'c', 'o',
+                                       dest_container='c2')
+        self.assertEqual(md5(self.data).hexdigest(), etag)
+        self.src.get_object.assert_called_once_with(
+            'c', 'o', resp_chunk_size=65536)
+        self.assertEqual([('c2', 'o', self.data, {
+            'content_length': 10, 'etag': md5(self.data).hexdigest(),
+            'content_type': 'text/plain',
+            'headers': {'x-object-meta-mtime': '1.5'}})], self.puts)
+
+    def test_resegmented(self):
+        transfer.migrate_object(self.src, self.dest, 'c', 'o',
+                                segment_size=4,
+                                dest_connection_maker=self.connection_maker)
+        self.assertEqual(4, len(self.puts))
+        container, obj, manifest, kwargs = self.puts[-1]
+        self.assertEqual(('c', 'o'), (container, obj))
+        self.assertEqual([4, 4, 2], [
+            seg['size_bytes'] for seg in json.loads(manifest)])
+        self.assertEqual('1.5', kwargs['headers']['x-object-meta-mtime'])
+        self.assertEqual('text/plain', kwargs['content_type'])
+
+    def test_max_segments(self):
+        transfer.migrate_object(self.src, self.dest, 'c', 'o',
+                                segment_size=2, max_segments=3,
+                                dest_connection_maker=self.connection_maker)
+        self.assertEqual([4, 4, 2], [
+            seg['size_bytes'] for seg in json.loads(self.puts[-1][2])])
+
+    def test_bad_etag(self):
+        self.src.get_object.return_value[0]['etag'] = 'bad'
+        exc = self.assertRaises(ClientException, transfer.migrate_object,
+                                self.src, self.dest, 'c', 'o')
+        self.assertTrue('md5sum != etag' in str(exc))
+        self.assertEqual([], self.puts)
+
+    def test_short_body(self):
+        self.src.get_object.return_value = (
+            {'content-length': '10', 'x-static-large-object': 'True',
+             'etag': '"manifest"'}, iter([self.data[:6]]))
+        exc = self.assertRaises(ClientException, transfer.migrate_object,
+                                self.src, self.dest, 'c', 'o',
+                                segment_size=4,
+                                dest_connection_maker=self.connection_maker)
+        self.assertTrue('read_length != content_length' in str(exc))
+        self.assertFalse(any(put[:2] == ('c', 'o') for put in self.puts))
+
+
+class TestWalkTree(testtools.TestCase):
+
+    def setUp(self):
+        super(TestWalkTree, self).setUp()
+        self.tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmpdir)
+        for name, data in [('a.txt', b'a'), ('d/b.txt', b'bb'),
+                           ('d/e/c.log', b'ccc'), ('skip/f.txt', b'')]:
+            path = os.path.join(self.tmpdir, name)
+            if not os.path.isdir(os.path.dirname(path)):
+                os.makedirs(os.path.dirname(path))
+            with open(path, 'wb') as fp:
+                fp.write(data)
+        os.mkdir(os.path.join(self.tmpdir, 'empty'))
+
+    def _walk(self, **kwargs):
+        return sorted(
+            (os.path.relpath(e.path, self.tmpdir), e.object_name,
+             e.dir_marker, e.size)
+            for e in transfer.walk_tree(self.tmpdir, **kwargs))
+
+    def test_walk(self):
+        expected = [('a.txt', 'pre/a.txt', False, 1),
+                    ('d/b.txt', 'pre/d/b.txt', False, 2),
+                    ('d/e/c.log', 'pre/d/e/c.log', False, 3),
+                    ('empty', 'pre/empty', True, 0),
+                    ('skip/f.txt', 'pre/skip/f.txt', False, 0)]
+        self.assertEqual(expected, self._walk(object_name='pre'))
+        self.assertEqual(expected, self._walk(object_name='pre', threads=3))
+        with mock.patch('swiftclient.transfer.scandir', None):
+            self.assertEqual(expected, self._walk(object_name='pre'))
+        entry = next(e for e in transfer.walk_tree(self.tmpdir)
+                     if e.path.endswith('a.txt'))
+        self.assertEqual(None, entry.object_name)
+        self.assertEqual(os.path.getmtime(entry.path), entry.mtime)
+
+    def test_include_exclude(self):
+        self.assertEqual(
+            ['a.txt', 'd/b.txt'],
+            [e[0] for e in self._walk(include=['*.txt'], exclude=['skip'])])
+        self.assertEqual(
+            ['a.txt', 'd/e/c.log', 'empty'],
+            [e[0] for e in self._walk(exclude=['d/*.txt', 'sk*'])])
+
+    def test_symlinks(self):
+        os.symlink(os.path.join(self.tmpdir, 'd'),
+                   os.path.join(self.tmpdir, 'link'))
+        # a loop back to the top is only walked once
+        os.symlink(self.tmpdir, os.path.join(self.tmpdir, 'd', 'top'))
+        self.assertNotIn('link/b.txt', [e[0] for e in self._walk()])
+        walked = [e[0] for e in self._walk(follow_symlinks=True)]
+        self.assertEqual(1, len([p for p in walked if p.endswith('b.txt')]))
+        self.assertEqual(5, len(walked))
+
+
+class TestTransferManager(testtools.TestCase):
+
+    def setUp(self):
+        super(TestTransferManager, self).setUp()
+        self.tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmpdir)
+        self.conn = mock.Mock(attempts=1, auth_end_time=0)
+        self.conn.put_object.return_value = 'etag'
+        self.conn.head_object.side_effect = ClientException(
+            'not found', http_status=404)
+        self.results = []
+        self.manager = transfer.TransferManager(
+            lambda: self.conn, object_threads=1, segment_threads=1,
+            progress=self.results.append)
+        self.addCleanup(self.manager.close)
+
+    def _write(self, name, data):
+        path = os.path.join(self.tmpdir, name)
+        if not os.path.isdir(os.path.dirname(path)):
+            os.makedirs(os.path.dirname(path))
+        with open(path, 'wb') as fp:
+            fp.write(data)
+        return path
+
+    def test_upload_tree(self):
+        self._write('a', b'abc')
+        self._write('d/b', b'0123456789')
+        os.mkdir(os.path.join(self.tmpdir, 'empty'))
+        results = list(self.manager.upload_tree(
+            'c', self.tmpdir, object_name='pre', segment_size=4,
+            use_slo=True, headers={'x-object-meta-k': 'v'}))
+        self.assertEqual(['pre/a', 'pre/d/b', 'pre/empty'],
+                         sorted(r['object'] for r in results))
+        self.assertTrue(all(r['success'] and r['status'] == 'ok'
+                            for r in results))
+        puts = dict(((c[0][0], c[0][1]), c)
+                    for c in self.conn.put_object.call_args_list)
+        self.assertEqual('text/directory',
+                         puts['c', 'pre/empty'][1]['content_type'])
+        self.assertEqual('v', puts['c', 'pre/a'][1]['headers'][
+            'x-object-meta-k'])
+        manifest = puts['c', 'pre/d/b']
+        self.assertEqual('multipart-manifest=put',
+                         manifest[1]['query_string'])
+        self.assertEqual([4, 4, 2], [
+            seg['size_bytes'] for seg in json.loads(manifest[0][2])])
+        self.assertEqual(
+            [0, 1, 2], [r['index'] for r in self.results
+                        if r['action'] == 'upload_segment'])
+        self.assertEqual(3, len([
+            r for r in self.results if r['action'] == 'upload_object']))
+
+    def test_upload_skip_identical(self):
+        path = self._write('a', b'abc')
+        self.conn.head_object.side_effect = None
+        self.conn.head_object.return_value = {
+            'content-length': '3', 'etag': md5(b'abc').hexdigest()}
+        result = self.manager.upload_file('c', path, 'a',
+                                          skip_identical=True)
+        self.assertEqual(('skip', 'identical'),
+                         (result['status'], result['reason']))
+        self.assertFalse(self.conn.put_object.called)
+
+    def test_upload_replaces_old_segments(self):
+        path = self._write('a', b'abc')
+        self.conn.head_object.side_effect = None
+        self.conn.head_object.return_value = {
+            'content-length': '10', 'x-object-manifest': 'c_segments/a/old'}
+        self.conn.get_container.return_value = (None, [{'name': 'a/old/1'}])
+        result = self.manager.upload_file('c', path, 'a')
+        self.assertTrue(result['success'])
+        self.conn.get_container.assert_called_once_with(
+            'c_segments', prefix='a/old/')
+        self.conn.delete_object.assert_called_once_with('c_segments',
+                                                        'a/old/1')
+
+    def test_upload_straggler(self):
+        manager = transfer.TransferManager(
+            lambda: self.conn, object_threads=1, segment_threads=3,
+            straggler_factor=2, progress=self.results.append)
+        self.addCleanup(manager.close)
+        release = threading.Event()
+        self.addCleanup(release.set)
+        puts = []
+
+        def put_object(container, obj, contents, **kwargs):
+            puts.append(obj)
+            if obj.endswith('00000003') and puts.count(obj) == 1:
+                release.wait(5)
+                return 'slow'
+            return 'etag'
+        self.conn.put_object.side_effect = put_object
+        path = self._write('a', b'x' * 16)
+        result = manager.upload_file('c', path, 'a', segment_size=4,
+                                     use_slo=True)
+        self.assertTrue(result['success'])
+        self.assertEqual(2, len([p for p in puts if p.endswith('00000003')]))
+        manifest = self.conn.put_object.call_args_list[-1][0][2]
+        self.assertEqual(['etag'] * 4,
+                         [seg['etag'] for seg in json.loads(manifest)])
+
+    def test_upload_missing_file(self):
+        result = self.manager.upload_file(
+            'c', os.path.join(self.tmpdir, 'missing'))
+        self.assertFalse(result['success'])
+        self.assertEqual(errno.ENOENT, result['error'].errno)
+        self.assertEqual([result], self.results)
+
+    def test_unknown_option(self):
+        self.assertRaises(TypeError, self.manager.upload_file, 'c', 'a',
+                          segment_sise=10)
+
+    def test_download_container(self):
+        self.conn.get_container.side_effect = [
+            (None, [{'name': 'a'}, {'name': 'd/b'}]), (None, [])]
+        bodies = {'a': b'abc', 'd/b': b'de'}
+        self.conn.get_object.side_effect = lambda c, o, **kw: (
+            {'content-type': 'text/plain', 'x-object-meta-mtime': '1.5',
+             'content-length': str(len(bodies[o])),
+             'etag': md5(bodies[o]).hexdigest()}, [bodies[o]])
+        results = list(self.manager.download_container(
+            'c', prefix='p', output_dir=self.tmpdir))
+        self.assertEqual([True, True], [r['success'] for r in results])
+        with open(os.path.join(self.tmpdir, 'd/b'), 'rb') as fp:
+            self.assertEqual(b'de', fp.read())
+        self.assertEqual(1.5, os.path.getmtime(
+            os.path.join(self.tmpdir, 'a')))
+        self.conn.get_container.assert_called_with(
+            'c', marker='d/b', prefix='p', delimiter=None)
+
+    def test_download_container_largest_first(self):
+        pool = ConnectionThreadPool(lambda: self.conn, 1, priority=True)
+        self.addCleanup(pool.shutdown)
+        manager = transfer.TransferManager(
+            lambda: self.conn, object_pool=pool, segment_threads=1,
+            largest_first=True)
+        self.addCleanup(manager.close)
+
+        def block():
+            # hold the only thread until every object has been queued
+            for _junk in range(500):
+                if pool.queue.qsize() >= 3:
+                    return
+                time.sleep(0.01)
+        pool.submit(lambda conn: block())
+        self.conn.get_container.side_effect = [
+            (None, [{'name': 'small', 'bytes': 1},
+                    {'name': 'big', 'bytes': 30},
+                    {'name': 'mid', 'bytes': 20}]), (None, [])]
+        self.conn.get_object.side_effect = lambda c, o, **kw: (
+            {'content-length': '0', 'etag': transfer._EMPTY_ETAG}, [])
+        results = list(manager.download_container('c', no_download=True))
+        calls = self.conn.get_object.call_args_list
+        self.assertEqual(['big', 'mid', 'small'], [c[0][1] for c in calls])
+        self.assertEqual(['big', 'mid', 'small'],
+                         [r['object'] for r in results])
+
+    def test_download_container_slow_object(self):
+        manager = transfer.TransferManager(
+            lambda: self.conn, object_threads=2, segment_threads=1)
+        self.addCleanup(manager.close)
+        release = threading.Event()
+        self.addCleanup(release.set)
+        names = ['slow'] + ['obj%d' % i for i in range(6)]
+        self.conn.get_container.side_effect = [
+            (None, [{'name': n} for n in names]), (None, [])]
+
+        def get_object(c, o, **kw):
+            if o == 'slow':
+                release.wait(5)
+            return {'content-length': '0', 'etag': transfer._EMPTY_ETAG}, []
+        self.conn.get_object.side_effect = get_object
+        done = []
+        for result in manager.download_container('c', no_download=True):
+            done.append(result['object'])
+            # the other thread keeps going while the slow object runs
+            if len(done) == 6:
+                release.set()
+        self.assertEqual(names[1:], sorted(done[:6]))
+        self.assertEqual('slow', done[6])
+
+    def test_download_container_partition(self):
+        names = ['obj%d' % i for i in range(10)]
+        self.conn.get_object.side_effect = lambda c, o, **kw: (
+            {'content-length': '0', 'etag': transfer._EMPTY_ETAG}, [])
+        downloaded = []
+        for index in range(3):
+            downloaded.append(sorted(
+                r['object'] for r in self.manager.download_container(
+                    'c', objects=names, partition=(index, 3),
+                    no_download=True)))
+        self.assertEqual(names, sorted(sum(downloaded, [])))
+        self.assertTrue(all(downloaded))
+
+    def test_download_container_not_found(self):
+        self.conn.get_container.side_effect = ClientException(
+            'not found', http_status=404)
+        results = list(self.manager.download_container('c'))
+        self.assertEqual(['list_container'],
+                         [r['action'] for r in results])
+        self.assertEqual(404, results[0]['error'].http_status)
+
+    def test_download_bad_md5(self):
+        self.conn.get_object.return_value = (
+            {'content-type': 'text/plain', 'etag': 'bad'}, [b'abc'])
+        journal = mock.Mock()
+        journal.is_done.return_value = False
+        self.manager.journal = journal
+        result = self.manager.download_file(
+            'c', 'o', os.path.join(self.tmpdir, 'o'))
+        self.assertFalse(result['success'])
+        self.assertTrue('md5sum != etag' in str(result['error']))
+        journal.record.assert_called_once_with('fail', 'c/o')
+
+    def test_download_journal_done(self):
+        journal = mock.Mock()
+        journal.is_done.return_value = True
+        self.manager.journal = journal
+        result = self.manager.download_file('c', 'o')
+        self.assertEqual(('skip', 'journal'),
+                         (result['status'], result['reason']))
+        self.assertFalse(self.conn.get_object.called)
+        self.assertFalse(journal.record.called)
+
+    def test_shared_pools(self):
+        pool = ConnectionThreadPool(lambda: self.conn, 2)
+        self.addCleanup(pool.shutdown)
+        manager = transfer.TransferManager(None, object_pool=pool,
+                                           segment_pool=mock.Mock())
+        manager.close()
+        self.conn.get_object.return_value = (
+            {'content-type': 'text/plain',
+             'etag': md5(b'abc').hexdigest()}, [b'abc'])
+        out = six.BytesIO()
+        result = manager.download_file('c', 'o', fileobj=out)
+        self.assertTrue(result['success'])
+        self.assertEqual(b'abc', out.getvalue())
@@ -13,6 +13,10 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+try:
+    from unittest import mock
+except ImportError:
+    import mock
 import testtools
 
 import six
@@ -122,6 +126,77 @@ class TestPrtBytes(testtools.TestCase):
         self.assertEqual('1024Y', u.prt_bytes(bytes_, True).lstrip())
 
 
+class TestPartition(testtools.TestCase):
+
+    def test_parse_partition(self):
+        self.assertEqual((0, 1), u.parse_partition('0/1'))
+        self.assertEqual((3, 4), u.parse_partition('3/4'))
+        for value in ('', '1', '1/2/3', 'a/b', '4/4', '-1/4', '0/0', None):
+            self.assertRaises(ValueError, u.parse_partition, value)
+
+    def test_in_partition(self):
+        names = ['obj%d' % i for i in range(100)]
+        shares = [[n for n in names if u.in_partition(n, (i, 3))]
+                  for i in range(3)]
+        self.assertEqual(sorted(names), sorted(sum(shares, [])))
+        self.assertTrue(all(shares))
+        self.assertTrue(all(u.in_partition(n, None) for n in names))
+        self.assertTrue(all(u.in_partition(n, (0, 1)) for n in names))
+        # the same name is assigned alike whatever its type
+        name = u'\u062a\u062a'
+        self.assertEqual(
+            [u.in_partition(name, (i, 3)) for i in range(3)],
+            [u.in_partition(name.encode('utf-8'), (i, 3)) for i in range(3)])
+
+
+class TestTokenBucket(testtools.TestCase):
+
+    def setUp(self):
+        super(TestTokenBucket, self).setUp()
+        self.now = 100.0
+        self.sleeps = []
+
+        def fake_sleep(secs):
+            self.sleeps.append(secs)
+            self.now += secs
+
+        for name, fake in (('time', lambda: self.now),
+                           ('sleep', fake_sleep)):
+            patcher = mock.patch('swiftclient.utils.%s' % name, fake)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_take(self):
+        bucket = u.TokenBucket(4)
+        bucket.take(4)
+        bucket.take(2)
+        self.assertEqual([], self.sleeps)
+        # the bucket is 2 tokens in debt
+        bucket.take(1)
+        self.assertEqual([0.5], self.sleeps)
+        # the tokens accrued meanwhile are capped at the burst
+        self.now += 10
+        bucket.take(5)
+        bucket.take(1)
+        self.assertEqual([0.5, 0.25], self.sleeps)
+
+    def test_set_rate(self):
+        bucket = u.TokenBucket(None)
+        bucket.take(100)
+        # a newly limited bucket starts empty
+        bucket.set_rate(8, burst=16)
+        bucket.take(1)
+        bucket.take(1)
+        self.assertEqual([0.125], self.sleeps)
+        self.now += 10
+        bucket.take(20)
+        bucket.take(1)
+        self.assertEqual([0.125, 0.5], self.sleeps)
+        bucket.set_rate(0)
+        bucket.take(100)
+        self.assertEqual([0.125, 0.5], self.sleeps)
+
+
 class TestLengthWrapper(testtools.TestCase):
 
     def test_stringio(self):